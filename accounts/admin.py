@@ -1,7 +1,29 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Tenant, UserProfile
+from .models import Tenant, TenantDailyStats, UserProfile
+
+
+class TenantScopedAdminMixin:
+    """Superusers manage every tenant's rows; other staff only their own"""
+    
+    def get_queryset(self, request):
+        if request.user.is_superuser:
+            queryset = self.model._default_manager.unscoped()
+            ordering = self.get_ordering(request)
+            if ordering:
+                queryset = queryset.order_by(*ordering)
+            return queryset
+        # The tenant manager already scopes to request.tenant
+        if request.tenant:
+            return super().get_queryset(request)
+        return super().get_queryset(request).none()
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        related = db_field.remote_field.model._default_manager
+        if request.user.is_superuser and 'queryset' not in kwargs and hasattr(related, 'unscoped'):
+            kwargs['queryset'] = related.unscoped()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
 @admin.register(Tenant)
@@ -17,6 +39,15 @@ class TenantAdmin(admin.ModelAdmin):
     user_count.short_description = 'Users'
 
 
+@admin.register(TenantDailyStats)
+class TenantDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'day', 'metric', 'value']
+    list_filter = ['tenant', 'metric']
+    date_hierarchy = 'day'
+    list_select_related = ['tenant']
+    readonly_fields = ['tenant', 'day', 'metric', 'value']
+
+
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
     can_delete = False
@@ -28,6 +59,7 @@ class UserAdmin(BaseUserAdmin):
     list_display = ['username', 'email', 'first_name', 'last_name', 'get_tenant', 'get_role', 'is_staff']
     list_filter = ['profile__role', 'profile__tenant', 'is_staff', 'is_active']
     search_fields = ['username', 'first_name', 'last_name', 'email']
+    list_select_related = ['profile__tenant']
     
     def get_tenant(self, obj):
         if hasattr(obj, 'profile'):
@@ -0,0 +1,75 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from clientportal.benchmarks import compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main views against a throwaway database and compare with a saved baseline'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,1000',
+            help='Comma-separated dataset sizes (clients per tenant)'
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per view')
+        parser.add_argument(
+            '--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'),
+            help='Baseline JSON file, committed alongside the code'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed relative slowdown or memory growth before a metric counts as a regression'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Write the baseline from this run instead of comparing against it'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        baseline_path = Path(options['baseline'])
+        if not options['update_baseline'] and not baseline_path.exists():
+            raise CommandError(f'No baseline at {baseline_path}; run with --update-baseline to record one')
+        
+        results = self.run(sizes, options['iterations'])
+        
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+        
+        regressions = compare(json.loads(baseline_path.read_text()), results, options['threshold'])
+        if regressions:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+    
+    def run(self, sizes, iterations):
+        media_root = tempfile.mkdtemp()
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(MEDIA_ROOT=media_root, QUERY_BUDGET_STRICT=False):
+                return run_benchmarks(sizes, iterations, log=self.log)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+    
+    def log(self, size, name, metrics):
+        if 'skipped' in metrics:
+            self.stdout.write(f"{size:>7} {name:<24} skipped: {metrics['skipped']}")
+            return
+        self.stdout.write(
+            f"{size:>7} {name:<24} p50 {metrics['p50_ms']:>8} ms  p95 {metrics['p95_ms']:>8} ms  "
+            f"{metrics['queries']:>3} queries  {metrics['peak_memory_kb']:>8} KB"
+        )
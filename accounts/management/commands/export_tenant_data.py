@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Tenant
+from clientportal.exports import EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream a tenant's clients, tasks or documents as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Slug of the tenant to export')
+        parser.add_argument('model', choices=sorted(EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help='Output format')
+        parser.add_argument('--output', help='File to write; defaults to stdout')
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(slug=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']!r} does not exist")
+        
+        chunks = stream_export(options['model'], tenant, options['format'])
+        if options['output']:
+            with open(options['output'], 'wb') as handle:
+                handle.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Exported {options['model']} to {options['output']}"))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import Tenant, UserProfile
+from accounts.rollups import rebuild_tenant_daily_stats
+from clientportal.search import INDEXES, index_queryset
+from clientportal.stats import invalidate_dashboard_stats
+from clients.models import Client
+from documents.models import Document, document_upload_path
+from tasks.models import Task, TaskComment
+
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos', 'Aisha',
+    'Wei', 'Priya', 'Olga', 'Kenji', 'Fatima', 'Lucas', 'Emma', 'Noah', 'Sofia', 'Mateo',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Nakamura', 'Singh', 'Ivanova',
+]
+COMPANY_WORDS = [
+    'Acme', 'Global', 'Summit', 'Pioneer', 'Blue', 'River', 'Northern', 'Apex', 'Vertex', 'Harbor',
+    'Quantum', 'Silver', 'Oak', 'Bright', 'Union', 'Atlas', 'Cedar', 'Nova', 'Prime', 'Metro',
+]
+COMPANY_SUFFIXES = ['Inc.', 'LLC', 'Group', 'Partners', 'Holdings', 'Labs', 'Consulting', 'Industries']
+TASK_VERBS = ['Prepare', 'Review', 'Send', 'Update', 'Schedule', 'File', 'Follow up on', 'Finalize', 'Draft']
+TASK_OBJECTS = [
+    'quarterly report', 'tax return', 'contract renewal', 'invoice', 'onboarding call', 'proposal',
+    'budget plan', 'compliance checklist', 'payroll setup', 'audit documents', 'meeting notes',
+]
+COMMENTS = [
+    'Waiting on the client to send the remaining documents.',
+    'Called and left a voicemail.',
+    'First draft is done, needs a second pair of eyes.',
+    'Client approved the changes.',
+    'Pushed back a week at the client\'s request.',
+    'Done, filed in the shared folder.',
+]
+
+# Realistic skew: most clients are active, most tasks are finished, and few
+# are urgent. Weights are relative.
+CLIENT_STATUS_WEIGHTS = {'active': 60, 'prospect': 20, 'inactive': 15, 'former': 5}
+TASK_PRIORITY_WEIGHTS = {'low': 30, 'medium': 45, 'high': 20, 'urgent': 5}
+DOCUMENT_TYPE_WEIGHTS = {'invoice': 35, 'report': 20, 'contract': 15, 'proposal': 15, 'other': 15}
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class Command(BaseCommand):
+    help = 'Generate large volumes of synthetic tenants, clients, tasks and documents for load testing'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=3, help='Number of tenants to create')
+        parser.add_argument('--users-per-tenant', type=int, default=10, help='Staff users per tenant')
+        parser.add_argument('--clients-per-tenant', type=int, default=1000, help='Clients per tenant')
+        parser.add_argument('--tasks-per-client', type=int, default=5, help='Average tasks per client')
+        parser.add_argument('--comments-per-task', type=int, default=2, help='Average comments per task')
+        parser.add_argument('--documents-per-client', type=int, default=2, help='Average documents per client')
+        parser.add_argument('--days', type=int, default=365, help='Spread creation dates over this many days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Tenant slugs are <prefix>-<n>; must not already exist'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Clients generated (with their tasks, comments and documents) per transaction'
+        )
+    
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.storage = Document._meta.get_field('file').storage
+    
+        slugs = [f"{options['prefix']}-{n}" for n in range(1, options['tenants'] + 1)]
+        existing = list(Tenant.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        if existing:
+            raise CommandError(f"Tenants already exist: {', '.join(existing)}. Use a different --prefix.")
+    
+        self.counts = {'clients': 0, 'tasks': 0, 'comments': 0, 'documents': 0}
+        for number, slug in enumerate(slugs, start=1):
+            tenant = Tenant.objects.create(name=f"{options['prefix'].title()} Tenant {number}", slug=slug)
+            self.generate_tenant(tenant)
+            self.stdout.write(f'Generated {tenant.name}')
+    
+        tenants = Tenant.objects.filter(slug__in=slugs)
+        # bulk_create skips the signal receivers, so rebuild what they maintain
+        for label in INDEXES:
+            index_queryset(INDEXES[label].model()._base_manager.filter(tenant__in=tenants))
+        for tenant in tenants:
+            rebuild_tenant_daily_stats(tenant.pk)
+            invalidate_dashboard_stats(tenant.pk)
+    
+        summary = ', '.join(f'{count} {name}' for name, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Load data generated: {summary}'))
+    
+    def created_at(self):
+        # Skewed towards recent activity
+        return self.now - timedelta(days=self.options['days'] * self.rng.random() ** 2, hours=self.rng.random() * 24)
+    
+    def count(self, average):
+        """Per-parent child count: around ``average``, sometimes none, occasionally many"""
+        if average <= 0:
+            return 0
+        return min(int(self.rng.expovariate(1 / average)), average * 10)
+    
+    def bulk_create(self, model, objs):
+        """
+        ``bulk_create`` that keeps the generated ``created_at`` values.
+        
+        ``auto_now_add`` stamps every row with the current time on insert, so
+        the dates are put back afterwards with one ``bulk_update`` per batch.
+        """
+        created = [obj.created_at for obj in objs]
+        objs = model._base_manager.bulk_create(objs, batch_size=self.options['batch_size'])
+        for obj, created_at in zip(objs, created):
+            obj.created_at = created_at
+        model._base_manager.bulk_update(objs, ['created_at'], batch_size=self.options['batch_size'])
+        return objs
+    
+    def generate_tenant(self, tenant):
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(
+                username=f'{tenant.slug}-user{n}', email=f'user{n}@{tenant.slug}.example.com',
+                first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                password=password,
+            )
+            for n in range(1, self.options['users_per_tenant'] + 1)
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, tenant=tenant, role='admin' if n == 0 else 'staff')
+            for n, user in enumerate(users)
+        ])
+    
+        total = self.options['clients_per_tenant']
+        batch_size = self.options['batch_size']
+        for start in range(0, total, batch_size):
+            with transaction.atomic():
+                clients = self.create_clients(tenant, users, start, min(batch_size, total - start))
+                tasks = self.create_tasks(tenant, users, clients)
+                self.create_comments(users, tasks)
+                self.create_documents(tenant, users, clients)
+    
+    def create_clients(self, tenant, users, start, size):
+        clients = []
+        for n in range(start, start + size):
+            first_name, last_name = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            company = f'{self.rng.choice(COMPANY_WORDS)} {self.rng.choice(COMPANY_SUFFIXES)}' if self.rng.random() < 0.8 else ''
+            clients.append(Client(
+                tenant=tenant, first_name=first_name, last_name=last_name,
+                email=f'{first_name}.{last_name}.{n}@example.com'.lower(),
+                phone=f'+1-555-{self.rng.randrange(10000):04d}', company=company,
+                status=_weighted(self.rng, CLIENT_STATUS_WEIGHTS),
+                created_by=self.rng.choice(users), created_at=self.created_at(),
+            ))
+        self.counts['clients'] += len(clients)
+        return self.bulk_create(Client, clients)
+    
+    def create_tasks(self, tenant, users, clients):
+        tasks = []
+        for client in clients:
+            for _ in range(self.count(self.options['tasks_per_client'])):
+                created_at = max(self.created_at(), client.created_at)
+                due_date = created_at + timedelta(days=self.rng.randint(1, 60)) if self.rng.random() < 0.8 else None
+                # Older tasks are more likely to be finished
+                age = (self.now - created_at).days / max(self.options['days'], 1)
+                roll = self.rng.random()
+                if roll < 0.3 + 0.6 * age:
+                    status = 'completed'
+                elif roll < 0.35 + 0.6 * age:
+                    status = 'cancelled'
+                else:
+                    status = 'in_progress' if self.rng.random() < 0.4 else 'pending'
+                completed_at = None
+                if status == 'completed':
+                    completed_at = min(created_at + timedelta(days=self.rng.randint(0, 30)), self.now)
+                tasks.append(Task(
+                    tenant=tenant, client=client,
+                    title=f'{self.rng.choice(TASK_VERBS)} {self.rng.choice(TASK_OBJECTS)}',
+                    description=self.rng.choice(COMMENTS), status=status,
+                    priority=_weighted(self.rng, TASK_PRIORITY_WEIGHTS),
+                    assigned_to=self.rng.choice(users) if self.rng.random() < 0.85 else None,
+                    created_by=self.rng.choice(users), due_date=due_date,
+                    completed_at=completed_at, created_at=created_at,
+                ))
+        self.counts['tasks'] += len(tasks)
+        return self.bulk_create(Task, tasks)
+    
+    def create_comments(self, users, tasks):
+        comments = []
+        for task in tasks:
+            for n in range(self.count(self.options['comments_per_task'])):
+                comments.append(TaskComment(
+                    task=task, author=self.rng.choice(users), content=self.rng.choice(COMMENTS),
+                    created_at=min(task.created_at + timedelta(hours=self.rng.randint(1, 24 * 14)), self.now),
+                ))
+        self.counts['comments'] += len(comments)
+        self.bulk_create(TaskComment, comments)
+    
+    def create_documents(self, tenant, users, clients):
+        documents = []
+        for client in clients:
+            for n in range(self.count(self.options['documents_per_client'])):
+                document_type = _weighted(self.rng, DOCUMENT_TYPE_WEIGHTS)
+                document = Document(
+                    tenant=tenant, client=client, title=f'{document_type.title()} {n + 1}',
+                    document_type=document_type, uploaded_by=self.rng.choice(users),
+                    created_at=max(self.created_at(), client.created_at),
+                )
+                name = document_upload_path(document, f'{document_type}-{client.pk}-{n + 1}.txt')
+                document.file.name = name
+                document.size, document.sha256 = self.write_placeholder(name, document)
+                document.mime_type = 'text/plain'
+                documents.append(document)
+        self.counts['documents'] += len(documents)
+        self.bulk_create(Document, documents)
+    
+    def write_placeholder(self, name, document):
+        """Write a small text file of a plausible size; return ``(size, sha256)``"""
+        line = f'Placeholder {document.title} for {document.client.full_name}\n'.encode()
+        size = max(len(line), int(self.rng.lognormvariate(9, 1.2)) % (256 * 1024))
+        content = (line * (size // len(line) + 1))[:size]
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        return size, hashlib.sha256(content).hexdigest()
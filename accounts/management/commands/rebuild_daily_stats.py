@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from accounts.models import Tenant
+from accounts.rollups import rebuild_tenant_daily_stats
+from clientportal.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-tenant daily rollups from client, task and document history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant', action='append', dest='tenants', metavar='SLUG',
+            help='Only rebuild the given tenant (may be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rollup rows inserted per query'
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.order_by('pk')
+        if options['tenants']:
+            tenants = tenants.filter(slug__in=options['tenants'])
+        
+        total = 0
+        for tenant in tenants.iterator():
+            rows = rebuild_tenant_daily_stats(tenant.pk, batch_size=options['batch_size'])
+            invalidate_dashboard_stats(tenant.pk)
+            total += rows
+            self.stdout.write(f'Rebuilt {rows} rollup rows for {tenant.name}')
+        
+        self.stdout.write(self.style.SUCCESS(f'Daily stats rebuild completed: {total} rows'))
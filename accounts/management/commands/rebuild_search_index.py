@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from clientportal.search import INDEXES, index_queryset
+
+
+class Command(BaseCommand):
+    help = 'Reindex clients, tasks and documents for full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', choices=sorted(INDEXES),
+            help='Only reindex the given model (may be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        for label in options['models'] or INDEXES:
+            model = INDEXES[label].model()
+            index_queryset(model._base_manager.all())
+            self.stdout.write(f'Reindexed {label}')
+        
+        self.stdout.write(self.style.SUCCESS('Search index rebuild completed'))
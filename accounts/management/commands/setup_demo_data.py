@@ -93,7 +93,7 @@ class Command(BaseCommand):
         
         clients = []
         for client_data in clients_data:
-            client, created = Client.objects.get_or_create(
+            client, created = Client.objects.unscoped().get_or_create(
                 email=client_data['email'],
                 tenant=tenant,
                 defaults={
@@ -145,7 +145,7 @@ class Command(BaseCommand):
         ]
         
         for i, task_data in enumerate(tasks_data):
-            task, created = Task.objects.get_or_create(
+            task, created = Task.objects.unscoped().get_or_create(
                 title=task_data['title'],
                 client=clients[i % len(clients)],
                 tenant=tenant,
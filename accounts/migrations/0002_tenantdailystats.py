@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_daily_stats(apps, schema_editor):
+    from accounts.rollups import rebuild_tenant_daily_stats
+    
+    Tenant = apps.get_model('accounts', 'Tenant')
+    for tenant_id in Tenant.objects.values_list('pk', flat=True).iterator():
+        rebuild_tenant_daily_stats(tenant_id, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('clients', '0001_initial'),
+        ('tasks', '0001_initial'),
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(max_length=50)),
+                ('value', models.IntegerField(default=0)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='accounts.tenant')),
+            ],
+            options={
+                'verbose_name_plural': 'tenant daily stats',
+                'ordering': ['-day', 'metric'],
+                'unique_together': {('tenant', 'day', 'metric')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install_user_prefix_indexes(apps, schema_editor):
+    from clientportal.autocomplete import USER_SEARCH_FIELDS, install_prefix_indexes
+    install_prefix_indexes(apps.get_model('auth', 'User'), USER_SEARCH_FIELDS, schema_editor)
+
+
+def uninstall_user_prefix_indexes(apps, schema_editor):
+    from clientportal.autocomplete import USER_SEARCH_FIELDS, uninstall_prefix_indexes
+    uninstall_prefix_indexes(apps.get_model('auth', 'User'), USER_SEARCH_FIELDS, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_tenantdailystats'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_user_prefix_indexes, uninstall_user_prefix_indexes),
+    ]
@@ -45,3 +45,19 @@ class UserProfile(models.Model):
     @property
     def is_staff_member(self):
         return self.role in ['admin', 'staff']
+
+
+class TenantDailyStats(models.Model):
+    """Pre-aggregated per-tenant counters, bucketed by the day rows were created"""
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    metric = models.CharField(max_length=50)
+    value = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day', 'metric']
+        unique_together = ['tenant', 'day', 'metric']
+        verbose_name_plural = 'tenant daily stats'
+    
+    def __str__(self):
+        return f"{self.tenant.name} {self.day} {self.metric}={self.value}"
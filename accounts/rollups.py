@@ -0,0 +1,173 @@
+"""
+Incremental maintenance of ``TenantDailyStats``.
+
+Every tracked row contributes to ``<app>.created`` and, when the model has a
+``status`` field, ``<app>.status.<status>`` on the local day it was created.
+Summing a metric over all days therefore gives the current total, and summing
+over recent days gives what was created recently and still exists.
+
+The signal receivers in the clients, tasks and documents apps call
+``record_saved``/``record_deleted``, and bulk operations that bypass signals
+(``QuerySet.update()``, ``bulk_create()``) apply the changes they counted
+with ``bump_counts``. ``rebuild_tenant_daily_stats`` recomputes a tenant
+from scratch; it is for backfills and repairs only.
+
+Every counter write and rebuild first locks the tenant's row, so a rebuild
+never drops an increment committed while it was reading the source tables.
+
+A status change is counted against the status stored in the database, not
+the one the instance was loaded with: ``lock_status`` reads it under a row
+lock from ``pre_save``, and tracked models save inside a transaction, so two
+requests saving the same change count it once.
+"""
+from collections import defaultdict
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+ROLLUP_MODELS = [
+    ('clients', 'Client'),
+    ('tasks', 'Task'),
+    ('documents', 'Document'),
+]
+
+
+def created_metric(app_label):
+    return f'{app_label}.created'
+
+
+def status_metric(app_label, status):
+    return f'{app_label}.status.{status}'
+
+
+def _has_status(model):
+    return any(field.name == 'status' for field in model._meta.concrete_fields)
+
+
+def daily_counts(queryset):
+    """Rows of ``queryset`` counted per creation ``day`` (and ``status``, if the model has one)"""
+    fields = ['day', 'status'] if _has_status(queryset.model) else ['day']
+    return (
+        queryset.annotate(day=TruncDate('created_at'))
+        .values(*fields)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+
+def _bump(tenant_id, day, metric, delta, create=True):
+    from .models import TenantDailyStats
+    
+    counters = TenantDailyStats.objects.filter(tenant_id=tenant_id, day=day, metric=metric)
+    if counters.update(value=F('value') + delta) or not create:
+        return
+    try:
+        with transaction.atomic():
+            TenantDailyStats.objects.create(tenant_id=tenant_id, day=day, metric=metric, value=delta)
+    except IntegrityError:
+        # Another writer created the row between our update and insert
+        counters.update(value=F('value') + delta)
+
+
+def lock_tenant(tenant_id, apps=global_apps):
+    """Serialize the tenant's counter writes and rebuilds until the transaction ends"""
+    Tenant = apps.get_model('accounts', 'Tenant')
+    list(Tenant._base_manager.select_for_update().filter(pk=tenant_id).values_list('pk'))
+
+
+def bump_counts(tenant_id, deltas):
+    """Add ``{(day, metric): delta}`` to the tenant's counters"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        lock_tenant(tenant_id)
+        for (day, metric), delta in sorted(deltas.items()):
+            _bump(tenant_id, day, metric, delta, create=delta > 0)
+
+
+def track_status(instance):
+    """Remember the status loaded from the database so changes can be detected"""
+    instance._rollup_status = instance.__dict__.get('status')
+
+
+def lock_status(instance, update_fields=None):
+    """Re-read the stored status of a row about to be saved, locking the row
+    until the saving transaction ends"""
+    if instance._state.adding or not _has_status(type(instance)):
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        # The stored status is not changing
+        instance._rollup_status = instance.status
+        return
+    rows = type(instance)._base_manager.select_for_update().filter(pk=instance.pk)
+    instance._rollup_status = rows.values_list('status', flat=True).first()
+
+
+def record_saved(instance, created):
+    """Apply a saved row to its tenant's daily counters"""
+    app_label = instance._meta.app_label
+    day = timezone.localdate(instance.created_at)
+    has_status = _has_status(type(instance))
+    previous = getattr(instance, '_rollup_status', None)
+    
+    if not created and not (has_status and previous and previous != instance.status):
+        track_status(instance)
+        return
+    
+    with transaction.atomic():
+        lock_tenant(instance.tenant_id)
+        if created:
+            _bump(instance.tenant_id, day, created_metric(app_label), 1)
+            if has_status:
+                _bump(instance.tenant_id, day, status_metric(app_label, instance.status), 1)
+        else:
+            _bump(instance.tenant_id, day, status_metric(app_label, previous), -1, create=False)
+            _bump(instance.tenant_id, day, status_metric(app_label, instance.status), 1)
+    
+    track_status(instance)
+
+
+def record_deleted(instance):
+    """Remove a deleted row from its tenant's daily counters"""
+    app_label = instance._meta.app_label
+    day = timezone.localdate(instance.created_at)
+    status = getattr(instance, '_rollup_status', None)
+    
+    # Decrements never create rows, so cascades from a tenant delete are no-ops
+    with transaction.atomic():
+        lock_tenant(instance.tenant_id)
+        _bump(instance.tenant_id, day, created_metric(app_label), -1, create=False)
+        if status:
+            _bump(instance.tenant_id, day, status_metric(app_label, status), -1, create=False)
+
+
+def rebuild_tenant_daily_stats(tenant_id, batch_size=1000, apps=global_apps):
+    """Recompute all counters for one tenant from the source tables; for
+    backfills and repairs, as it reads every row the tenant has"""
+    TenantDailyStats = apps.get_model('accounts', 'TenantDailyStats')
+    values = defaultdict(int)
+    
+    with transaction.atomic():
+        # Counter writes committed before the lock is granted are in the
+        # aggregates below; later ones wait for the rebuild
+        lock_tenant(tenant_id, apps=apps)
+        for app_label, model_name in ROLLUP_MODELS:
+            model = apps.get_model(app_label, model_name)
+            for row in daily_counts(model._base_manager.filter(tenant_id=tenant_id)):
+                values[row['day'], created_metric(app_label)] += row['count']
+                if 'status' in row:
+                    values[row['day'], status_metric(app_label, row['status'])] += row['count']
+        
+        TenantDailyStats.objects.filter(tenant_id=tenant_id).delete()
+        TenantDailyStats.objects.bulk_create(
+            [
+                TenantDailyStats(tenant_id=tenant_id, day=day, metric=metric, value=value)
+                for (day, metric), value in values.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(values)
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Tenant, UserProfile
+from .tenancy import invalidate_tenant_context
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_tenant_context(instance.user_id)
+
+
+@receiver(post_save, sender=Tenant)
+def tenant_changed(sender, instance, **kwargs):
+    invalidate_tenant_context(*instance.users.values_list('user_id', flat=True))
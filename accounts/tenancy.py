@@ -0,0 +1,133 @@
+"""
+Per-request tenant resolution and tenant-scoped querysets.
+
+``TenantMiddleware`` sets ``request.tenant`` and ``request.role`` for every
+authenticated request. Both come from one ``UserProfile``/``Tenant`` joined
+query, cached per user for ``TENANT_CONTEXT_CACHE_TIMEOUT`` seconds and
+dropped whenever the user's profile or tenant changes.
+
+The middleware also makes the tenant current for the duration of the
+request. ``TenantManager`` filters every queryset by the current tenant and
+applies each model's usual ``select_related`` joins, so views, forms and
+related managers cannot reach another tenant's rows by accident. Outside a
+request (management commands, signal handlers, threads) there is no current
+tenant and querysets are empty rather than unscoped; use ``for_tenant()`` or
+``use_tenant()`` there, or ``unscoped()`` where every tenant's rows are meant.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import models
+from django.http import JsonResponse
+from django.shortcuts import render
+from .models import UserProfile
+
+
+_current_tenant = ContextVar('current_tenant', default=None)
+
+
+def get_current_tenant():
+    return _current_tenant.get()
+
+
+@contextmanager
+def use_tenant(tenant):
+    """Make ``tenant`` current for the duration of the block"""
+    token = _current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current_tenant.reset(token)
+
+
+class TenantQuerySet(models.QuerySet):
+    def for_tenant(self, tenant):
+        return self.filter(tenant=tenant)
+
+
+class TenantManager(models.Manager.from_queryset(TenantQuerySet)):
+    """Default manager for tenant-owned models.
+    
+    Bulk maintenance code that defers columns should use ``_base_manager``,
+    which has neither the tenant filter nor the joins.
+    """
+    
+    def __init__(self, select_related=()):
+        super().__init__()
+        self.select_related_fields = list(select_related)
+    
+    def unscoped(self):
+        """All tenants' rows, with the model's usual joins"""
+        queryset = super().get_queryset()
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        return queryset
+    
+    def for_tenant(self, tenant):
+        return self.unscoped().filter(tenant=tenant)
+    
+    def get_queryset(self):
+        tenant = get_current_tenant()
+        if tenant is None:
+            # Fail closed: code that runs outside a request (threads, streamed
+            # responses, commands) must name the tenant or ask for unscoped()
+            return self.unscoped().none()
+        return self.for_tenant(tenant)
+
+
+def tenant_context_cache_key(user_id):
+    return f'tenant-context:{user_id}'
+
+
+def invalidate_tenant_context(*user_ids):
+    cache.delete_many([tenant_context_cache_key(user_id) for user_id in user_ids])
+
+
+def get_tenant_context(user):
+    """Return ``(tenant, role)`` for a user, or ``(None, None)`` without a profile"""
+    key = tenant_context_cache_key(user.pk)
+    context = cache.get(key)
+    if context is None:
+        profile = UserProfile.objects.select_related('tenant').filter(user=user).order_by('pk').first()
+        context = (profile.tenant, profile.role) if profile else (None, None)
+        cache.set(key, context, settings.TENANT_CONTEXT_CACHE_TIMEOUT)
+    return context
+
+
+class TenantMiddleware:
+    """Attach the current user's tenant and role to the request"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        request.tenant, request.role = None, None
+        if request.user.is_authenticated:
+            request.tenant, request.role = get_tenant_context(request.user)
+        with use_tenant(request.tenant):
+            return self.get_response(request)
+
+
+def tenant_required(view_func=None, *, json=False):
+    """Require a logged-in user that belongs to a tenant.
+    
+    Users without a tenant get the setup page, or a JSON error for AJAX
+    endpoints declared with ``@tenant_required(json=True)``.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        @login_required
+        def wrapped_view(request, *args, **kwargs):
+            if request.tenant is None:
+                if json:
+                    return JsonResponse({'error': 'User profile not found'}, status=400)
+                return render(request, 'accounts/setup_required.html')
+            return view_func(request, *args, **kwargs)
+        return wrapped_view
+    
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
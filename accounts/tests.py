@@ -1,3 +1,210 @@
-from django.test import TestCase
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Tenant, TenantDailyStats, UserProfile
+from accounts.rollups import rebuild_tenant_daily_stats
+from accounts.tenancy import get_current_tenant, use_tenant
+from clientportal import search
+from clients.models import Client
+from documents.forms import DocumentSearchForm
+from documents.models import Document
+from tasks.models import Task, TaskComment
 
-# Create your tests here.
+
+class TenantDailyStatsTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.client_obj = Client.objects.create(
+            tenant=self.tenant, first_name='John', last_name='Smith', email='john@example.com',
+        )
+    
+    def counters(self):
+        return dict(
+            TenantDailyStats.objects.filter(tenant=self.tenant, value__gt=0)
+            .values_list('metric', 'value')
+        )
+    
+    def test_incremental_updates(self):
+        task = Task.objects.create(tenant=self.tenant, client=self.client_obj, title='Call')
+        self.assertEqual(self.counters(), {
+            'clients.created': 1,
+            'clients.status.active': 1,
+            'tasks.created': 1,
+            'tasks.status.pending': 1,
+        })
+        
+        task.mark_completed()
+        self.assertEqual(self.counters()['tasks.status.completed'], 1)
+        self.assertNotIn('tasks.status.pending', self.counters())
+        
+        self.client_obj.delete()
+        self.assertEqual(self.counters(), {})
+    
+    def test_change_saved_twice_is_counted_once(self):
+        task = Task.objects.create(tenant=self.tenant, client=self.client_obj, title='Call')
+        # Two requests that loaded the task before either saved it
+        first, second = Task.objects.unscoped().get(pk=task.pk), Task.objects.unscoped().get(pk=task.pk)
+        first.mark_completed()
+        second.mark_completed()
+        self.assertEqual(self.counters()['tasks.status.completed'], 1)
+        self.assertNotIn('tasks.status.pending', self.counters())
+    
+    def test_rebuild_matches_incremental(self):
+        for i in range(3):
+            Task.objects.create(tenant=self.tenant, client=self.client_obj, title=f'Task {i}')
+        Task.objects.unscoped().filter(title='Task 0').update(status='completed')
+        
+        rebuild_tenant_daily_stats(self.tenant.pk)
+        today = timezone.localdate()
+        self.assertEqual(
+            TenantDailyStats.objects.get(tenant=self.tenant, day=today, metric='tasks.status.completed').value, 1
+        )
+        self.assertEqual(self.counters()['tasks.status.pending'], 2)
+        
+        call_command('rebuild_daily_stats', tenants=['acme'], stdout=StringIO())
+        self.assertEqual(self.counters()['tasks.created'], 3)
+    
+    def test_rebuild_locks_the_tenant_before_reading(self):
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_tenant_daily_stats(self.tenant.pk)
+        statements = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertIn('FROM "accounts_tenant"', statements[0])
+
+
+class TenantMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client.force_login(self.user)
+    
+    def test_user_without_profile_sees_setup_page(self):
+        response = self.client.get(reverse('clients:client_list'))
+        self.assertTemplateUsed(response, 'accounts/setup_required.html')
+        response = self.client.post(reverse('tasks:task_comment', args=[1]))
+        self.assertEqual(response.status_code, 400)
+    
+    def test_context_is_cached_and_invalidated(self):
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='staff')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.wsgi_request.tenant, self.tenant)
+        self.assertEqual(response.wsgi_request.role, 'staff')
+        
+        # Session and user lookups only; tenant and statistics come from cache
+        with self.assertNumQueries(2):
+            self.client.get(reverse('dashboard'))
+        
+        self.user.profile.role = 'admin'
+        self.user.profile.save()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.wsgi_request.role, 'admin')
+
+
+class TenantManagerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.acme = Tenant.objects.create(name='Acme', slug='acme')
+        self.globex = Tenant.objects.create(name='Globex', slug='globex')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.acme, role='staff')
+        outsider = User.objects.create_user('bob')
+        UserProfile.objects.create(user=outsider, tenant=self.globex, role='staff')
+        self.own = Client.objects.create(tenant=self.acme, first_name='Ada', last_name='Lovelace', email='ada@acme.test')
+        self.other = Client.objects.create(tenant=self.globex, first_name='Hank', last_name='Scorpio', email='hank@globex.test')
+        Task.objects.create(tenant=self.acme, client=self.own, title='Own task', assigned_to=self.user)
+        Task.objects.create(tenant=self.globex, client=self.other, title='Other task', assigned_to=outsider)
+    
+    def test_querysets_follow_current_tenant(self):
+        # No current tenant: nothing, unless every tenant is asked for
+        self.assertEqual(Client.objects.count(), 0)
+        self.assertEqual(self.acme.clients.count(), 0)
+        self.assertEqual(Client.objects.unscoped().count(), 2)
+        with use_tenant(self.acme):
+            self.assertEqual(list(Client.objects.all()), [self.own])
+            self.assertEqual(list(Client.objects.for_tenant(self.globex)), [self.other])
+            self.assertEqual(list(Client.objects.unscoped().order_by('pk')), [self.own, self.other])
+            # Related managers are scoped too
+            self.assertEqual(self.acme.clients.count(), 1)
+            self.assertEqual(self.globex.clients.count(), 0)
+        self.assertIsNone(get_current_tenant())
+    
+    def test_usual_joins_are_applied(self):
+        with use_tenant(self.acme), self.assertNumQueries(1):
+            task = Task.objects.get()
+            self.assertEqual(task.client, self.own)
+            self.assertEqual(task.assigned_to, self.user)
+    
+    def test_requests_only_reach_own_tenant(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('clients:client_detail', args=[self.other.pk]))
+        self.assertEqual(response.status_code, 404)
+        
+        response = self.client.get(reverse('tasks:task_list'))
+        self.assertEqual([task.title for task in response.context['page_obj']], ['Own task'])
+        choices = response.context['search_form'].fields['assigned_to'].queryset
+        self.assertEqual(list(choices), [self.user])
+        
+        form = DocumentSearchForm(tenant=self.acme)
+        self.assertEqual(list(form.fields['client'].queryset), [self.own])
+
+
+class GenerateLoadDataTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+    
+    def generate(self, prefix, **options):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command(
+                'generate_load_data', prefix=prefix, tenants=2, clients_per_tenant=30, tasks_per_client=3,
+                comments_per_task=1, documents_per_client=1, users_per_tenant=3, batch_size=7,
+                stdout=StringIO(), **options
+            )
+    
+    def test_generates_consistent_data(self):
+        self.generate('load')
+        tenant = Tenant.objects.get(slug='load-1')
+        self.assertEqual(Tenant.objects.filter(slug__startswith='load-').count(), 2)
+        self.assertEqual(Client.objects.for_tenant(tenant).count(), 30)
+        self.assertEqual(tenant.users.count(), 3)
+        
+        task = Task.objects.for_tenant(tenant).filter(status='completed').first()
+        self.assertIsNotNone(task.completed_at)
+        for model in [Client, Task, TaskComment, Document]:
+            self.assertGreater(model._base_manager.dates('created_at', 'day').count(), 1)
+            self.assertTrue(model._meta.get_field('created_at').auto_now_add)
+        
+        document = Document.objects.for_tenant(tenant).first()
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with document.file.open('rb') as handle:
+                content = handle.read()
+        self.assertEqual(len(content), document.size)
+        self.assertEqual(hashlib.sha256(content).hexdigest(), document.sha256)
+        
+        # Rollups and the search index are rebuilt after the bulk inserts
+        totals = dict(TenantDailyStats.objects.filter(tenant=tenant).values('metric').annotate(
+            total=Sum('value')).values_list('metric', 'total'))
+        self.assertEqual(totals['tasks.created'], Task.objects.for_tenant(tenant).count())
+        client = Client.objects.for_tenant(tenant).first()
+        matches = search.search(Client.objects.for_tenant(tenant), client.email, tenant)
+        self.assertIn(client, matches)
+    
+    def test_same_seed_gives_same_data(self):
+        self.generate('first', seed=7)
+        self.generate('second', seed=7)
+        first = list(Client.objects.unscoped().filter(tenant__slug='first-1').order_by('pk').values_list('email', 'status'))
+        second = list(Client.objects.unscoped().filter(tenant__slug='second-1').order_by('pk').values_list('email', 'status'))
+        self.assertEqual(first, second)
+        
+        with self.assertRaises(CommandError):
+            self.generate('first')
@@ -0,0 +1,118 @@
+"""
+Remote autocomplete for the client and user pickers.
+
+``AutocompleteSelect`` renders only the currently selected option and points
+the browser at a JSON endpoint (``static/js/autocomplete.js`` does the
+fetching), so a form's size no longer depends on how many clients or users a
+tenant has. The endpoints answer with one keyset-paginated page of matches::
+
+    {"results": [{"id": 7, "text": "Ada Lovelace"}, ...], "next": "<cursor>"}
+
+``next`` is ``null`` on the last page; pass it back as ``?cursor=`` together
+with the same ``q`` to fetch more.
+
+``prefix_filter()`` matches with ``istartswith``, which only an index built
+for it can serve: ``UPPER(column::text) text_pattern_ops`` on PostgreSQL and
+``COLLATE NOCASE`` on SQLite. ``install_prefix_indexes()`` creates them from
+a migration.
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.urls import reverse
+from .pagination import CursorPaginator
+
+
+PAGE_SIZE = 20
+MAX_TERMS = 4
+USER_SEARCH_FIELDS = ['username', 'first_name', 'last_name', 'email']
+
+
+class AutocompleteSelect(forms.Select):
+    """A select box whose options are fetched from ``url_name`` as the user types"""
+    
+    def __init__(self, url_name, attrs=None):
+        self.url_name = url_name
+        super().__init__(attrs)
+    
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = reverse(self.url_name)
+        return context
+    
+    def _valid_keys(self, field, value):
+        """The bound values that can be looked up; raw input such as ``?client=abc`` is dropped"""
+        meta = field.queryset.model._meta
+        model_field = meta.get_field(field.to_field_name) if field.to_field_name else meta.pk
+        keys = []
+        for v in value:
+            if v in ('', None):
+                continue
+            try:
+                keys.append(model_field.to_python(field.prepare_value(v)))
+            except (ValidationError, TypeError, ValueError):
+                pass
+        return keys
+    
+    def optgroups(self, name, value, attrs=None):
+        # Only the empty choice and the selected object are rendered; the
+        # field's queryset is still used in full to validate submissions.
+        field = self.choices.field
+        selected = self._valid_keys(field, value)
+        groups = []
+        if field.empty_label is not None:
+            groups.append((None, [self.create_option(name, '', field.empty_label, not selected, 0)], 0))
+        if selected:
+            objects = self.choices.queryset.filter(**{f'{field.to_field_name or "pk"}__in': selected})
+            for index, obj in enumerate(objects, start=len(groups)):
+                option = self.create_option(name, obj.pk, field.label_from_instance(obj), True, index)
+                groups.append((None, [option], index))
+        return groups
+
+
+def prefix_filter(queryset, text, fields):
+    """Every word in ``text`` must start one of ``fields`` (case-insensitive)"""
+    for word in text.split()[:MAX_TERMS]:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__istartswith': word})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def _prefix_indexes(model, fields, schema_editor):
+    """``(name, expression)`` of the index serving ``istartswith`` on each of ``fields``"""
+    qn = schema_editor.quote_name
+    vendor = schema_editor.connection.vendor
+    for name in fields:
+        column = model._meta.get_field(name).column
+        if vendor == 'postgresql':
+            # Django compares UPPER("column"::text) LIKE UPPER('prefix%')
+            expression = f'(UPPER({qn(column)}::text)) text_pattern_ops'
+        elif vendor == 'sqlite':
+            # SQLite's LIKE ignores case, and can only use a NOCASE index for it
+            expression = f'{qn(column)} COLLATE NOCASE'
+        else:
+            continue
+        yield qn(f'{model._meta.db_table}_{column}_prefix_idx'), expression
+
+
+def install_prefix_indexes(model, fields, schema_editor):
+    """Index ``fields`` of ``model`` for ``prefix_filter()``"""
+    for index, expression in _prefix_indexes(model, fields, schema_editor):
+        schema_editor.execute(f'CREATE INDEX {index} ON {schema_editor.quote_name(model._meta.db_table)} ({expression})')
+
+
+def uninstall_prefix_indexes(model, fields, schema_editor):
+    for index, expression in _prefix_indexes(model, fields, schema_editor):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+def autocomplete_response(request, queryset, ordering, label=str):
+    """One page of ``queryset`` as autocomplete JSON"""
+    page = CursorPaginator(queryset, ordering, PAGE_SIZE).get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': label(obj)} for obj in page],
+        'next': page.next_cursor,
+    })
@@ -0,0 +1,164 @@
+"""
+View benchmarks.
+
+``run_benchmarks()`` seeds one tenant per dataset size with the
+``generate_load_data`` command and drives the main views through the Django
+test client, recording latency percentiles, query count and peak Python
+memory per request. ``compare()`` checks a run against a saved baseline and
+gates on the median latency only: p95 over a few dozen requests is little more
+than the slowest one. The ``benchmark_views`` management command wraps both
+and takes care of the throwaway database.
+"""
+import logging
+import math
+import time
+import tracemalloc
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template import TemplateDoesNotExist
+from django.test import Client as TestClient
+from django.urls import reverse
+from accounts.models import Tenant, UserProfile
+from clients.models import Client
+from documents.models import Document
+from tasks.models import Task
+from .instrumentation import RequestMetrics
+
+
+# Absolute slack below which differences are treated as noise
+LATENCY_SLACK_MS = 2.0
+MEMORY_SLACK_KB = 64
+
+
+def _scenarios(client, task, document):
+    """``(name, url, clear_cache)`` for every benchmarked request"""
+    return [
+        ('dashboard', reverse('dashboard'), False),
+        ('dashboard (cold cache)', reverse('dashboard'), True),
+        ('client_list', reverse('clients:client_list'), False),
+        ('client_list (search)', reverse('clients:client_list') + '?search=smith', False),
+        ('client_detail', reverse('clients:client_detail', args=[client.pk]), False),
+        ('task_list', reverse('tasks:task_list'), False),
+        ('task_list (filtered)', reverse('tasks:task_list') + '?status=pending', False),
+        ('task_detail', reverse('tasks:task_detail', args=[task.pk]), False),
+        ('document_list', reverse('documents:document_list'), False),
+        ('document_download', reverse('documents:document_download', args=[document.pk]), False),
+    ]
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def _request(browser, url, clear_cache):
+    if clear_cache:
+        cache.clear()
+    response = browser.get(url)
+    if response.streaming:
+        # Downloads are only done once the body has been read
+        for chunk in response.streaming_content:
+            pass
+        response.close()
+    if response.status_code != 200:
+        raise AssertionError(f'GET {url} returned {response.status_code}')
+
+
+def measure(browser, url, clear_cache=False, iterations=20):
+    """Latency percentiles, query count and peak memory of one request"""
+    _request(browser, url, clear_cache)  # warm-up
+    
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        _request(browser, url, clear_cache)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    metrics = RequestMetrics()
+    with connection.execute_wrapper(metrics):
+        _request(browser, url, clear_cache)
+    
+    tracemalloc.start()
+    try:
+        _request(browser, url, clear_cache)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'p50_ms': round(_percentile(timings, 50), 2),
+        'p95_ms': round(_percentile(timings, 95), 2),
+        'queries': metrics.queries,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def seed(size, seed=42):
+    """Create a tenant with ``size`` clients and return its admin user"""
+    prefix = f'bench{size}'
+    call_command(
+        'generate_load_data', prefix=prefix, tenants=1, clients_per_tenant=size, seed=seed,
+        users_per_tenant=5, tasks_per_client=5, comments_per_task=2, documents_per_client=2,
+        stdout=StringIO(),
+    )
+    tenant = Tenant.objects.get(slug=f'{prefix}-1')
+    return UserProfile.objects.filter(tenant=tenant, role='admin').select_related('user').first().user
+
+
+def run_benchmarks(sizes, iterations=20, log=None):
+    """Benchmark every scenario at each dataset size"""
+    # Views whose template is missing are reported as skipped, not logged as errors
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        return _run(sizes, iterations, log)
+    finally:
+        request_logger.setLevel(level)
+
+
+def _run(sizes, iterations, log):
+    results = {}
+    for size in sizes:
+        user = seed(size)
+        tenant = user.profile.tenant
+        client = Client.objects.for_tenant(tenant).order_by('pk')[size // 2]
+        task = Task.objects.for_tenant(tenant).order_by('pk').first()
+        document = Document.objects.for_tenant(tenant).order_by('pk').first()
+    
+        browser = TestClient()
+        browser.force_login(user)
+        cache.clear()
+    
+        results[str(size)] = {}
+        for name, url, clear_cache in _scenarios(client, task, document):
+            try:
+                metrics = measure(browser, url, clear_cache, iterations)
+            except TemplateDoesNotExist as exc:
+                metrics = {'skipped': f'template {exc} does not exist'}
+            results[str(size)][name] = metrics
+            if log:
+                log(size, name, metrics)
+    return results
+
+
+def compare(baseline, results, threshold):
+    """Describe every metric in ``results`` that is worse than ``baseline``"""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, metrics in scenarios.items():
+            before = baseline.get(size, {}).get(name)
+            if not before or 'skipped' in metrics or 'skipped' in before:
+                continue
+    
+            label = f'{name} @ {size}'
+            if metrics['queries'] > before['queries']:
+                regressions.append(f"{label}: queries {before['queries']} -> {metrics['queries']}")
+            for key, slack in [('p50_ms', LATENCY_SLACK_MS), ('peak_memory_kb', MEMORY_SLACK_KB)]:
+                limit = max(before[key] * (1 + threshold), before[key] + slack)
+                if metrics[key] > limit:
+                    regressions.append(f'{label}: {key} {before[key]} -> {metrics[key]}')
+    return regressions
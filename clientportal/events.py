@@ -0,0 +1,165 @@
+"""
+Tenant-scoped push of task and comment changes over Server-Sent Events.
+
+Signal receivers call ``publish()``, which hands the event to the broker once
+the writing transaction has committed. The ``events`` view streams a
+tenant's events to the browser's ``EventSource`` through an ``EventStream``.
+
+Brokers move pre-encoded SSE frames between publishers and subscribers on
+per-tenant channels. The default ``InProcessBroker`` fans each frame out to
+the subscribers in the same process; a broker backed by Redis pub/sub or
+PostgreSQL ``LISTEN``/``NOTIFY`` can implement the same two methods to reach
+the other workers, and is selected with the ``EVENTS_BROKER`` setting.
+
+The stream is an async generator, so under ASGI an idle connection is a
+coroutine suspended on a small queue rather than a thread. Under WSGI there
+is no stream and pages keep polling.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+# Milliseconds the browser waits before reconnecting
+RETRY_MS = 5000
+
+
+def channel_name(tenant_id):
+    return f'tenant:{tenant_id}'
+
+
+def encode_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Broker:
+    """Interface for moving encoded events between publishers and subscribers"""
+    
+    def publish(self, channel, message):
+        """Deliver ``message`` to the current subscribers of ``channel``; callable from any thread"""
+        raise NotImplementedError
+    
+    def subscribe(self, channel):
+        """Return a ``Subscription`` to ``channel``; called from the event loop"""
+        raise NotImplementedError
+    
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    """One listener's queue of messages on one channel"""
+    
+    def __init__(self, broker, channel, max_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+        self.overflowed = False
+    
+    def deliver(self, message):
+        """Queue ``message``; runs in the subscription's event loop"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A listener this far behind has missed events; ending its stream
+            # makes the browser reconnect and reload instead of showing stale data.
+            self.overflowed = True
+    
+    async def get(self):
+        """The next message, or ``None`` once the subscription has fallen behind"""
+        if self.overflowed:
+            return None
+        return await self.queue.get()
+    
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    """Fan events out to the subscribers of this process"""
+    
+    def __init__(self, max_queue=None):
+        self.max_queue = max_queue or settings.EVENTS_MAX_QUEUE
+        self.subscriptions = {}
+        # publish() runs in request threads, subscribe() in the event loop
+        self.lock = threading.Lock()
+    
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's event loop has been closed
+                self.unsubscribe(subscription)
+    
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_queue)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENTS_BROKER)()
+
+
+def publish(tenant_id, event, data):
+    """Send ``event`` to ``tenant_id``'s listeners once the current transaction commits"""
+    message = encode_event(event, data)
+    transaction.on_commit(lambda: get_broker().publish(channel_name(tenant_id), message))
+
+
+class EventStream:
+    """SSE frames for one tenant, until the stream times out or falls behind.
+    
+    ``close()`` drops the subscription; ``StreamingHttpResponse`` calls it when
+    the response is closed, as well as the generator's own cleanup.
+    """
+    
+    def __init__(self, tenant_id, broker=None):
+        self.tenant_id = tenant_id
+        self.broker = broker or get_broker()
+        self.subscription = None
+    
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        # Reconnecting now and then picks up changes to the user's tenant or access
+        deadline = loop.time() + settings.EVENTS_STREAM_TIMEOUT
+        self.subscription = self.broker.subscribe(channel_name(self.tenant_id))
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    message = await asyncio.wait_for(self.subscription.get(), min(settings.EVENTS_HEARTBEAT, remaining))
+                except TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.close()
+    
+    def close(self):
+        if self.subscription is not None:
+            self.subscription.close()
@@ -0,0 +1,168 @@
+"""
+Per-request SQL and template instrumentation.
+
+``QueryInstrumentationMiddleware`` installs a ``connection.execute_wrapper``
+for the duration of each request and records the number of queries, the
+time spent in the database, repeated query shapes (the usual sign of an N+1
+loop) and template render time. The numbers are sent back in a
+``Server-Timing`` header, so they show up in the browser's network panel,
+and logged as one line per request on the ``clientportal.performance``
+logger.
+
+Views declare how many queries they may issue with ``@query_budget(n)``;
+views without one (including the admin) get ``QUERY_BUDGET_DEFAULT``, and
+``@query_budget(None)`` is for views whose queries grow with their input, and
+for streamed responses, whose body runs its queries after the budget has
+been checked. Going over budget is logged as a warning, or raises
+``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT`` is on, as it is under
+the test runner.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger('clientportal.performance')
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most queries a view may issue per request; ``None`` for no limit"""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class RequestMetrics:
+    """Counters for one request; also the ``execute_wrapper`` that fills them"""
+    
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[sql] += 1
+    
+    @property
+    def duplicates(self):
+        """Executions beyond the first of each query shape"""
+        return sum(count - 1 for count in self.shapes.values())
+    
+    def repeated_shapes(self, threshold=2):
+        return [(sql, count) for sql, count in self.shapes.most_common() if count >= threshold]
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+class TimedTemplate:
+    """Adds template render time to the current request's metrics"""
+    
+    def __init__(self, template):
+        self.template = template
+    
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+    
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            if metrics is not None:
+                metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render timing for the instrumentation"""
+    
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+    
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class QueryInstrumentationMiddleware:
+    """Measure every request's queries and template rendering"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.query_budget = settings.QUERY_BUDGET_DEFAULT
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total_time = time.perf_counter() - start
+    
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_ms(metrics.db_time)};desc="{metrics.queries} queries, {metrics.duplicates} duplicate"',
+            f'tpl;dur={_ms(metrics.template_time)}',
+            f'total;dur={_ms(total_time)}',
+        ])
+        logger.info(
+            '%s %s %s queries=%d duplicates=%d db_ms=%s template_ms=%s total_ms=%s',
+            request.method, request.path, response.status_code, metrics.queries, metrics.duplicates,
+            _ms(metrics.db_time), _ms(metrics.template_time), _ms(total_time),
+            extra={
+                'path': request.path,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                'duplicates': metrics.duplicates,
+                'db_ms': _ms(metrics.db_time),
+                'template_ms': _ms(metrics.template_time),
+                'total_ms': _ms(total_time),
+            },
+        )
+        self.check_budget(request, metrics)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(view_func, 'query_budget'):
+            request.query_budget = view_func.query_budget
+    
+    def check_budget(self, request, metrics):
+        budget = request.query_budget
+        if budget is None or metrics.queries <= budget:
+            return
+        repeated = '; '.join(f'{count}x {sql[:200]}' for sql, count in metrics.repeated_shapes()[:3])
+        message = (
+            f'{request.method} {request.path} issued {metrics.queries} queries '
+            f'(budget {budget}). Repeated: {repeated or "none"}'
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,139 @@
+"""
+Keyset (cursor) pagination for the list views.
+
+Pages are addressed by opaque tokens that encode the ordering values of the
+row at the page boundary, so fetching any page is a single indexed range
+query with no OFFSET and no COUNT(*). Ordering fields must be non-nullable
+and end with a unique column (normally ``id``) so every row has a distinct
+position. Numeric annotations such as ``search_rank`` may be used as well.
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _field_name(ordering_field):
+    return ordering_field.lstrip('-')
+
+
+class CursorPage:
+    """A page of results plus the cursors needed to move from it"""
+    
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+    
+    def __iter__(self):
+        return iter(self.object_list)
+    
+    def __len__(self):
+        return len(self.object_list)
+    
+    def __getitem__(self, index):
+        return self.object_list[index]
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+    
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class CursorPaginator:
+    """Paginate a queryset by seeking past the last row of the previous page"""
+    
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [self._field(_field_name(name)) for name in self.ordering]
+    
+    def _field(self, name):
+        if name in self.queryset.query.annotations:
+            return None
+        return self.queryset.model._meta.get_field(name)
+    
+    def encode_cursor(self, obj, backwards=False):
+        values = [
+            field.value_to_string(obj) if field else getattr(obj, _field_name(name))
+            for name, field in zip(self.ordering, self.fields)
+        ]
+        payload = json.dumps(['p' if backwards else 'n', values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            if direction not in ('n', 'p') or len(values) != len(self.fields):
+                raise ValueError
+            values = [
+                field.to_python(value) if field else float(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError) as e:
+            raise InvalidCursor(str(e))
+        return direction == 'p', values
+    
+    def _seek(self, values, backwards):
+        """Build the row-value comparison ``(a, b, c) > (x, y, z)`` as ORed terms"""
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            lookup = f'{_field_name(name)}__{"lt" if descending else "gt"}'
+            term = Q(**{lookup: values[index]})
+            for prefix_name, prefix_value in zip(self.ordering[:index], values[:index]):
+                term &= Q(**{_field_name(prefix_name): prefix_value})
+            condition |= term
+        return condition
+    
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+    
+    def get_page(self, cursor=None):
+        """Return the page after (or before) ``cursor``; bad cursors give the first page"""
+        backwards, values = False, None
+        if cursor:
+            try:
+                backwards, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                backwards, values = False, None
+        
+        queryset = self.queryset.order_by(
+            *(self._reversed_ordering() if backwards else self.ordering)
+        )
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        
+        if not rows:
+            return CursorPage([])
+        
+        if backwards:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], backwards=True) if has_previous else None,
+        )
@@ -0,0 +1,365 @@
+"""
+Full-text search for clients, tasks and documents.
+
+Each searchable model has an index kept in sync by the signal receivers in
+its app:
+
+* SQLite: an FTS5 virtual table ``<db_table>_fts`` keyed by the row id, with
+  the tenant stored as a token so a search only walks that tenant's postings.
+* PostgreSQL: a ``search_vector`` tsvector column on the model's own table,
+  covered by a GIN index.
+* Anything else falls back to the old ``icontains`` filters.
+
+``search()`` is the single entry point used by the list search forms. It
+filters a queryset down to matching rows and annotates ``search_rank``
+(higher is better) so results can be ordered and keyset-paginated with
+``RANKED_ORDERING``.
+
+An index may also cover a row that sits one-to-one beside the searched
+model and shares its primary key, such as the extracted text of a document.
+Such an index is only used when it is named in ``search()``, and annotates a
+``search_snippet`` of the matching text with the matched words between
+``SNIPPET_START`` and ``SNIPPET_END``; ``highlight()`` turns that into HTML.
+"""
+import re
+from itertools import islice
+from django.apps import apps as global_apps
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField, Q, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+RANKED_ORDERING = ['-search_rank', 'id']
+MAX_TERMS = 8
+BATCH_SIZE = 1000
+
+# Column weights map onto PostgreSQL setweight() labels and FTS5 bm25() weights
+WEIGHTS = {'A': 10.0, 'B': 5.0, 'C': 2.0, 'D': 1.0}
+
+# Control characters, which never occur in indexed text
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_WORDS = 24
+
+
+class SearchIndex:
+    """Which text goes into a model's search index, split into weighted columns"""
+    
+    def __init__(self, model_label, columns, dependents=(), relation=None, snippet=None):
+        self.model_label = model_label
+        # (column name, weight label, ORM paths whose values are concatenated)
+        self.columns = columns
+        # (model label, FK name) of indexes that embed this model's text
+        self.dependents = dependents
+        # Query name of this model from the model that is searched, when the
+        # two are different
+        self.relation = relation
+        # Column to annotate search_snippet from
+        self.snippet = snippet
+    
+    @property
+    def paths(self):
+        return [path for name, weight, paths in self.columns for path in paths]
+    
+    @property
+    def local_fields(self):
+        return [path for path in self.paths if '__' not in path]
+    
+    def model(self, apps=global_apps):
+        return apps.get_model(self.model_label)
+    
+    def snippet_field(self):
+        """Database column of the snippet column's text"""
+        name, weight, paths = next(column for column in self.columns if column[0] == self.snippet)
+        return self.model()._meta.get_field(paths[0]).column
+    
+    def documents(self, queryset):
+        """Yield ``(pk, tenant_id, [column text, ...])`` for each row"""
+        paths = self.paths
+        rows = queryset.order_by().values_list('pk', 'tenant_id', *paths)
+        for row in rows.iterator(chunk_size=2000):
+            values = dict(zip(paths, row[2:]))
+            yield row[0], row[1], [
+                normalize(values[path] for path in column_paths)
+                for name, weight, column_paths in self.columns
+            ]
+
+
+CLIENT_NAME = ['client__first_name', 'client__last_name']
+
+INDEXES = {
+    index.model_label: index for index in [
+        SearchIndex('clients.client', [
+            ('name', 'A', ['first_name', 'last_name']),
+            ('email', 'B', ['email']),
+            ('company', 'B', ['company']),
+        ], dependents=[('tasks.task', 'client'), ('documents.document', 'client')]),
+        SearchIndex('tasks.task', [
+            ('title', 'A', ['title']),
+            ('client', 'B', CLIENT_NAME),
+            ('description', 'C', ['description']),
+        ]),
+        SearchIndex('documents.document', [
+            ('title', 'A', ['title']),
+            ('client', 'B', CLIENT_NAME),
+            ('description', 'C', ['description']),
+        ]),
+        SearchIndex('documents.documenttext', [
+            ('body', 'A', ['text']),
+        ], relation='content', snippet='body'),
+    ]
+}
+
+
+def normalize(values):
+    """Reduce text to space-separated word tokens so every backend splits alike"""
+    return ' '.join(re.findall(r'\w+', ' '.join(value or '' for value in values)))
+
+
+def terms(text):
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+class SQLiteBackend:
+    def table(self, model):
+        return f'{model._meta.db_table}_fts'
+    
+    def install(self, index, model, cursor):
+        columns = ', '.join(['tenant'] + [name for name, weight, paths in index.columns])
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {_qn(self.table(model))} USING fts5("
+            f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    
+    def uninstall(self, index, model, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {_qn(self.table(model))}')
+    
+    def write(self, index, model, documents, cursor):
+        table = _qn(self.table(model))
+        self.delete(index, model, [pk for pk, tenant_id, columns in documents], cursor)
+        names = ', '.join(['rowid', 'tenant'] + [name for name, weight, paths in index.columns])
+        placeholders = ', '.join(['%s'] * (len(index.columns) + 2))
+        cursor.executemany(
+            f'INSERT INTO {table} ({names}) VALUES ({placeholders})',
+            [[pk, f't{tenant_id}', *columns] for pk, tenant_id, columns in documents],
+        )
+    
+    def delete(self, index, model, pks, cursor):
+        table = _qn(self.table(model))
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [[pk] for pk in pks])
+    
+    def search(self, index, queryset, words, tenant):
+        # Related indexes share the searched model's primary keys as rowids
+        fts_table = self.table(index.model())
+        table = _qn(fts_table)
+        names = [name for name, weight, paths in index.columns]
+        phrases = ' AND '.join(f'"{word}"*' for word in words)
+        match = f'tenant : "t{tenant.pk}" AND {{{" ".join(names)}}} : ({phrases})'
+        weights = ', '.join(['0'] + [str(WEIGHTS[weight]) for name, weight, paths in index.columns])
+        outer = f'{_qn(queryset.model._meta.db_table)}.{_qn("id")}'
+        # The FTS table is joined once, by rowid; bm25() and snippet() then
+        # read the matched row instead of running MATCH again for each result.
+        # extra() is the only way to add an unrelated table to the FROM clause.
+        queryset = queryset.extra(
+            tables=[fts_table], where=[f'{table}.rowid = {outer}', f'{table} MATCH %s'], params=[match],
+        ).annotate(search_rank=RawSQL(f'-bm25({table}, {weights})', [], output_field=FloatField()))
+        if index.snippet:
+            # Column numbers count the tenant column first
+            column = names.index(index.snippet) + 1
+            queryset = queryset.annotate(search_snippet=RawSQL(
+                f"snippet({table}, {column}, %s, %s, '…', {SNIPPET_WORDS})",
+                [SNIPPET_START, SNIPPET_END], output_field=TextField(),
+            ))
+        return queryset
+
+
+class PostgreSQLBackend:
+    column = 'search_vector'
+    
+    def install(self, index, model, cursor):
+        table = _qn(model._meta.db_table)
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {self.column} tsvector')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {_qn(model._meta.db_table + "_search_gin")} '
+            f'ON {table} USING GIN ({self.column})'
+        )
+    
+    def uninstall(self, index, model, cursor):
+        cursor.execute(f'ALTER TABLE {_qn(model._meta.db_table)} DROP COLUMN IF EXISTS {self.column}')
+    
+    def write(self, index, model, documents, cursor):
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{weight}')" for name, weight, paths in index.columns
+        )
+        cursor.executemany(
+            f'UPDATE {_qn(model._meta.db_table)} SET {self.column} = {vector} WHERE id = %s',
+            [[*columns, pk] for pk, tenant_id, columns in documents],
+        )
+    
+    def delete(self, index, model, pks, cursor):
+        # The vector lives on the row itself and goes away with it
+        pass
+    
+    def search(self, index, queryset, words, tenant):
+        query = ' & '.join(f'{word}:*' for word in words)
+        # ts_rank() returns real; as float8 the rank a cursor carries back
+        # compares equal to the row it came from
+        model = index.model()
+        if model is queryset.model:
+            vector = f'{_qn(queryset.model._meta.db_table)}.{self.column}'
+            return queryset.filter(
+                RawSQL(f"{vector} @@ to_tsquery('simple', %s)", [query], output_field=BooleanField())
+            ).annotate(search_rank=RawSQL(
+                f"ts_rank({vector}, to_tsquery('simple', %s))::float8", [query], output_field=FloatField(),
+            ))
+        
+        table = _qn(model._meta.db_table)
+        key = f'{table}.{_qn(model._meta.pk.column)}'
+        vector = f'{table}.{self.column}'
+        row = f'FROM {table} WHERE {key} = {_qn(queryset.model._meta.db_table)}.{_qn("id")}'
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT {key} FROM {table} WHERE {vector} @@ to_tsquery('simple', %s)", [query],
+        )).annotate(search_rank=RawSQL(
+            f"SELECT ts_rank({vector}, to_tsquery('simple', %s))::float8 {row}", [query], output_field=FloatField(),
+        ))
+        if index.snippet:
+            options = f'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords={SNIPPET_WORDS}, MinWords=8'
+            queryset = queryset.annotate(search_snippet=RawSQL(
+                f"SELECT ts_headline('simple', {table}.{_qn(index.snippet_field())}, to_tsquery('simple', %s), %s) {row}",
+                [query, options], output_field=TextField(),
+            ))
+        return queryset
+
+
+class LikeBackend:
+    """Unindexed fallback for databases without a supported full-text engine"""
+    
+    def install(self, index, model, cursor):
+        pass
+    
+    def uninstall(self, index, model, cursor):
+        pass
+    
+    def write(self, index, model, documents, cursor):
+        pass
+    
+    def delete(self, index, model, pks, cursor):
+        pass
+    
+    def search(self, index, queryset, words, tenant):
+        prefix = f'{index.relation}__' if index.relation else ''
+        for word in words:
+            condition = Q()
+            for path in index.paths:
+                condition |= Q(**{f'{prefix}{path}__icontains': word})
+            queryset = queryset.filter(condition)
+        if index.snippet:
+            queryset = queryset.annotate(search_snippet=Value('', output_field=TextField()))
+        return queryset.annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+
+def get_backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        return SQLiteBackend()
+    if vendor == 'postgresql':
+        return PostgreSQLBackend()
+    return LikeBackend()
+
+
+def _index_for(model):
+    return INDEXES.get(model._meta.label_lower)
+
+
+def search(queryset, text, tenant, index=None):
+    """Filter ``queryset`` to rows matching ``text`` and annotate ``search_rank``.
+    
+    ``index`` names a related index to search instead of the model's own.
+    """
+    index = INDEXES[index] if index else _index_for(queryset.model)
+    words = terms(text)
+    if not words:
+        return queryset
+    return get_backend().search(index, queryset, words, tenant)
+
+
+def is_ranked(queryset):
+    return 'search_rank' in queryset.query.annotations
+
+
+def highlight(snippet):
+    """HTML for a ``search_snippet``, with the matched words in ``<mark>``"""
+    html = escape(snippet or '').replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+    return mark_safe(html)
+
+
+def _write_batches(backend, index, model, queryset, cursor):
+    documents = index.documents(queryset)
+    while batch := list(islice(documents, BATCH_SIZE)):
+        backend.write(index, model, batch, cursor)
+
+
+def index_queryset(queryset):
+    """(Re)index every row of ``queryset``"""
+    index = _index_for(queryset.model)
+    # One transaction, not one commit per row written
+    with transaction.atomic(), connection.cursor() as cursor:
+        _write_batches(get_backend(), index, queryset.model, queryset, cursor)
+
+
+def track_changes(instance):
+    """Remember indexed field values so dependents are only reindexed on change"""
+    index = _index_for(type(instance))
+    instance._search_snapshot = [instance.__dict__.get(name) for name in index.local_fields]
+
+
+def index_instance(instance):
+    index = _index_for(type(instance))
+    model = type(instance)
+    index_queryset(model._base_manager.filter(pk=instance.pk))
+    
+    snapshot = getattr(instance, '_search_snapshot', None)
+    current = [instance.__dict__.get(name) for name in index.local_fields]
+    if snapshot is not None and snapshot != current:
+        index_dependents(model, [instance.pk])
+    instance._search_snapshot = current
+
+
+def index_dependents(model, pks):
+    """Reindex rows of other models that embed the text of ``model`` rows ``pks``"""
+    for label, field in _index_for(model).dependents:
+        dependent = global_apps.get_model(label)
+        index_queryset(dependent._base_manager.filter(**{f'{field}__in': pks}))
+
+
+def remove_instance(instance):
+    remove_pks(type(instance), [instance.pk])
+
+
+def remove_pks(model, pks):
+    """Drop deleted ``model`` rows from the index"""
+    with connection.cursor() as cursor:
+        get_backend().delete(_index_for(model), model, pks, cursor)
+
+
+def install_index(model_label, schema_editor, apps=global_apps):
+    """Create and populate the index for a model; used by migrations"""
+    index = INDEXES[model_label]
+    model = index.model(apps)
+    backend = get_backend(schema_editor.connection.vendor)
+    with schema_editor.connection.cursor() as cursor:
+        backend.install(index, model, cursor)
+        _write_batches(backend, index, model, model._base_manager.all(), cursor)
+
+
+def uninstall_index(model_label, schema_editor, apps=global_apps):
+    index = INDEXES[model_label]
+    backend = get_backend(schema_editor.connection.vendor)
+    with schema_editor.connection.cursor() as cursor:
+        backend.uninstall(index, index.model(apps), cursor)
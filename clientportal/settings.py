@@ -51,11 +51,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'clientportal.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.tenancy.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +66,7 @@ ROOT_URLCONF = 'clientportal.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'clientportal.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -91,6 +93,48 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Cached dashboard statistics and tenant contexts are invalidated on writes,
+# which only reaches other workers through a shared cache. LocMemCache is
+# private to one process, so it only suits a single-process server; set
+# CACHE_BACKEND to django.core.cache.backends.redis.RedisCache (or a
+# Memcached backend) and CACHE_LOCATION to its URL everywhere else.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Seconds a tenant's dashboard statistics may be served from cache
+DASHBOARD_STATS_CACHE_TIMEOUT = config('DASHBOARD_STATS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds a user's resolved tenant and role may be served from cache
+TENANT_CONTEXT_CACHE_TIMEOUT = config('TENANT_CONTEXT_CACHE_TIMEOUT', default=60, cast=int)
+
+# Dotted path of the broker that carries task and comment events to the SSE streams
+EVENTS_BROKER = config('EVENTS_BROKER', default='clientportal.events.InProcessBroker')
+
+# Events a slow listener may have queued before its stream is closed
+EVENTS_MAX_QUEUE = config('EVENTS_MAX_QUEUE', default=100, cast=int)
+
+# Seconds between keep-alive comments on an idle event stream
+EVENTS_HEARTBEAT = config('EVENTS_HEARTBEAT', default=20, cast=int)
+
+# Seconds an event stream stays open before the browser is made to reconnect
+EVENTS_STREAM_TIMEOUT = config('EVENTS_STREAM_TIMEOUT', default=300, cast=int)
+
+# Queries a view may issue unless it declares its own @query_budget
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=50, cast=int)
+
+# Raise instead of logging when a view goes over budget; TEST_RUNNER turns it on
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+
+TEST_RUNNER = 'clientportal.test_runner.TestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,6 +179,45 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Document downloads: 'stream' serves files from Django in chunks, while
+# 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache/lighttpd) hand the
+# transfer to the front-end server once the tenant check has passed.
+DOCUMENT_DOWNLOAD_MODE = config('DOCUMENT_DOWNLOAD_MODE', default='stream')
+# Internal nginx location that maps onto MEDIA_ROOT for X-Accel-Redirect
+DOCUMENT_ACCEL_REDIRECT_PREFIX = config('DOCUMENT_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+
+# Store each tenant's documents once per distinct content, under blobs/ keyed by
+# SHA-256 and shared by reference; existing files move over with deduplicate_documents
+DOCUMENT_CONTENT_ADDRESSED = config('DOCUMENT_CONTENT_ADDRESSED', default=False, cast=bool)
+
+# Hash uploads as they are received, so saving a document does not read the file again
+FILE_UPLOAD_HANDLERS = [
+    'documents.uploadhandlers.HashingMemoryFileUploadHandler',
+    'documents.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Chunked document uploads: the largest file accepted, the chunk size clients
+# are told to send (S3 multipart parts must be at least 5 MB) and how long an
+# abandoned upload is kept before purge_stale_uploads removes it
+DOCUMENT_MAX_UPLOAD_SIZE = config('DOCUMENT_MAX_UPLOAD_SIZE', default=500 * 1024 * 1024, cast=int)
+DOCUMENT_UPLOAD_CHUNK_SIZE = config('DOCUMENT_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+DOCUMENT_UPLOAD_EXPIRY_HOURS = config('DOCUMENT_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
+# Processes that render previews and extract text from uploads (0 does the
+# work in the request thread)
+DOCUMENT_WORKERS = config('DOCUMENT_WORKERS', default=2, cast=int)
+
+# Document previews: JPEG thumbnails of images and of PDFs' first pages, cached
+# on disk by content hash. The preview view waits up to DOCUMENT_PREVIEW_WAIT
+# seconds for one that is still being rendered.
+DOCUMENT_PREVIEW_ROOT = config('DOCUMENT_PREVIEW_ROOT', default=str(BASE_DIR / 'previews'))
+DOCUMENT_PREVIEW_SIZE = config('DOCUMENT_PREVIEW_SIZE', default=320, cast=int)
+DOCUMENT_PREVIEW_WAIT = config('DOCUMENT_PREVIEW_WAIT', default=5, cast=float)
+
+# Text extracted from TXT, DOCX and PDF uploads for content search is cut off
+# after this many characters
+DOCUMENT_TEXT_MAX_LENGTH = config('DOCUMENT_TEXT_MAX_LENGTH', default=1000000, cast=int)
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -0,0 +1,106 @@
+"""
+Dashboard statistics for a tenant.
+
+Totals, status breakdowns and "this month" counters are read from the
+``TenantDailyStats`` rollups in one query; the time-relative task counters
+come from a single conditional-aggregation query. The whole result is cached
+per tenant. The cache entry is dropped, once the writing transaction
+commits, by the ``post_save``/``post_delete`` receivers in the clients,
+tasks and documents apps, and expires after
+``DASHBOARD_STATS_CACHE_TIMEOUT`` seconds so time-relative counters (overdue,
+due today) and bulk ``update()`` calls that bypass signals never stay stale
+for long.
+"""
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from accounts.models import TenantDailyStats
+from accounts.rollups import created_metric, status_metric
+from clients.models import Client
+from tasks.models import Task
+from documents.models import Document
+
+
+OPEN_TASK_STATUSES = ['pending', 'in_progress']
+RECENT_ITEMS = 5
+
+
+def dashboard_cache_key(tenant_id):
+    return f'dashboard-stats:{tenant_id}'
+
+
+def invalidate_dashboard_stats(tenant_id):
+    """Drop the cached dashboard statistics for a tenant once the current transaction commits"""
+    # Dropped any earlier, a dashboard request could cache the old numbers again
+    transaction.on_commit(partial(cache.delete, dashboard_cache_key(tenant_id)))
+
+
+def _by_status(totals, app_label, choices):
+    counts = [
+        {'status': value, 'count': totals.get(status_metric(app_label, value), 0)}
+        for value in sorted(value for value, label in choices)
+    ]
+    return [row for row in counts if row['count']]
+
+
+def compute_dashboard_stats(tenant):
+    """Compute dashboard statistics for a tenant, bypassing the cache"""
+    now = timezone.now()
+    today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow_start = today_start + timedelta(days=1)
+    month_start = today_start.date() - timedelta(days=30)
+    
+    totals, this_month = {}, {}
+    rollups = TenantDailyStats.objects.filter(tenant=tenant).values('metric').annotate(
+        total=Sum('value'),
+        this_month=Sum('value', filter=Q(day__gte=month_start)),
+    ).order_by()
+    for row in rollups:
+        totals[row['metric']] = row['total']
+        this_month[row['metric']] = row['this_month'] or 0
+    
+    task_stats = Task.objects.for_tenant(tenant).aggregate(
+        overdue=Count('id', filter=Q(status__in=OPEN_TASK_STATUSES, due_date__lt=now)),
+        due_today=Count('id', filter=Q(
+            status__in=OPEN_TASK_STATUSES,
+            due_date__gte=today_start,
+            due_date__lt=tomorrow_start,
+        )),
+    )
+    
+    return {
+        'total_clients': totals.get(created_metric('clients'), 0),
+        'active_clients': totals.get(status_metric('clients', 'active'), 0),
+        'new_clients_this_month': this_month.get(created_metric('clients'), 0),
+        'total_tasks': totals.get(created_metric('tasks'), 0),
+        'pending_tasks': totals.get(status_metric('tasks', 'pending'), 0),
+        'overdue_tasks': task_stats['overdue'],
+        'tasks_due_today': task_stats['due_today'],
+        'total_documents': totals.get(created_metric('documents'), 0),
+        'documents_this_month': this_month.get(created_metric('documents'), 0),
+        'recent_clients': list(
+            Client.objects.for_tenant(tenant).order_by('-created_at')[:RECENT_ITEMS]
+        ),
+        'recent_tasks': list(
+            Task.objects.for_tenant(tenant).order_by('-created_at')[:RECENT_ITEMS]
+        ),
+        'recent_documents': list(
+            Document.objects.for_tenant(tenant).order_by('-created_at')[:RECENT_ITEMS]
+        ),
+        'tasks_by_status': _by_status(totals, 'tasks', Task.TASK_STATUS),
+        'clients_by_status': _by_status(totals, 'clients', Client.CLIENT_STATUS),
+    }
+
+
+def get_dashboard_stats(tenant):
+    """Return dashboard statistics for a tenant, served from cache when possible"""
+    key = dashboard_cache_key(tenant.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats(tenant)
+        cache.set(key, stats, settings.DASHBOARD_STATS_CACHE_TIMEOUT)
+    return stats
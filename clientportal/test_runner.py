@@ -0,0 +1,19 @@
+"""
+The runner behind ``manage.py test``.
+
+Query budgets are enforced while the tests run, so a view that goes over its
+``@query_budget`` fails its test instead of logging a warning.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.strict_budgets = override_settings(QUERY_BUDGET_STRICT=True)
+        self.strict_budgets.enable()
+    
+    def teardown_test_environment(self, **kwargs):
+        self.strict_budgets.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,522 @@
+import asyncio
+import csv
+import json
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Tenant, UserProfile
+from accounts.tenancy import use_tenant
+from clients.models import Client
+from documents.forms import DocumentSearchForm
+from documents.models import Document
+from tasks.models import Task, TaskComment
+from . import events, search
+from .autocomplete import USER_SEARCH_FIELDS, prefix_filter
+from .benchmarks import compare, run_benchmarks
+from .exports import EXPORTS
+from .instrumentation import QueryBudgetExceeded, RequestMetrics
+from .pagination import CursorPaginator
+from .stats import dashboard_cache_key, get_dashboard_stats
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client_obj = Client.objects.create(
+            tenant=self.tenant, first_name='John', last_name='Smith',
+            email='john@example.com', status='active',
+        )
+        Task.objects.create(
+            tenant=self.tenant, client=self.client_obj, title='Overdue',
+            status='pending', due_date=timezone.now() - timedelta(days=1),
+        )
+        Task.objects.create(
+            tenant=self.tenant, client=self.client_obj, title='Done', status='completed',
+        )
+    
+    def test_counters(self):
+        stats = get_dashboard_stats(self.tenant)
+        self.assertEqual(stats['total_clients'], 1)
+        self.assertEqual(stats['active_clients'], 1)
+        self.assertEqual(stats['new_clients_this_month'], 1)
+        self.assertEqual(stats['total_tasks'], 2)
+        self.assertEqual(stats['pending_tasks'], 1)
+        self.assertEqual(stats['overdue_tasks'], 1)
+        self.assertEqual(stats['tasks_by_status'], [
+            {'status': 'completed', 'count': 1},
+            {'status': 'pending', 'count': 1},
+        ])
+    
+    def test_cached_until_write(self):
+        get_dashboard_stats(self.tenant)
+        with self.assertNumQueries(0):
+            stats = get_dashboard_stats(self.tenant)
+        self.assertEqual(stats['total_tasks'], 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(tenant=self.tenant, client=self.client_obj, title='New')
+            # Dropped only once the write commits, so it cannot be re-cached stale
+            self.assertIsNotNone(cache.get(dashboard_cache_key(self.tenant.pk)))
+        self.assertEqual(get_dashboard_stats(self.tenant)['total_tasks'], 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_obj.delete()
+        stats = get_dashboard_stats(self.tenant)
+        self.assertEqual(stats['total_clients'], 0)
+        self.assertEqual(stats['total_tasks'], 0)
+    
+    def test_dashboard_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_clients'], 1)
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        for i in range(7):
+            Client.objects.create(
+                tenant=self.tenant, first_name=f'First{i}', last_name=f'Last{i % 3}',
+                email=f'c{i}@example.com',
+            )
+        self.queryset = Client.objects.for_tenant(self.tenant)
+        self.ordering = ['last_name', 'first_name', 'id']
+        self.expected = list(self.queryset.order_by(*self.ordering))
+    
+    def test_walks_forwards_and_backwards(self):
+        paginator = CursorPaginator(self.queryset, self.ordering, 3)
+        pages = [paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([obj for page in pages for obj in page], self.expected)
+        self.assertFalse(pages[0].has_previous)
+        
+        previous = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertTrue(previous.has_next)
+        first = paginator.get_page(previous.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous)
+    
+    def test_descending_ordering(self):
+        paginator = CursorPaginator(self.queryset, ['-created_at', '-id'], 4)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        expected = list(self.queryset.order_by('-created_at', '-id'))
+        self.assertEqual(list(first) + list(second), expected)
+    
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(self.queryset, self.ordering, 3)
+        self.assertEqual(list(paginator.get_page('not-a-cursor')), self.expected[:3])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.other = Tenant.objects.create(name='Other', slug='other')
+        self.john = Client.objects.create(
+            tenant=self.tenant, first_name='John', last_name='Smith',
+            email='john.smith@acme.com', company='Acme Corporation',
+        )
+        self.jane = Client.objects.create(
+            tenant=self.tenant, first_name='Jane', last_name='Doe',
+            email='jane@smithson.com', company='Initech',
+        )
+        Client.objects.create(
+            tenant=self.other, first_name='John', last_name='Smith', email='john@other.com',
+        )
+    
+    def search_clients(self, text, tenant=None):
+        tenant = tenant or self.tenant
+        queryset = search.search(Client.objects.for_tenant(tenant), text, tenant)
+        return list(queryset.order_by(*search.RANKED_ORDERING))
+    
+    def test_prefix_search_is_tenant_scoped(self):
+        self.assertEqual(self.search_clients('jo smi'), [self.john])
+        self.assertEqual(self.search_clients('initech'), [self.jane])
+        self.assertEqual(len(self.search_clients('john', self.other)), 1)
+    
+    def test_results_are_ranked(self):
+        # A name match outranks an email match
+        self.assertEqual(self.search_clients('smith'), [self.john, self.jane])
+    
+    def test_index_follows_writes(self):
+        task = Task.objects.create(tenant=self.tenant, client=self.john, title='Quarterly review')
+        tasks = Task.objects.for_tenant(self.tenant)
+        self.assertEqual(list(search.search(tasks, 'quarterly smith', self.tenant)), [task])
+        
+        self.john.last_name = 'Brown'
+        self.john.save()
+        self.assertEqual(list(search.search(tasks, 'brown', self.tenant)), [task])
+        self.assertEqual(list(search.search(tasks, 'quarterly smith', self.tenant)), [])
+        
+        self.john.delete()
+        self.assertEqual(self.search_clients('brown'), [])
+    
+    def test_ranked_results_paginate(self):
+        for i in range(5):
+            Client.objects.create(
+                tenant=self.tenant, first_name='Smith', last_name=f'Number{i}', email=f's{i}@example.com',
+            )
+        queryset = search.search(Client.objects.for_tenant(self.tenant), 'smith', self.tenant)
+        paginator = CursorPaginator(queryset, search.RANKED_ORDERING, 3)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(list(first) + list(second) + list(third), self.search_clients('smith'))
+        self.assertFalse(third.has_next)
+
+
+APP_TABLES = ['auth_user', 'clients_client', 'tasks_task', 'tasks_taskcomment', 'documents_document', 'accounts_tenantdailystats']
+
+
+def plan_problems(sql, allow_sort=False):
+    """Full scans and ORDER BY sorts in the database's plan for ``sql``"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+            scans = [d for d in details if d.startswith('SCAN ') and 'VIRTUAL TABLE' not in d]
+            sorts = [d for d in details if 'TEMP B-TREE FOR' in d and 'ORDER BY' in d]
+        else:
+            # Tiny test tables always favour a sequential scan; make the
+            # planner show what it would do with realistic row counts
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            details = [row[0].strip() for row in cursor.fetchall()]
+            scans = [d for d in details if re.search(r'Seq Scan on (%s)\b' % '|'.join(APP_TABLES), d)]
+            sorts = [d for d in details if re.match(r'(->\s+)?(Incremental )?Sort\b', d)]
+    return scans + ([] if allow_sort else sorts)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'EXPLAIN output is parsed for SQLite and PostgreSQL')
+class QueryPlanTests(TestCase):
+    """The main queries of each view must use an index for both filtering and ordering"""
+    
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client.force_login(self.user)
+        for n in range(25):
+            client = Client.objects.create(
+                tenant=self.tenant, first_name='Client', last_name=f'{n:02d}', email=f'c{n}@example.com',
+            )
+            Task.objects.create(tenant=self.tenant, client=client, title=f'Task {n}')
+        self.client_obj = client
+    
+    def assertIndexed(self, queries, allow_sort=False):
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with self.subTest(sql=query['sql']):
+                self.assertEqual(plan_problems(query['sql'], allow_sort), [])
+    
+    def assertViewIndexed(self, url, allow_sort=False):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIndexed(queries, allow_sort)
+        return response
+    
+    def assertQuerysetsIndexed(self, *querysets):
+        with use_tenant(self.tenant), CaptureQueriesContext(connection) as queries:
+            for queryset in querysets:
+                list(queryset)
+        self.assertIndexed(queries)
+    
+    def test_dashboard(self):
+        self.assertViewIndexed(reverse('dashboard'))
+    
+    def test_client_list(self):
+        url = reverse('clients:client_list')
+        response = self.assertViewIndexed(url)
+        self.assertViewIndexed(f"{url}?cursor={response.context['page_obj'].next_cursor}")
+        self.assertViewIndexed(f'{url}?status=active')
+        # Ranked results are sorted by relevance, but must not scan the table
+        self.assertViewIndexed(f'{url}?search=client', allow_sort=True)
+    
+    def test_task_list(self):
+        url = reverse('tasks:task_list')
+        response = self.assertViewIndexed(url)
+        self.assertViewIndexed(f"{url}?cursor={response.context['page_obj'].next_cursor}")
+        self.assertViewIndexed(f'{url}?status=pending')
+    
+    def test_document_list(self):
+        # Same queries as the document list view
+        documents = DocumentSearchForm({'document_type': 'contract'}, tenant=self.tenant).filter_queryset(
+            Document.objects.for_tenant(self.tenant), self.tenant
+        )
+        self.assertQuerysetsIndexed(
+            CursorPaginator(Document.objects.for_tenant(self.tenant), ['-created_at', '-id'], 20).get_page().object_list,
+            CursorPaginator(documents, ['-created_at', '-id'], 20).get_page().object_list,
+        )
+    
+    def test_client_detail(self):
+        for n in range(15):
+            Task.objects.create(tenant=self.tenant, client=self.client_obj, title=f'Follow-up {n}')
+        response = self.assertViewIndexed(reverse('clients:client_detail', args=[self.client_obj.pk]))
+        cursor = response.context['tasks'].next_cursor
+        self.assertViewIndexed(reverse('clients:client_tasks', args=[self.client_obj.pk]) + f'?cursor={cursor}')
+        self.assertViewIndexed(reverse('clients:client_documents', args=[self.client_obj.pk]))
+    
+    def test_task_detail(self):
+        task = Task.objects.for_tenant(self.tenant).get(title='Task 0')
+        for n in range(25):
+            TaskComment.objects.create(task=task, author=self.user, content=f'Comment {n}')
+        response = self.assertViewIndexed(reverse('tasks:task_detail', args=[task.pk]))
+        feed = reverse('tasks:task_comment_feed', args=[task.pk])
+        self.assertViewIndexed(f"{feed}?after={response.context['last_comment_id']}")
+        self.assertViewIndexed(f"{feed}?since={timezone.now().isoformat().replace('+', '%2B')}")
+    
+    def test_autocomplete(self):
+        self.assertViewIndexed(reverse('clients:client_autocomplete'))
+        # A tenant's users are found through the profile index and sorted by
+        # username afterwards; there is no single index across both tables
+        self.assertViewIndexed(reverse('tasks:assignee_autocomplete'), allow_sort=True)
+        # The prefix match itself is served by the functional indexes
+        self.assertQuerysetsIndexed(prefix_filter(User.objects.all(), 'ali smi', USER_SEARCH_FIELDS))
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_superuser('alice', 'alice@example.com', 'secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client.force_login(self.user)
+    
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries, 0 duplicate"', timing)
+        self.assertRegex(timing, r'tpl;dur=\d+\.\d+')
+        self.assertRegex(timing, r'total;dur=\d+\.\d+')
+    
+    def test_duplicate_shapes_are_counted(self):
+        metrics = RequestMetrics()
+        for pk in range(3):
+            metrics(lambda *args: None, 'SELECT * FROM t WHERE id = %s', [pk], False, {})
+        metrics(lambda *args: None, 'SELECT 1', [], False, {})
+        self.assertEqual(metrics.queries, 4)
+        self.assertEqual(metrics.duplicates, 2)
+        self.assertEqual(metrics.repeated_shapes(), [('SELECT * FROM t WHERE id = %s', 3)])
+    
+    @override_settings(QUERY_BUDGET_DEFAULT=1)
+    def test_admin_views_use_default_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('admin:clients_client_changelist'))
+        
+        with override_settings(QUERY_BUDGET_STRICT=False):
+            with self.assertLogs('clientportal.performance', 'WARNING') as logs:
+                response = self.client.get(reverse('admin:clients_client_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('(budget 1)', logs.output[0])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.ada = Client.objects.create(
+            tenant=self.tenant, first_name='Ada', last_name='Lovelace', email='ada@example.com',
+            notes='Likes commas, "quotes"\nand newlines',
+        )
+        Task.objects.create(tenant=self.tenant, client=self.ada, title='File taxes', assigned_to=self.user)
+        Task.objects.create(tenant=self.tenant, client=self.ada, title='Unassigned')
+        
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        Task.objects.create(tenant=other, client=hank, title='Hidden')
+        self.client.force_login(self.user)
+    
+    def download(self, name, format):
+        response = self.client.get(reverse('export', args=[name, format]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+    
+    def test_csv_export(self):
+        response, body = self.download('clients', 'csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="acme-clients.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['email'], 'ada@example.com')
+        self.assertEqual(rows[0]['notes'], 'Likes commas, "quotes"\nand newlines')
+    
+    def test_jsonl_export_is_tenant_scoped(self):
+        response, body = self.download('tasks', 'jsonl')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['File taxes', 'Unassigned'])
+        self.assertEqual(rows[0]['client_email'], 'ada@example.com')
+        self.assertEqual(rows[0]['assigned_to'], 'alice')
+        self.assertIsNone(rows[1]['assigned_to'])
+        self.assertEqual(list(rows[0]), EXPORTS['tasks'].headers)
+    
+    def test_rows_are_read_with_an_iterator(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(EXPORTS['documents'].rows(self.tenant))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].endswith('ORDER BY "documents_document"."id" ASC'))
+    
+    def test_unknown_export(self):
+        response = self.client.get(reverse('export', args=['users', 'csv']))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('export', args=['clients', 'xml']))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_management_command(self):
+        out = StringIO()
+        call_command('export_tenant_data', 'acme', 'tasks', format='jsonl', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/clients.csv'
+            call_command('export_tenant_data', 'acme', 'clients', output=path, stderr=StringIO())
+            with open(path, newline='') as handle:
+                self.assertEqual([row['last_name'] for row in csv.DictReader(handle)], ['Lovelace'])
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.ada = Client.objects.create(tenant=self.tenant, first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.task = Task.objects.create(tenant=self.tenant, client=self.ada, title='File taxes')
+    
+    def test_wsgi_requests_are_not_streamed(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('events'))
+        self.assertEqual(response.status_code, 204)
+    
+    async def test_stream_carries_only_the_tenants_events(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('events'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+            broker = events.get_broker()
+            broker.publish(events.channel_name(self.tenant.pk + 1), events.encode_event('task.updated', {'id': 0}))
+            broker.publish(events.channel_name(self.tenant.pk), events.encode_event('task.updated', {'id': self.task.pk}))
+            frame = await asyncio.wait_for(anext(stream), 1)
+        finally:
+            response.close()
+        self.assertEqual(frame, f'event: task.updated\ndata: {{"id":{self.task.pk}}}\n\n'.encode())
+        self.assertEqual(broker.subscriptions, {})
+    
+    @override_settings(EVENTS_HEARTBEAT=0.01)
+    async def test_idle_stream_sends_keep_alives(self):
+        stream = aiter(events.EventStream(self.tenant.pk, events.InProcessBroker()))
+        try:
+            await anext(stream)
+            self.assertEqual(await anext(stream), ': keep-alive\n\n')
+        finally:
+            await stream.aclose()
+    
+    @override_settings(EVENTS_STREAM_TIMEOUT=0)
+    async def test_stream_ends_at_its_timeout(self):
+        broker = events.InProcessBroker()
+        frames = [frame async for frame in events.EventStream(self.tenant.pk, broker)]
+        self.assertEqual(frames, ['retry: 5000\n\n'])
+        self.assertEqual(broker.subscriptions, {})
+    
+    async def test_publish_from_another_thread(self):
+        broker = events.InProcessBroker()
+        subscription = broker.subscribe('tenant:1')
+        thread = threading.Thread(target=broker.publish, args=('tenant:1', 'hello'))
+        thread.start()
+        thread.join()
+        self.assertEqual(await asyncio.wait_for(subscription.get(), 1), 'hello')
+        subscription.close()
+        self.assertEqual(broker.subscriptions, {})
+    
+    async def test_listener_that_falls_behind_is_dropped(self):
+        broker = events.InProcessBroker(max_queue=2)
+        stream = aiter(events.EventStream(self.tenant.pk, broker))
+        await anext(stream)
+        for n in range(3):
+            broker.publish(events.channel_name(self.tenant.pk), f'message {n}')
+        await asyncio.sleep(0)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(broker.subscriptions, {})
+    
+    def test_task_and_comment_writes_are_published_after_commit(self):
+        with mock.patch.object(events.get_broker(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.task.status = 'in_progress'
+                self.task.save()
+                self.task.comments.create(author=self.user, content='Started')
+                self.assertFalse(publish.called)
+        self.assertEqual(publish.call_count, 2)
+        channel, message = publish.call_args_list[0].args
+        self.assertEqual(channel, f'tenant:{self.tenant.pk}')
+        self.assertTrue(message.startswith('event: task.updated\n'))
+        self.assertIn('"status_display":"In Progress"', message)
+        self.assertTrue(publish.call_args_list[1].args[1].startswith('event: comment.created\n'))
+
+
+class BenchmarkTests(TestCase):
+    def test_compare_flags_regressions_beyond_threshold(self):
+        baseline = {'100': {
+            'dashboard': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 4, 'peak_memory_kb': 500.0},
+            'client_detail': {'skipped': 'template missing'},
+        }}
+        same = {'100': {'dashboard': {'p50_ms': 11.0, 'p95_ms': 21.0, 'queries': 4, 'peak_memory_kb': 520.0}}}
+        self.assertEqual(compare(baseline, same, 0.25), [])
+        
+        worse = {'100': {
+            'dashboard': {'p50_ms': 14.0, 'p95_ms': 60.0, 'queries': 5, 'peak_memory_kb': 700.0},
+            'client_detail': {'p50_ms': 1.0, 'p95_ms': 1.0, 'queries': 1, 'peak_memory_kb': 1.0},
+        }}
+        self.assertEqual(compare(baseline, worse, 0.25), [
+            'dashboard @ 100: queries 4 -> 5',
+            'dashboard @ 100: p50_ms 10.0 -> 14.0',
+            'dashboard @ 100: peak_memory_kb 500.0 -> 700.0',
+        ])
+    
+    def test_missing_baseline_is_an_error(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        missing = f'{directory}/baseline.json'
+        with mock.patch('accounts.management.commands.benchmark_views.Command.run') as run:
+            with self.assertRaisesMessage(CommandError, 'run with --update-baseline'):
+                call_command('benchmark_views', baseline=missing)
+        run.assert_not_called()
+    
+    def test_run_records_every_view(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root, QUERY_BUDGET_STRICT=False):
+            results = run_benchmarks([5], iterations=2)
+        dashboard = results['5']['dashboard']
+        self.assertEqual(set(dashboard), {'p50_ms', 'p95_ms', 'queries', 'peak_memory_kb'})
+        self.assertGreater(results['5']['document_download']['queries'], 0)
+        self.assertIn('client_detail', results['5'])
@@ -23,6 +23,8 @@ from . import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.dashboard, name='dashboard'),
+    path('events/', views.events, name='events'),
+    path('exports/<slug:name>.<slug:format>', views.export, name='export'),
     path('accounts/', include('django.contrib.auth.urls')),
     path('clients/', include('clients.urls')),
     path('tasks/', include('tasks.urls')),
@@ -1,84 +1,52 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
-from django.utils import timezone
-from datetime import timedelta
-from clients.models import Client
-from tasks.models import Task
-from documents.models import Document
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_GET
+from accounts.tenancy import tenant_required
+from .events import EventStream
+from .exports import EXPORTS, FORMATS, export_filename, stream_export
+from .instrumentation import query_budget
+from .stats import get_dashboard_stats
 
 
-@login_required
+@query_budget(10)
+@tenant_required
 def dashboard(request):
     """Main dashboard view with overview statistics"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
+    tenant = request.tenant
     
-    tenant = request.user.profile.tenant
+    # Counters, recent activity and status breakdowns are cached per tenant
+    context = dict(get_dashboard_stats(tenant))
     
-    # Get date ranges
-    today = timezone.now().date()
-    thirty_days_ago = today - timedelta(days=30)
-    
-    # Client statistics
-    total_clients = Client.objects.filter(tenant=tenant).count()
-    active_clients = Client.objects.filter(tenant=tenant, status='active').count()
-    new_clients_this_month = Client.objects.filter(
-        tenant=tenant, 
-        created_at__date__gte=thirty_days_ago
-    ).count()
-    
-    # Task statistics
-    total_tasks = Task.objects.filter(tenant=tenant).count()
-    pending_tasks = Task.objects.filter(tenant=tenant, status='pending').count()
-    overdue_tasks = Task.objects.filter(
-        tenant=tenant,
-        status__in=['pending', 'in_progress'],
-        due_date__lt=timezone.now()
-    ).count()
-    tasks_due_today = Task.objects.filter(
-        tenant=tenant,
-        status__in=['pending', 'in_progress'],
-        due_date__date=today
-    ).count()
-    
-    # Document statistics
-    total_documents = Document.objects.filter(tenant=tenant).count()
-    documents_this_month = Document.objects.filter(
-        tenant=tenant,
-        created_at__date__gte=thirty_days_ago
-    ).count()
-    
-    # Recent activity
-    recent_clients = Client.objects.filter(tenant=tenant).order_by('-created_at')[:5]
-    recent_tasks = Task.objects.filter(tenant=tenant).order_by('-created_at')[:5]
-    recent_documents = Document.objects.filter(tenant=tenant).order_by('-created_at')[:5]
-    
-    # Tasks by status
-    tasks_by_status = Task.objects.filter(tenant=tenant).values('status').annotate(
-        count=Count('id')
-    ).order_by('status')
-    
-    # Clients by status
-    clients_by_status = Client.objects.filter(tenant=tenant).values('status').annotate(
-        count=Count('id')
-    ).order_by('status')
-    
-    context = {
-        'total_clients': total_clients,
-        'active_clients': active_clients,
-        'new_clients_this_month': new_clients_this_month,
-        'total_tasks': total_tasks,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': overdue_tasks,
-        'tasks_due_today': tasks_due_today,
-        'total_documents': total_documents,
-        'documents_this_month': documents_this_month,
-        'recent_clients': recent_clients,
-        'recent_tasks': recent_tasks,
-        'recent_documents': recent_documents,
-        'tasks_by_status': tasks_by_status,
-        'clients_by_status': clients_by_status,
-    }
-    
-    return render(request, 'dashboard.html', context) 
\ No newline at end of file
+    return render(request, 'dashboard.html', context)
+
+
+@query_budget(None)  # the body runs its queries after the response is returned
+@tenant_required
+def export(request, name, format):
+    """Stream all of the tenant's clients, tasks or documents as CSV or JSONL"""
+    if name not in EXPORTS or format not in FORMATS:
+        raise Http404('Unknown export')
+    
+    response = StreamingHttpResponse(stream_export(name, request.tenant, format), content_type=FORMATS[format])
+    response['Content-Disposition'] = content_disposition_header(True, export_filename(name, request.tenant, format))
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@query_budget(None)  # the stream outlives the budget check
+@require_GET
+@tenant_required(json=True)
+def events(request):
+    """Server-Sent Events stream of the tenant's task and comment changes"""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI every open stream would hold a worker thread; 204 tells
+        # EventSource not to reconnect, and the pages keep polling instead.
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(EventStream(request.tenant.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,9 +1,10 @@
 from django.contrib import admin
+from accounts.admin import TenantScopedAdminMixin
 from .models import Client
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
     list_display = ['full_name', 'email', 'company', 'status', 'tenant', 'created_by', 'created_at', 'total_tasks', 'pending_tasks']
     list_filter = ['status', 'tenant', 'created_at', 'company']
     search_fields = ['first_name', 'last_name', 'email', 'company', 'phone']
@@ -26,11 +27,15 @@ class ClientAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
     
+    def total_tasks(self, obj):
+        return obj.total_tasks
+    total_tasks.short_description = 'Total Tasks'
+    total_tasks.admin_order_field = 'task_count'
+    
+    def pending_tasks(self, obj):
+        return obj.pending_tasks
+    pending_tasks.short_description = 'Pending Tasks'
+    pending_tasks.admin_order_field = 'pending_task_count'
+    
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        # Filter by tenant for non-superusers
-        if hasattr(request.user, 'profile'):
-            return qs.filter(tenant=request.user.profile.tenant)
-        return qs.none()
+        return super().get_queryset(request).with_counts()
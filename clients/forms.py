@@ -1,4 +1,5 @@
 from django import forms
+from clientportal.search import search
 from .models import Client
 
 
@@ -19,18 +20,27 @@ class ClientForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
+        self.tenant = kwargs.pop('tenant', None)
         super().__init__(*args, **kwargs)
     
     def save(self, commit=True):
         client = super().save(commit=False)
-        if self.user and hasattr(self.user, 'profile'):
-            client.tenant = self.user.profile.tenant
+        if self.user and self.tenant:
+            client.tenant = self.tenant
             client.created_by = self.user
         if commit:
             client.save()
         return client
 
 
+class ClientImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV or XLSX with a header row. first_name, last_name and email are required; '
+                  'rows whose email matches an existing client update it.',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv, .xlsx'})
+    )
+
+
 class ClientSearchForm(forms.Form):
     search = forms.CharField(
         required=False,
@@ -50,4 +60,24 @@ class ClientSearchForm(forms.Form):
             'class': 'form-control',
             'placeholder': 'Filter by company...'
         })
-    ) 
\ No newline at end of file
+    )
+    
+    def filter_queryset(self, queryset, tenant):
+        """Apply the submitted search and filters to a tenant's clients"""
+        if not self.is_valid():
+            return queryset
+        
+        search_text = self.cleaned_data.get('search')
+        status = self.cleaned_data.get('status')
+        company = self.cleaned_data.get('company')
+        
+        if search_text:
+            queryset = search(queryset, search_text, tenant)
+        
+        if status:
+            queryset = queryset.filter(status=status)
+        
+        if company:
+            queryset = queryset.filter(company__icontains=company)
+        
+        return queryset
@@ -0,0 +1,226 @@
+"""
+Bulk client import from CSV or XLSX files.
+
+``import_clients()`` reads the file one row at a time, validates each row
+with a bound ``ClientForm`` and upserts the valid rows in batches with
+``bulk_create(update_conflicts=True)`` on the ``(tenant, email)`` unique
+constraint. Rows with an email the tenant already has update that client;
+invalid rows are reported by row number and skipped without stopping the
+import. ``bulk_create()`` sends no signals, so each batch updates the search
+index and the tenant statistics for the rows it inserted or changed.
+
+Only the columns present in the file are written, so a file with just names
+and emails leaves the other fields of existing clients alone. Headers are
+matched case-insensitively against the form's field names, which means a
+clients export can be imported back as is.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime
+from zipfile import BadZipFile
+from collections import defaultdict
+from django.db import transaction
+from django.forms import modelform_factory
+from django.utils import timezone
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from accounts.rollups import bump_counts, created_metric, status_metric
+from clientportal import search
+from clientportal.stats import invalidate_dashboard_stats
+from .forms import ClientForm
+from .models import Client
+
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+REQUIRED_COLUMNS = ['first_name', 'last_name', 'email']
+UNIQUE_FIELDS = ['tenant', 'email']
+
+
+class ClientImportError(Exception):
+    """The file as a whole cannot be imported"""
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store phone numbers and the like as floats
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ClientImportError(f'Could not read the CSV file: {exc}')
+    finally:
+        text.detach()
+
+
+def read_xlsx(file):
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError) as exc:
+        raise ClientImportError(f'Could not read the XLSX file: {exc}')
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield [_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
+READERS = {
+    '.csv': read_csv,
+    '.xlsx': read_xlsx,
+}
+
+
+def read_rows(file, name):
+    """Rows of ``file`` as lists of strings, picking the reader from ``name``"""
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in READERS:
+        raise ClientImportError(f"Unsupported file type {extension or name!r}; upload a CSV or XLSX file")
+    return READERS[extension](file)
+
+
+def _column_name(header):
+    return header.strip().lower().replace(' ', '_').replace('-', '_')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.invalid = 0
+        self.columns = []
+        self.ignored_columns = []
+        # (row number, ["field: message", ...]); only the first MAX_REPORTED_ERRORS
+        self.errors = []
+    
+    @property
+    def imported(self):
+        return self.created + self.updated
+    
+    def add_error(self, number, messages):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((number, messages))
+
+
+class ClientImporter:
+    """Validate and upsert rows for one tenant"""
+    
+    def __init__(self, tenant, user=None, batch_size=BATCH_SIZE):
+        self.tenant = tenant
+        self.user = user
+        self.batch_size = batch_size
+        self.form_class = ClientForm
+        self.result = ImportResult()
+    
+    def run(self, rows):
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            raise ClientImportError('The file is empty')
+        positions = self.read_header(header)
+    
+        batch = {}
+        for number, values in enumerate(rows, start=2):
+            if not any(value.strip() for value in values):
+                continue
+            data = {name: values[position] if position < len(values) else '' for name, position in positions.items()}
+            client = self.clean(number, data)
+            if client is None:
+                continue
+            # A client repeated within one batch keeps the last row's values
+            if client.email in batch:
+                self.result.updated += 1
+            batch[client.email] = client
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = {}
+        if batch:
+            self.write(batch)
+    
+        invalidate_dashboard_stats(self.tenant.pk)
+        return self.result
+    
+    def read_header(self, header):
+        columns = [_column_name(value) for value in header]
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ClientImportError(f"Missing required columns: {', '.join(missing)}")
+    
+        positions = {name: columns.index(name) for name in ClientForm.base_fields if name in columns}
+        self.result.columns = list(positions)
+        self.result.ignored_columns = [name for name in columns if name and name not in positions]
+        # Only the file's columns are validated and written
+        self.form_class = modelform_factory(Client, form=ClientForm, fields=self.result.columns)
+        return positions
+    
+    def clean(self, number, data):
+        """The row as an unsaved ``Client``, or ``None`` after recording its errors"""
+        form = self.form_class(
+            data={name: value.strip() for name, value in data.items()}, tenant=self.tenant, user=self.user,
+        )
+        if not form.is_valid():
+            self.result.add_error(number, [
+                f"{'row' if name == '__all__' else name}: {message}"
+                for name, errors in form.errors.items() for message in errors
+            ])
+            return None
+        client = form.instance
+        client.tenant = self.tenant
+        client.created_by = self.user
+        return client
+    
+    def changed(self, client, existing, name):
+        return name in self.result.columns and getattr(client, name) != existing[name]
+    
+    def write(self, batch):
+        today = timezone.localdate()
+        deltas = defaultdict(int)
+        with transaction.atomic():
+            # Locked, so the status changes counted below are the ones written
+            existing = {
+                row['email']: row
+                for row in Client._base_manager.select_for_update().filter(
+                    tenant=self.tenant, email__in=list(batch),
+                ).values('email', 'pk', 'first_name', 'last_name', 'status', 'created_at')
+            }
+            Client._base_manager.bulk_create(
+                batch.values(), update_conflicts=True, unique_fields=UNIQUE_FIELDS,
+                update_fields=[name for name in self.result.columns if name != 'email'] + ['updated_at'],
+            )
+            
+            for email, client in batch.items():
+                if email not in existing:
+                    deltas[today, created_metric('clients')] += 1
+                    deltas[today, status_metric('clients', client.status)] += 1
+                elif self.changed(client, existing[email], 'status'):
+                    day = timezone.localdate(existing[email]['created_at'])
+                    deltas[day, status_metric('clients', existing[email]['status'])] -= 1
+                    deltas[day, status_metric('clients', client.status)] += 1
+            bump_counts(self.tenant.pk, deltas)
+            
+            search.index_queryset(Client._base_manager.filter(tenant=self.tenant, email__in=list(batch)))
+            renamed = [
+                row['pk'] for email, row in existing.items()
+                if self.changed(batch[email], row, 'first_name') or self.changed(batch[email], row, 'last_name')
+            ]
+            if renamed:
+                search.index_dependents(Client, renamed)
+        
+        self.result.created += len(batch) - len(existing)
+        self.result.updated += len(existing)
+
+
+def import_clients(file, name, tenant, user=None, batch_size=BATCH_SIZE):
+    """Import the clients in ``file`` (named ``name``) into ``tenant``"""
+    return ClientImporter(tenant, user, batch_size).run(read_rows(file, name))
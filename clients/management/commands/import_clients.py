@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Tenant
+from clients.importing import BATCH_SIZE, ClientImportError, import_clients
+
+
+class Command(BaseCommand):
+    help = 'Create and update clients of a tenant from a CSV or XLSX file, matching on email'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Slug of the tenant to import into')
+        parser.add_argument('path', help='CSV or XLSX file with a header row')
+        parser.add_argument('--created-by', help='Username recorded as the creator of new clients')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Rows validated and upserted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(slug=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']!r} does not exist")
+        
+        user = None
+        if options['created_by']:
+            try:
+                user = User.objects.get(username=options['created_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['created_by']!r} does not exist")
+        
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_clients(file, options['path'], tenant, user, options['batch_size'])
+        except (OSError, ClientImportError) as exc:
+            raise CommandError(str(exc))
+        
+        for number, problems in result.errors:
+            self.stderr.write(f"Row {number}: {'; '.join(problems)}")
+        if result.invalid > len(result.errors):
+            self.stderr.write(f'... and {result.invalid - len(result.errors)} more invalid rows')
+        if result.ignored_columns:
+            self.stdout.write(f"Ignored columns: {', '.join(result.ignored_columns)}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} clients ({result.created} new, {result.updated} updated), '
+            f'{result.invalid} rows skipped'
+        ))
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from clientportal.search import install_index
+    install_index('clients.client', schema_editor, apps=apps)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from clientportal.search import uninstall_index
+    uninstall_index('clients.client', schema_editor, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['tenant', 'last_name', 'first_name', 'id'], name='client_tenant_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['tenant', 'status'], name='client_tenant_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['tenant', 'created_at'], name='client_tenant_created_idx'),
+        ),
+    ]
@@ -1,9 +1,36 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from accounts.models import Tenant
+from accounts.tenancy import TenantManager, TenantQuerySet
 from django.utils import timezone
 
 
+def _count_per_client(queryset):
+    """Correlated COUNT subquery over rows pointing at the outer client"""
+    counts = (
+        queryset.filter(client=OuterRef('pk'))
+        .order_by()
+        .values('client')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class ClientQuerySet(TenantQuerySet):
+    def with_counts(self):
+        """Annotate task, pending-task and document counts in the same query"""
+        Task = self.model._meta.get_field('tasks').related_model
+        Document = self.model._meta.get_field('documents').related_model
+        return self.annotate(
+            task_count=_count_per_client(Task._base_manager.all()),
+            pending_task_count=_count_per_client(Task._base_manager.filter(status='pending')),
+            document_count=_count_per_client(Document._base_manager.all()),
+        )
+
+
 class Client(models.Model):
     """Client model with tenant isolation"""
     CLIENT_STATUS = [
@@ -26,25 +53,45 @@ class Client(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager.from_queryset(ClientQuerySet)()
+    
     class Meta:
         ordering = ['last_name', 'first_name']
         unique_together = ['tenant', 'email']
+        indexes = [
+            models.Index(fields=['tenant', 'last_name', 'first_name', 'id'], name='client_tenant_name_idx'),
+            models.Index(fields=['tenant', 'status'], name='client_tenant_status_idx'),
+            models.Index(fields=['tenant', 'created_at'], name='client_tenant_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
     
+    def save(self, *args, **kwargs):
+        # Rollups lock the stored status in pre_save; hold the lock until the row is written
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
+    # The counters below prefer values annotated by ClientQuerySet.with_counts()
+    
     @property
     def total_tasks(self):
+        if hasattr(self, 'task_count'):
+            return self.task_count
         return self.tasks.count()
     
     @property
     def pending_tasks(self):
+        if hasattr(self, 'pending_task_count'):
+            return self.pending_task_count
         return self.tasks.filter(status='pending').count()
     
     @property
     def total_documents(self):
+        if hasattr(self, 'document_count'):
+            return self.document_count
         return self.documents.count()
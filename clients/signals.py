@@ -0,0 +1,32 @@
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from accounts import rollups
+from clientportal import search
+from clientportal.stats import invalidate_dashboard_stats
+from .models import Client
+
+
+@receiver(post_init, sender=Client)
+def client_loaded(sender, instance, **kwargs):
+    rollups.track_status(instance)
+    search.track_changes(instance)
+
+
+@receiver(pre_save, sender=Client)
+def client_saving(sender, instance, update_fields, **kwargs):
+    rollups.lock_status(instance, update_fields)
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, created, **kwargs):
+    """Keep tenant rollups, cached statistics and the search index in step with client writes"""
+    rollups.record_saved(instance, created)
+    search.index_instance(instance)
+    invalidate_dashboard_stats(instance.tenant_id)
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    rollups.record_deleted(instance)
+    search.remove_instance(instance)
+    invalidate_dashboard_stats(instance.tenant_id)
@@ -1,3 +1,262 @@
+import io
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import Workbook
+from accounts.models import Tenant, TenantDailyStats, UserProfile
+from accounts.tenancy import use_tenant
+from clientportal.search import search
+from tasks.forms import TaskForm
+from tasks.models import Task
+from .forms import ClientForm
+from .importing import ClientImportError, import_clients
+from .models import Client
+from .views import PANEL_SIZE
 
-# Create your tests here.
+
+class ClientListTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client.force_login(self.user)
+    
+    def add_clients(self, count):
+        for _ in range(count):
+            n = Client.objects.unscoped().count()
+            client = Client.objects.create(
+                tenant=self.tenant, first_name='Client', last_name=f'{n:03d}', email=f'c{n}@example.com',
+            )
+            Task.objects.create(tenant=self.tenant, client=client, title='Pending')
+            Task.objects.create(tenant=self.tenant, client=client, title='Done', status='completed')
+    
+    def count_list_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('clients:client_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def test_constant_queries_regardless_of_page_size(self):
+        self.add_clients(2)
+        small, response = self.count_list_queries()
+        self.assertEqual(len(response.context['page_obj']), 2)
+        
+        self.add_clients(18)
+        large, response = self.count_list_queries()
+        self.assertEqual(len(response.context['page_obj']), 20)
+        self.assertEqual(small, large)
+    
+    def test_annotated_counts(self):
+        self.add_clients(1)
+        _, response = self.count_list_queries()
+        client = response.context['page_obj'][0]
+        with self.assertNumQueries(0):
+            self.assertEqual(client.total_tasks, 2)
+            self.assertEqual(client.pending_tasks, 1)
+            self.assertEqual(client.total_documents, 0)
+    
+    def test_properties_fall_back_without_annotations(self):
+        self.add_clients(1)
+        with use_tenant(self.tenant):
+            client = Client.objects.get()
+            with self.assertNumQueries(1):
+                self.assertEqual(client.pending_tasks, 1)
+
+
+class ClientDetailTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client.force_login(self.user)
+        self.ada = Client.objects.create(tenant=self.tenant, first_name='Ada', last_name='Lovelace', email='ada@example.com')
+    
+    def add_tasks(self, count):
+        for n in range(count):
+            Task.objects.create(
+                tenant=self.tenant, client=self.ada, title=f'Task {n}', assigned_to=self.user,
+                status='pending' if n % 2 else 'completed',
+            )
+    
+    def get_detail(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('clients:client_detail', args=[self.ada.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def test_first_page_only_with_constant_queries(self):
+        self.add_tasks(3)
+        small, response = self.get_detail()
+        self.add_tasks(30)
+        large, response = self.get_detail()
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['tasks']), PANEL_SIZE)
+        client = response.context['client']
+        self.assertEqual((client.total_tasks, client.pending_tasks, client.total_documents), (33, 16, 0))
+        self.assertContains(response, 'Load more tasks')
+    
+    def test_load_more_fragment(self):
+        self.add_tasks(PANEL_SIZE + 3)
+        response = self.client.get(reverse('clients:client_detail', args=[self.ada.pk]))
+        url = reverse('clients:client_tasks', args=[self.ada.pk])
+        response = self.client.get(url, {'cursor': response.context['tasks'].next_cursor})
+        self.assertEqual(len(response.context['tasks']), 3)
+        self.assertNotContains(response, 'Load more')
+        self.assertContains(response, '<tr>', count=3)
+        self.assertEqual(self.client.get(reverse('clients:client_documents', args=[self.ada.pk])).status_code, 200)
+    
+    def test_other_tenants_clients_are_not_found(self):
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        self.assertEqual(self.client.get(reverse('clients:client_detail', args=[hank.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('clients:client_tasks', args=[hank.pk])).status_code, 404)
+
+
+class ClientAutocompleteTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client.force_login(self.user)
+        self.ada = Client.objects.create(tenant=self.tenant, first_name='Ada', last_name='Lovelace', email='ada@acme.test')
+        Client.objects.create(tenant=self.tenant, first_name='Alan', last_name='Turing', email='alan@acme.test')
+        Client.objects.create(tenant=other, first_name='Ada', last_name='Byron', email='ada@globex.test')
+    
+    def autocomplete(self, **params):
+        return self.client.get(reverse('clients:client_autocomplete'), params).json()
+    
+    def test_prefix_search_is_tenant_scoped(self):
+        data = self.autocomplete(q='ad')
+        self.assertEqual(data['results'], [{'id': self.ada.pk, 'text': 'Ada Lovelace'}])
+        self.assertIsNone(data['next'])
+        self.assertEqual([r['text'] for r in self.autocomplete(q='turing')['results']], ['Alan Turing'])
+    
+    def test_results_are_paginated(self):
+        for n in range(25):
+            Client.objects.create(tenant=self.tenant, first_name='Bulk', last_name=f'{n:02d}', email=f'b{n}@acme.test')
+        first = self.autocomplete(q='bulk')
+        self.assertEqual(len(first['results']), 20)
+        second = self.autocomplete(q='bulk', cursor=first['next'])
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+    
+    def test_widget_renders_only_selected_client(self):
+        task = Task.objects.create(tenant=self.tenant, client=self.ada, title='Call')
+        html = str(TaskForm(instance=task, tenant=self.tenant)['client'])
+        self.assertIn('data-autocomplete-url="/clients/autocomplete/"', html)
+        self.assertIn('Ada Lovelace', html)
+        self.assertNotIn('Alan Turing', html)
+        
+        form = TaskForm({'client': self.ada.pk, 'title': 'Call', 'status': 'pending', 'priority': 'low'}, tenant=self.tenant)
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+class ClientImportTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.ada = Client.objects.create(
+            tenant=self.tenant, first_name='Ada', last_name='Byron', email='ada@example.com', notes='Keep me',
+        )
+    
+    def metric_total(self, metric):
+        stats = TenantDailyStats.objects.filter(tenant=self.tenant, metric=metric)
+        return sum(stats.values_list('value', flat=True))
+    
+    def run_import(self, text, name='clients.csv', **kwargs):
+        return import_clients(io.BytesIO(text.encode()), name, self.tenant, self.user, **kwargs)
+    
+    def test_creates_updates_and_reports_errors(self):
+        result = self.run_import(
+            'First Name,Last Name,Email,Status,Favourite Colour\n'
+            'Ada,Lovelace,ada@example.com,active,blue\n'
+            'Grace,Hopper,grace@example.com,prospect,\n'
+            ',Nameless,not-an-email,unknown,\n'
+            '\n'
+            'Alan,Turing,alan@example.com,inactive,\n',
+            batch_size=2,
+        )
+        self.assertEqual((result.created, result.updated, result.invalid), (2, 1, 1))
+        self.assertEqual(result.ignored_columns, ['favourite_colour'])
+        number, problems = result.errors[0]
+        self.assertEqual(number, 4)
+        self.assertEqual([problem.split(':')[0] for problem in problems], ['first_name', 'email', 'status'])
+        
+        self.ada.refresh_from_db()
+        self.assertEqual(self.ada.last_name, 'Lovelace')
+        # Columns missing from the file are left alone
+        self.assertEqual(self.ada.notes, 'Keep me')
+        grace = Client.objects.unscoped().get(email='grace@example.com')
+        self.assertEqual((grace.tenant, grace.created_by, grace.status), (self.tenant, self.user, 'prospect'))
+        self.assertIsNotNone(grace.created_at)
+    
+    def test_other_tenants_are_untouched(self):
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='ada@example.com')
+        self.run_import('first_name,last_name,email\nAda,Lovelace,ada@example.com\n')
+        hank.refresh_from_db()
+        self.assertEqual(hank.last_name, 'Scorpio')
+        self.assertEqual(Client.objects.for_tenant(self.tenant).count(), 1)
+    
+    def test_search_index_and_stats_follow_the_import(self):
+        Task.objects.create(tenant=self.tenant, client=self.ada, title='Report')
+        self.run_import('first_name,last_name,email\nAda,Lovelace,ada@example.com\nGrace,Hopper,grace@example.com\n')
+        clients = Client.objects.for_tenant(self.tenant)
+        self.assertEqual(list(search(clients, 'hopper', self.tenant)), [Client.objects.unscoped().get(email='grace@example.com')])
+        self.assertEqual(search(clients, 'byron', self.tenant).count(), 0)
+        tasks = Task.objects.for_tenant(self.tenant)
+        self.assertEqual(search(tasks, 'lovelace', self.tenant).count(), 1)
+        self.assertEqual(self.metric_total('clients.created'), 2)
+    
+    def test_stats_follow_status_changes_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import('first_name,last_name,email,status\nAda,Byron,ada@example.com,inactive\nGrace,Hopper,grace@example.com,prospect\n')
+        self.assertEqual(
+            [self.metric_total(f'clients.status.{status}') for status in ('active', 'inactive', 'prospect')], [0, 1, 1],
+        )
+        # Counted from the batch; the tenant's tables are not rescanned
+        self.assertFalse([q for q in queries if 'FROM "tasks_task"' in q['sql']])
+    
+    def test_rows_are_validated_by_the_whole_form(self):
+        with mock.patch.object(ClientForm, 'clean', side_effect=ValidationError('No test clients')):
+            result = self.run_import('first_name,last_name,email\nTest,Client,test@example.com\n')
+        self.assertEqual(result.errors, [(2, ['row: No test clients'])])
+        self.assertFalse(Client.objects.for_tenant(self.tenant).filter(email='test@example.com').exists())
+    
+    def test_xlsx(self):
+        workbook = Workbook()
+        workbook.active.append(['first_name', 'last_name', 'email', 'phone'])
+        workbook.active.append(['Grace', 'Hopper', 'grace@example.com', 5551234])
+        content = io.BytesIO()
+        workbook.save(content)
+        content.seek(0)
+        result = import_clients(content, 'clients.xlsx', self.tenant)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Client.objects.unscoped().get(email='grace@example.com').phone, '5551234')
+    
+    def test_rejects_unusable_files(self):
+        with self.assertRaisesMessage(ClientImportError, 'Missing required columns: email'):
+            self.run_import('first_name,last_name\nAda,Lovelace\n')
+        with self.assertRaisesMessage(ClientImportError, 'Unsupported file type'):
+            self.run_import('first_name', name='clients.txt')
+    
+    def test_upload_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('clients.csv', b'first_name,last_name,email\nGrace,Hopper,grace@example.com\n')
+        response = self.client.post(reverse('clients:client_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        
+        upload = SimpleUploadedFile('clients.txt', b'first_name')
+        response = self.client.post(reverse('clients:client_import'), {'file': upload})
+        self.assertIn('Unsupported file type', str(response.context['form'].errors))
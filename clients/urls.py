@@ -6,7 +6,12 @@ app_name = 'clients'
 urlpatterns = [
     path('', views.client_list, name='client_list'),
     path('create/', views.client_create, name='client_create'),
+    path('import/', views.client_import, name='client_import'),
+    path('autocomplete/', views.client_autocomplete, name='client_autocomplete'),
     path('<int:pk>/', views.client_detail, name='client_detail'),
+    path('<int:pk>/tasks/', views.client_tasks, name='client_tasks'),
+    path('<int:pk>/documents/', views.client_documents, name='client_documents'),
+    path('<int:pk>/documents/download/', views.client_documents_download, name='client_documents_download'),
     path('<int:pk>/edit/', views.client_update, name='client_update'),
     path('<int:pk>/delete/', views.client_delete, name='client_delete'),
 ] 
\ No newline at end of file
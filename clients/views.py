@@ -1,97 +1,133 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_GET
+from accounts.tenancy import tenant_required
+from clientportal.autocomplete import autocomplete_response
+from clientportal.instrumentation import query_budget
+from clientportal.pagination import CursorPaginator
+from clientportal.search import RANKED_ORDERING, is_ranked, search
+from clientportal.stats import get_dashboard_stats
 from .models import Client
-from .forms import ClientForm, ClientSearchForm
+from .forms import ClientForm, ClientImportForm, ClientSearchForm
+from .importing import ClientImportError, import_clients
 from tasks.models import Task
+from documents.export import iter_documents, zip_stream
 from documents.models import Document
 
 
-@login_required
+@query_budget(12)
+@tenant_required
 def client_list(request):
     """List all clients for the current tenant with search and filtering"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    clients = Client.objects.filter(tenant=tenant)
+    tenant = request.tenant
+    clients = Client.objects.all()
     
     # Handle search and filtering
     search_form = ClientSearchForm(request.GET)
-    if search_form.is_valid():
-        search = search_form.cleaned_data.get('search')
-        status = search_form.cleaned_data.get('status')
-        company = search_form.cleaned_data.get('company')
-        
-        if search:
-            clients = clients.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(company__icontains=search)
-            )
-        
-        if status:
-            clients = clients.filter(status=status)
-        
-        if company:
-            clients = clients.filter(company__icontains=company)
-    
-    # Pagination
-    paginator = Paginator(clients, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    clients = search_form.filter_queryset(clients, tenant)
+    filtered = search_form.is_valid() and any(search_form.cleaned_data.values())
+    ordering = RANKED_ORDERING if is_ranked(clients) else ['last_name', 'first_name', 'id']
+    
+    # Keyset pagination: no OFFSET scan and no COUNT(*) per page. Per-row
+    # counters are annotated so the template doesn't query for each client.
+    paginator = CursorPaginator(clients.with_counts(), ordering, 20)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    
+    # Unfiltered totals come from the cached tenant statistics
+    stats = {} if filtered else get_dashboard_stats(tenant)
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
-        'total_clients': clients.count(),
+        'total_clients': stats.get('total_clients'),
     }
     
     return render(request, 'clients/client_list.html', context)
 
 
-@login_required
+# Rows shown per related panel on the client detail page, and per "load more"
+PANEL_SIZE = 10
+PANEL_ORDERING = ['-created_at', '-id']
+
+
+def _task_panel(client, cursor=None):
+    tasks = Task.objects.filter(client=client).select_related(None).select_related('assigned_to')
+    return CursorPaginator(tasks, PANEL_ORDERING, PANEL_SIZE).get_page(cursor)
+
+
+def _document_panel(client, cursor=None):
+    documents = Document.objects.filter(client=client).select_related(None).select_related('uploaded_by')
+    return CursorPaginator(documents, PANEL_ORDERING, PANEL_SIZE).get_page(cursor)
+
+
+@query_budget(12)
+@tenant_required
 def client_detail(request, pk):
-    """Show detailed view of a client with related tasks and documents"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    client = get_object_or_404(Client, pk=pk, tenant=tenant)
-    
-    # Get related tasks and documents
-    tasks = Task.objects.filter(client=client).order_by('-created_at')
-    documents = Document.objects.filter(client=client).order_by('-created_at')
+    """Show a client with the first page of its tasks and documents"""
+    # Task, pending-task and document counts come with the client row
+    client = get_object_or_404(Client.objects.with_counts(), pk=pk)
     
     context = {
         'client': client,
-        'tasks': tasks,
-        'documents': documents,
-        'total_tasks': tasks.count(),
-        'pending_tasks': tasks.filter(status='pending').count(),
-        'total_documents': documents.count(),
+        'tasks': _task_panel(client),
+        'documents': _document_panel(client),
     }
     
     return render(request, 'clients/client_detail.html', context)
 
 
-@login_required
+@query_budget(6)
+@tenant_required
+def client_tasks(request, pk):
+    """The next page of the client detail task panel, as table rows"""
+    client = get_object_or_404(Client.objects.only('id'), pk=pk)
+    context = {
+        'client': client,
+        'tasks': _task_panel(client, request.GET.get('cursor')),
+    }
+    return render(request, 'clients/_task_rows.html', context)
+
+
+@query_budget(6)
+@tenant_required
+def client_documents(request, pk):
+    """The next page of the client detail document panel, as table rows"""
+    client = get_object_or_404(Client.objects.only('id'), pk=pk)
+    context = {
+        'client': client,
+        'documents': _document_panel(client, request.GET.get('cursor')),
+    }
+    return render(request, 'clients/_document_rows.html', context)
+
+
+@query_budget(None)  # one query per batch of documents
+@require_GET
+@tenant_required
+def client_documents_download(request, pk):
+    """All of a client's documents as one streamed ZIP archive"""
+    client = get_object_or_404(Client, pk=pk)
+    # Scoped explicitly: the archive is read after TenantMiddleware has reset
+    # the current tenant
+    documents = iter_documents(Document._base_manager.filter(tenant=request.tenant, client=client))
+    response = StreamingHttpResponse(zip_stream(documents), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, f'{client.full_name} documents.zip')
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@tenant_required
 def client_create(request):
     """Create a new client"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
     if request.method == 'POST':
-        form = ClientForm(request.POST, user=request.user)
+        form = ClientForm(request.POST, user=request.user, tenant=request.tenant)
         if form.is_valid():
             client = form.save()
             messages.success(request, f'Client "{client.full_name}" created successfully.')
             return redirect('client_detail', pk=client.pk)
     else:
-        form = ClientForm(user=request.user)
+        form = ClientForm(user=request.user, tenant=request.tenant)
     
     context = {
         'form': form,
@@ -101,23 +137,47 @@ def client_create(request):
     return render(request, 'clients/client_form.html', context)
 
 
-@login_required
+@query_budget(None)  # a few queries per batch of rows
+@tenant_required
+def client_import(request):
+    """Create and update clients in bulk from an uploaded CSV or XLSX file"""
+    result = None
+    if request.method == 'POST':
+        form = ClientImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_clients(upload, upload.name, request.tenant, request.user)
+            except ClientImportError as exc:
+                form.add_error('file', str(exc))
+            else:
+                messages.success(
+                    request, f'Imported {result.imported} clients ({result.created} new, {result.updated} updated).'
+                )
+    else:
+        form = ClientImportForm()
+    
+    context = {
+        'form': form,
+        'result': result,
+    }
+    
+    return render(request, 'clients/client_import.html', context)
+
+
+@tenant_required
 def client_update(request, pk):
     """Update an existing client"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    client = get_object_or_404(Client, pk=pk, tenant=tenant)
+    client = get_object_or_404(Client, pk=pk)
     
     if request.method == 'POST':
-        form = ClientForm(request.POST, instance=client, user=request.user)
+        form = ClientForm(request.POST, instance=client, user=request.user, tenant=request.tenant)
         if form.is_valid():
             client = form.save()
             messages.success(request, f'Client "{client.full_name}" updated successfully.')
             return redirect('client_detail', pk=client.pk)
     else:
-        form = ClientForm(instance=client, user=request.user)
+        form = ClientForm(instance=client, user=request.user, tenant=request.tenant)
     
     context = {
         'form': form,
@@ -128,14 +188,10 @@ def client_update(request, pk):
     return render(request, 'clients/client_form.html', context)
 
 
-@login_required
+@tenant_required
 def client_delete(request, pk):
     """Delete a client"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    client = get_object_or_404(Client, pk=pk, tenant=tenant)
+    client = get_object_or_404(Client, pk=pk)
     
     if request.method == 'POST':
         client_name = client.full_name
@@ -148,3 +204,15 @@ def client_delete(request, pk):
     }
     
     return render(request, 'clients/client_confirm_delete.html', context)
+
+
+@query_budget(6)
+@tenant_required(json=True)
+def client_autocomplete(request):
+    """Clients matching ``q`` for the client pickers, as JSON"""
+    clients = Client.objects.only('id', 'first_name', 'last_name')
+    text = request.GET.get('q', '').strip()
+    if text:
+        clients = search(clients, text, request.tenant)
+    ordering = RANKED_ORDERING if is_ranked(clients) else ['last_name', 'first_name', 'id']
+    return autocomplete_response(request, clients, ordering)
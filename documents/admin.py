@@ -1,19 +1,20 @@
 from django.contrib import admin
+from accounts.admin import TenantScopedAdminMixin
 from .models import Document
 
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'client', 'document_type', 'uploaded_by', 'file_size_display', 'created_at', 'tenant']
     list_filter = ['document_type', 'tenant', 'created_at', 'client']
     search_fields = ['title', 'description', 'client__first_name', 'client__last_name', 'client__email']
-    readonly_fields = ['created_at', 'updated_at', 'uploaded_by', 'file_size_display']
+    readonly_fields = ['created_at', 'updated_at', 'uploaded_by', 'file_size_display', 'mime_type', 'sha256', 'original_filename']
     fieldsets = (
         ('Document Information', {
             'fields': ('tenant', 'client', 'title', 'document_type', 'description')
         }),
         ('File', {
-            'fields': ('file', 'file_size_display')
+            'fields': ('file', 'original_filename', 'file_size_display', 'mime_type', 'sha256')
         }),
         ('Metadata', {
             'fields': ('uploaded_by', 'created_at', 'updated_at'),
@@ -35,12 +36,4 @@ class DocumentAdmin(admin.ModelAdmin):
         else:
             return f"{size / (1024 * 1024):.1f} MB"
     file_size_display.short_description = 'File Size'
-    
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        # Filter by tenant for non-superusers
-        if hasattr(request.user, 'profile'):
-            return qs.filter(tenant=request.user.profile.tenant)
-        return qs.none()
+    file_size_display.admin_order_field = 'size'
@@ -0,0 +1,147 @@
+"""
+Plain text of TXT, DOCX and PDF uploads, for searching document contents.
+
+When a document with one of those types is saved, its ``DocumentText`` row
+is marked pending and the text is extracted in the document worker pool
+once the transaction commits. The text lives in that row rather than on
+``Document``, so list queries never read it, and is indexed under
+``documents.documenttext`` in ``clientportal.search``. Extraction is keyed
+by the file's SHA-256: saving a document without replacing its file does
+not extract it again, and a result for a file that has since been replaced
+is dropped.
+
+The ``extract_*`` functions run in the pool; they take file paths and
+return at most ``limit`` characters.
+"""
+import logging
+import os
+import threading
+import zipfile
+from functools import partial
+from xml.etree import ElementTree
+import pypdfium2
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from clientportal import search
+from . import workers
+from .models import DocumentText
+
+
+logger = logging.getLogger(__name__)
+
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def extract_txt(source, limit):
+    with open(source, 'rb') as f:
+        # UTF-8 needs at most four bytes per character
+        return f.read(limit * 4).decode('utf-8', errors='replace')[:limit]
+
+
+def extract_docx(source, limit):
+    parts = []
+    length = 0
+    with zipfile.ZipFile(source) as archive, archive.open('word/document.xml') as xml:
+        # Streamed, so a large document is never held as one element tree
+        for event, element in ElementTree.iterparse(xml):
+            if element.tag == WORD_NAMESPACE + 't':
+                parts.append(element.text or '')
+            elif element.tag == WORD_NAMESPACE + 'tab':
+                parts.append('\t')
+            elif element.tag == WORD_NAMESPACE + 'p':
+                parts.append('\n')
+                element.clear()
+            else:
+                continue
+            length += len(parts[-1])
+            if length >= limit:
+                break
+    return ''.join(parts)[:limit]
+
+
+def extract_pdf(source, limit):
+    parts = []
+    length = 0
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        for page in pdf:
+            parts.append(page.get_textpage().get_text_bounded())
+            length += len(parts[-1])
+            if length >= limit:
+                break
+    finally:
+        pdf.close()
+    return '\n'.join(parts)[:limit]
+
+
+EXTRACTORS = {
+    'text/plain': extract_txt,
+    DOCX_TYPE: extract_docx,
+    'application/pdf': extract_pdf,
+}
+
+
+def extract_text(mime_type, source, limit):
+    """The text of the file at ``source``; runs in a pool process"""
+    return EXTRACTORS[mime_type](source, limit)
+
+
+def extraction_supported(document):
+    return bool(document.sha256) and document.mime_type in EXTRACTORS
+
+
+def store_text(document_id, sha256, text, status='done'):
+    """Save and index extracted text, unless the document's file has changed meanwhile"""
+    # NUL cannot be stored in PostgreSQL text columns
+    text = text.replace('\x00', '')
+    stored = DocumentText._base_manager.filter(pk=document_id, sha256=sha256).update(
+        text=text, status=status, extracted_at=timezone.now(),
+    )
+    if stored:
+        search.index_queryset(DocumentText._base_manager.filter(pk=document_id))
+
+
+def _extracted(document_id, sha256, cleanup, caller, future):
+    if cleanup:
+        os.unlink(cleanup)
+    try:
+        if future.exception() is not None:
+            logger.warning('Could not extract text from document %s: %s', document_id, future.exception())
+            store_text(document_id, sha256, '', status='failed')
+        else:
+            store_text(document_id, sha256, future.result())
+    finally:
+        if threading.current_thread() is not caller:
+            # The pool's result thread; don't leave its connection open
+            connection.close()
+
+
+def schedule_extraction(document, force=False):
+    """Queue text extraction for the document's current file; return a Future, or
+    ``None`` if its text is already up to date"""
+    content, created = DocumentText._base_manager.get_or_create(
+        document_id=document.pk, defaults={'tenant_id': document.tenant_id, 'sha256': document.sha256},
+    )
+    if not created and content.sha256 == document.sha256 and not force:
+        return None
+    if not created:
+        # Until the new file is extracted, searches must not match the old one
+        search.remove_pks(DocumentText, [document.pk])
+        DocumentText._base_manager.filter(pk=document.pk).update(sha256=document.sha256, status='pending', text='')
+    
+    try:
+        source, cleanup = workers.local_source(document)
+    except Exception as exc:
+        logger.warning('Could not read document %s: %s', document.pk, exc)
+        store_text(document.pk, document.sha256, '', status='failed')
+        return None
+    future = workers.submit(extract_text, document.mime_type, source, settings.DOCUMENT_TEXT_MAX_LENGTH)
+    future.add_done_callback(partial(_extracted, document.pk, document.sha256, cleanup, threading.current_thread()))
+    return future
+
+
+def discard_text(document):
+    """Forget the text of a document whose file can no longer be extracted"""
+    DocumentText._base_manager.filter(pk=document.pk).delete()
@@ -1,6 +1,19 @@
+import os
 from django import forms
-from .models import Document
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from .models import Document, DocumentUpload
 from clients.models import Client
+from clientportal.autocomplete import AutocompleteSelect
+from clientportal.search import search
+
+
+ALLOWED_EXTENSIONS = ['.pdf', '.doc', '.docx', '.txt', '.jpg', '.jpeg', '.png']
+
+
+def validate_extension(name):
+    if os.path.splitext(name)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise forms.ValidationError("File type not allowed. Please upload PDF, DOC, DOCX, TXT, JPG, JPEG, or PNG files.")
 
 
 class DocumentForm(forms.ModelForm):
@@ -8,7 +21,7 @@ class DocumentForm(forms.ModelForm):
         model = Document
         fields = ['client', 'title', 'document_type', 'file', 'description']
         widgets = {
-            'client': forms.Select(attrs={'class': 'form-select'}),
+            'client': AutocompleteSelect('clients:client_autocomplete', attrs={'class': 'form-select'}),
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'document_type': forms.Select(attrs={'class': 'form-select'}),
             'file': forms.FileInput(attrs={'class': 'form-control'}),
@@ -17,12 +30,12 @@ class DocumentForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
+        self.tenant = kwargs.pop('tenant', None)
         super().__init__(*args, **kwargs)
         
         # Filter clients by tenant
-        if self.user and hasattr(self.user, 'profile'):
-            tenant = self.user.profile.tenant
-            self.fields['client'].queryset = Client.objects.filter(tenant=tenant)
+        if self.tenant:
+            self.fields['client'].queryset = Client.objects.for_tenant(self.tenant)
     
     def clean_file(self):
         file = self.cleaned_data.get('file')
@@ -32,23 +45,62 @@ class DocumentForm(forms.ModelForm):
                 raise forms.ValidationError("File size must be under 10MB.")
             
             # Check file extension
-            allowed_extensions = ['.pdf', '.doc', '.docx', '.txt', '.jpg', '.jpeg', '.png']
-            file_extension = file.name.lower().split('.')[-1]
-            if f'.{file_extension}' not in allowed_extensions:
-                raise forms.ValidationError("File type not allowed. Please upload PDF, DOC, DOCX, TXT, JPG, JPEG, or PNG files.")
+            validate_extension(file.name)
         
         return file
     
     def save(self, commit=True):
         document = super().save(commit=False)
-        if self.user and hasattr(self.user, 'profile'):
-            document.tenant = self.user.profile.tenant
+        if self.user and self.tenant:
+            document.tenant = self.tenant
             document.uploaded_by = self.user
         if commit:
             document.save()
         return document
 
 
+class DocumentUploadForm(forms.ModelForm):
+    """Starts a chunked upload; larger files than ``DocumentForm`` takes in one POST are allowed"""
+    
+    class Meta:
+        model = DocumentUpload
+        fields = ['client', 'filename', 'size', 'sha256']
+    
+    def __init__(self, *args, **kwargs):
+        self.tenant = kwargs.pop('tenant', None)
+        super().__init__(*args, **kwargs)
+        
+        if self.tenant:
+            self.fields['client'].queryset = Client.objects.for_tenant(self.tenant)
+    
+    def clean_filename(self):
+        filename = os.path.basename(self.cleaned_data['filename'].replace('\\', '/'))
+        validate_extension(filename)
+        return filename
+    
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size == 0:
+            raise forms.ValidationError("The file is empty.")
+        if size > settings.DOCUMENT_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(f"File size must be under {filesizeformat(settings.DOCUMENT_MAX_UPLOAD_SIZE)}.")
+        return size
+    
+    def clean_sha256(self):
+        sha256 = self.cleaned_data['sha256'].lower()
+        if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256)):
+            raise forms.ValidationError("Enter the file's SHA-256 as 64 hexadecimal digits.")
+        return sha256
+
+
+class DocumentCommitForm(forms.ModelForm):
+    """The details of the document a finished chunked upload becomes"""
+    
+    class Meta:
+        model = Document
+        fields = ['title', 'document_type', 'description']
+
+
 class DocumentSearchForm(forms.Form):
     search = forms.CharField(
         required=False,
@@ -63,7 +115,42 @@ class DocumentSearchForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     client = forms.ModelChoiceField(
-        queryset=Client.objects.all(),
+        queryset=Client.objects.none(),
+        required=False,
+        widget=AutocompleteSelect('clients:client_autocomplete', attrs={'class': 'form-select'})
+    )
+    scope = forms.ChoiceField(
+        choices=[('', 'Titles and descriptions'), ('content', 'File contents')],
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'})
-    ) 
\ No newline at end of file
+    )
+    
+    def __init__(self, *args, **kwargs):
+        self.tenant = kwargs.pop('tenant', None)
+        super().__init__(*args, **kwargs)
+        
+        # Only offer the tenant's own clients
+        if self.tenant:
+            self.fields['client'].queryset = Client.objects.for_tenant(self.tenant)
+    
+    def filter_queryset(self, queryset, tenant):
+        """Apply the submitted search and filters to a tenant's documents"""
+        if not self.is_valid():
+            return queryset
+        
+        search_text = self.cleaned_data.get('search')
+        document_type = self.cleaned_data.get('document_type')
+        client = self.cleaned_data.get('client')
+        
+        if search_text:
+            # Content searches match extracted text and annotate search_snippet
+            index = 'documents.documenttext' if self.cleaned_data.get('scope') == 'content' else None
+            queryset = search(queryset, search_text, tenant, index=index)
+        
+        if document_type:
+            queryset = queryset.filter(document_type=document_type)
+        
+        if client:
+            queryset = queryset.filter(client=client)
+        
+        return queryset
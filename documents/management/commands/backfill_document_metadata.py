@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from documents.models import Document, file_metadata
+
+
+class Command(BaseCommand):
+    help = 'Fill in size, SHA-256 and MIME type for documents uploaded before they were stored'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of documents read and updated per batch'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Document._base_manager.filter(size__isnull=True).order_by('pk')
+        last_pk = 0
+        updated = missing = 0
+        
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk).only('pk', 'file')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            
+            changed = []
+            for document in batch:
+                try:
+                    with document.file.open('rb') as f:
+                        document.size, document.sha256, document.mime_type = file_metadata(f)
+                except (FileNotFoundError, ValueError):
+                    missing += 1
+                    continue
+                changed.append(document)
+            
+            # bulk_update leaves updated_at alone, so download ETags stay valid
+            Document._base_manager.bulk_update(changed, ['size', 'sha256', 'mime_type'])
+            updated += len(changed)
+            self.stdout.write(f'Processed {updated + missing} documents')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {updated} documents ({missing} files missing from storage)'
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from documents.models import Document, DocumentBlob
+from documents.uploads import chunk_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing documents into content-addressed blobs, keeping one file per tenant and content. "
+        "Run backfill_document_metadata first; documents without a SHA-256 are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', help='Only deduplicate the tenant with this slug')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of documents read per batch'
+        )
+
+    def handle(self, *args, **options):
+        store = chunk_store()
+        storage = store.storage
+        pending = Document._base_manager.filter(blob__isnull=True).exclude(sha256='').select_related('tenant').order_by('pk')
+        if options['tenant']:
+            pending = pending.filter(tenant__slug=options['tenant'])
+        last_pk = 0
+        moved = removed = missing = freed = 0
+        
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk).only('pk', 'tenant', 'file', 'size', 'sha256', 'original_filename')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            
+            for document in batch:
+                source = document.file.name
+                if not storage.exists(source):
+                    missing += 1
+                    continue
+                with transaction.atomic():
+                    blob, created = DocumentBlob.objects.acquire(
+                        document.tenant, document.sha256, document.size, lambda name: store.move(source, name),
+                    )
+                    # update() leaves updated_at alone, so download ETags stay valid
+                    Document._base_manager.filter(pk=document.pk).update(
+                        blob=blob, file=blob.name, original_filename=document.filename,
+                    )
+                if created:
+                    moved += 1
+                else:
+                    storage.delete(source)
+                    removed += 1
+                    freed += document.size or 0
+            self.stdout.write(f'Processed {moved + removed + missing} documents')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {moved} documents as blobs and removed {removed} duplicate files '
+            f'({freed} bytes freed, {missing} files missing from storage)'
+        ))
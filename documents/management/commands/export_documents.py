@@ -0,0 +1,33 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Tenant
+from documents.export import client_folder, iter_documents, zip_stream
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = "Stream a ZIP archive of a tenant's documents, in one folder per client"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Slug of the tenant to export')
+        parser.add_argument('--client', type=int, help='Only export the documents of this client id')
+        parser.add_argument('--output', help='File to write; defaults to stdout')
+    
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(slug=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']!r} does not exist")
+        
+        documents = Document._base_manager.filter(tenant=tenant)
+        if options['client'] is not None:
+            documents = documents.filter(client_id=options['client'])
+        chunks = zip_stream(iter_documents(documents), folder=lambda document: client_folder(document.client))
+        
+        if options['output']:
+            with open(options['output'], 'wb') as handle:
+                handle.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Exported {tenant.slug} documents to {options['output']}"))
+        else:
+            sys.stdout.buffer.writelines(chunks)
+            sys.stdout.buffer.flush()
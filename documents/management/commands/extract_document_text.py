@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from documents import workers
+from documents.extraction import EXTRACTORS, schedule_extraction
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = 'Extract searchable text from TXT, DOCX and PDF documents that have none yet'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of documents queued per batch'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Extract every supported document again'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        documents = Document._base_manager.filter(mime_type__in=list(EXTRACTORS)).exclude(sha256='')
+        if not options['all']:
+            # No text yet, text of a replaced file, or extraction cut short
+            documents = documents.filter(
+                Q(content__isnull=True) | ~Q(content__sha256=F('sha256')) | Q(content__status='pending')
+            )
+        pending = documents.order_by('pk')
+        last_pk = 0
+        queued = 0
+        
+        try:
+            while True:
+                batch = list(pending.filter(pk__gt=last_pk).only('pk', 'tenant', 'file', 'sha256', 'mime_type', 'original_filename')[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                
+                # Wait for each batch so the pool's queue stays short
+                futures = [schedule_extraction(document, force=True) for document in batch]
+                for future in futures:
+                    if future is not None:
+                        future.exception()
+                queued += len(batch)
+                self.stdout.write(f'Processed {queued} documents')
+        finally:
+            workers.shutdown()
+        
+        self.stdout.write(self.style.SUCCESS(f'Extracted text from {queued} documents'))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from documents.models import DocumentUpload
+from documents.uploads import abort_upload
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that have not received a chunk recently, with their partial files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=settings.DOCUMENT_UPLOAD_EXPIRY_HOURS,
+            help='Purge uploads idle for longer than this many hours'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = DocumentUpload._base_manager.filter(updated_at__lt=cutoff).order_by('pk')
+        purged = 0
+        
+        for upload in stale.iterator():
+            abort_upload(upload)
+            purged += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} stale uploads'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['tenant', 'created_at', 'id'], name='document_tenant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['tenant', 'document_type'], name='document_tenant_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['client', 'created_at'], name='document_client_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:45
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_tenantdailystats'),
+        ('clients', '0003_hot_query_indexes'),
+        ('documents', '0004_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('file_name', models.CharField(editable=False, max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('chunk_size', models.PositiveIntegerField(editable=False)),
+                ('received', models.PositiveBigIntegerField(default=0, editable=False)),
+                ('multipart_id', models.CharField(blank=True, editable=False, max_length=255)),
+                ('parts', models.JSONField(default=list, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to='clients.client')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to=settings.AUTH_USER_MODEL)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to='accounts.tenant')),
+            ],
+        ),
+    ]
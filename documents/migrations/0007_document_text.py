@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    from clientportal.search import install_index
+    install_index('documents.documenttext', schema_editor, apps=apps)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from clientportal.search import uninstall_index
+    uninstall_index('documents.documenttext', schema_editor, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_tenantdailystats'),
+        ('documents', '0006_content_addressed_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='documents.document')),
+                ('sha256', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Extracted'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('text', models.TextField(blank=True)),
+                ('extracted_at', models.DateTimeField(blank=True, null=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_texts', to='accounts.tenant')),
+            ],
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_text'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='document',
+            name='document_client_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['client', 'created_at', 'id'], name='document_client_created_idx'),
+        ),
+    ]
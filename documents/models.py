@@ -1,9 +1,33 @@
-from django.db import models
+from functools import partial
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from accounts.models import Tenant
+from accounts.tenancy import TenantManager
 from clients.models import Client
 from django.utils import timezone
+import hashlib
+import mimetypes
 import os
+import uuid
+
+
+def file_metadata(file):
+    """Return (size, sha256, mime_type) for a file, reading it once in chunks
+    unless the upload handler already hashed it while it was received"""
+    mime_type, encoding = mimetypes.guess_type(file.name)
+    # A FieldFile wraps the uploaded file that carries the digest
+    sha256 = getattr(file, 'sha256', None) or getattr(getattr(file, 'file', None), 'sha256', None)
+    if sha256:
+        return file.size, sha256, mime_type or 'application/octet-stream'
+    
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return size, digest.hexdigest(), mime_type or 'application/octet-stream'
 
 
 def document_upload_path(instance, filename):
@@ -11,6 +35,65 @@ def document_upload_path(instance, filename):
     return f'documents/{instance.tenant.slug}/{instance.client.id}/{filename}'
 
 
+def blob_name(tenant, sha256):
+    """Storage name of a tenant's content-addressed blob"""
+    return f'blobs/{tenant.slug}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+class DocumentBlobManager(TenantManager):
+    def acquire(self, tenant, sha256, size, write):
+        """Return ``(blob, created)`` for the content, with one more reference.
+        
+        ``write(name)`` stores the content when the tenant does not have it
+        yet and returns the name it was stored under.
+        """
+        with transaction.atomic():
+            blob, created = self.unscoped().select_for_update().get_or_create(
+                tenant=tenant, sha256=sha256, defaults={'size': size, 'ref_count': 0},
+            )
+            if created:
+                # The name may differ from blob_name() while the file of a
+                # released blob with the same content is still being deleted
+                blob.name = write(blob_name(tenant, sha256))
+            blob.ref_count += 1
+            blob.save(update_fields=['name', 'ref_count'])
+        return blob, created
+    
+    def release(self, blob_id):
+        """Drop one reference; the last one deletes the blob and, after commit, its file"""
+        with transaction.atomic():
+            blob = self.unscoped().select_for_update().filter(pk=blob_id).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                blob.ref_count -= 1
+                blob.save(update_fields=['ref_count'])
+                return
+            blob.delete()
+            storage = Document._meta.get_field('file').storage
+            transaction.on_commit(partial(storage.delete, blob.name))
+
+
+class DocumentBlob(models.Model):
+    """Content stored once per tenant and shared by every document with the same SHA-256"""
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='document_blobs')
+    sha256 = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = DocumentBlobManager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'sha256'], name='document_blob_tenant_sha256_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} references)"
+
+
 class Document(models.Model):
     """Document model with tenant isolation and client association"""
     DOCUMENT_TYPES = [
@@ -27,35 +110,140 @@ class Document(models.Model):
     document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES, default='other')
     file = models.FileField(upload_to=document_upload_path)
     description = models.TextField(blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    sha256 = models.CharField(max_length=64, blank=True, editable=False)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    # Name the file was uploaded with; blob storage names are hashes
+    original_filename = models.CharField(max_length=255, blank=True, editable=False)
+    blob = models.ForeignKey(
+        DocumentBlob, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='documents',
+    )
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='uploaded_documents')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager(select_related=['client', 'uploaded_by'])
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'created_at', 'id'], name='document_tenant_created_idx'),
+            models.Index(fields=['tenant', 'document_type'], name='document_tenant_type_idx'),
+            models.Index(fields=['client', 'created_at', 'id'], name='document_client_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.client.full_name}"
     
+    def save(self, *args, **kwargs):
+        # Record size, hash and type while the new upload is being saved so
+        # listings never need to stat the storage backend
+        replaced_blob_id = None
+        if self.file and not self.file._committed:
+            self.original_filename = os.path.basename(self.file.name)
+            self.size, self.sha256, self.mime_type = file_metadata(self.file)
+            if settings.DOCUMENT_CONTENT_ADDRESSED:
+                replaced_blob_id = self.blob_id
+                self.store_in_blob()
+        super().save(*args, **kwargs)
+        if replaced_blob_id is not None:
+            DocumentBlob.objects.release(replaced_blob_id)
+    
+    def store_in_blob(self):
+        """Point the new upload at the tenant's blob for its content, writing it only if new"""
+        # The uploaded file itself, so a temporary upload is moved into place rather than copied
+        upload, storage = self.file.file, self.file.storage
+        self.blob, created = DocumentBlob.objects.acquire(
+            self.tenant, self.sha256, self.size, lambda name: storage.save(name, upload),
+        )
+        self.file.name = self.blob.name
+        self.file._committed = True
+    
     @property
     def filename(self):
-        return os.path.basename(self.file.name)
+        return self.original_filename or os.path.basename(self.file.name)
     
     @property
     def file_size(self):
+        if self.size is not None:
+            return self.size
+        # Rows uploaded before metadata was persisted, until backfilled
         try:
             return self.file.size
         except:
             return 0
     
+    @property
+    def snippet_html(self):
+        """The highlighted ``search_snippet`` of a content search result"""
+        from clientportal.search import highlight
+        return highlight(getattr(self, 'search_snippet', ''))
+    
+    @property
+    def has_preview(self):
+        from .previews import preview_supported
+        return preview_supported(self)
+    
     @property
     def file_extension(self):
-        name, extension = os.path.splitext(self.file.name)
+        name, extension = os.path.splitext(self.filename)
         return extension.lower()
     
     def delete(self, *args, **kwargs):
-        # Delete the file from storage when the model is deleted
-        if self.file:
+        # Delete the file from storage when the model is deleted; shared blobs
+        # are released by the post_delete signal instead
+        if self.file and self.blob_id is None:
             if os.path.isfile(self.file.path):
                 os.remove(self.file.path)
         super().delete(*args, **kwargs)
+
+
+class DocumentText(models.Model):
+    """Text extracted from a document's file for content search, kept off the ``Document`` row"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Extracted'),
+        ('failed', 'Failed'),
+    ]
+    
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='document_texts')
+    # Hash of the file the text was (or is being) extracted from
+    sha256 = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    text = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = TenantManager()
+    
+    def __str__(self):
+        return f"Text of document {self.document_id} ({self.get_status_display()})"
+
+
+class DocumentUpload(models.Model):
+    """A chunked upload in progress; ``uploads.commit_upload()`` turns it into a Document"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='document_uploads')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='document_uploads')
+    filename = models.CharField(max_length=255)
+    # Storage name the chunks are written to; the document's file on commit
+    file_name = models.CharField(max_length=255, editable=False)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    chunk_size = models.PositiveIntegerField(editable=False)
+    received = models.PositiveBigIntegerField(default=0, editable=False)
+    # S3 multipart upload id and the ETag of each uploaded part
+    multipart_id = models.CharField(max_length=255, blank=True, editable=False)
+    parts = models.JSONField(default=list, editable=False)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='document_uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = TenantManager(select_related=['tenant', 'client', 'created_by'])
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes)"
+    
+    @property
+    def complete(self):
+        return self.received == self.size
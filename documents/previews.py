@@ -0,0 +1,205 @@
+"""
+Document previews.
+
+JPEG and PNG uploads get a thumbnail and PDFs a rendering of their first
+page, both as JPEGs that fit in a ``DOCUMENT_PREVIEW_SIZE`` pixel square.
+Renditions are files under ``DOCUMENT_PREVIEW_ROOT`` named after the
+content's SHA-256, so identical uploads share one and a replaced file gets
+a new one; nothing needs invalidating.
+
+Rendering runs in the document worker pool, so decoding large images never
+holds a web worker's GIL. Documents are queued when they are saved, and the
+preview view waits briefly for one that is still in the queue. A file that
+cannot be rendered leaves a ``.failed`` marker so it is not tried again on
+every request; pool, storage and disk errors are not the file's fault and are
+retried on the next request.
+
+Only the ``render_*`` functions run in the pool.
+"""
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from functools import partial
+import pypdfium2
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from PIL import Image, ImageOps
+from . import workers
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TYPES = ['image/jpeg', 'image/png']
+PDF_TYPES = ['application/pdf']
+CONTENT_TYPE = 'image/jpeg'
+
+
+class PreviewError(Exception):
+    """The file itself could not be rendered"""
+
+
+# Renditions being rendered, by target path, so each is queued only once
+_pending = {}
+_lock = threading.Lock()
+
+
+def _flatten(image):
+    """An RGB copy of ``image`` with any transparency over white"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_image(source, size):
+    with Image.open(source) as image:
+        # JPEGs are decoded at the smallest DCT scale that still covers the
+        # thumbnail, which skips most of the decoding work for photos
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        return _flatten(image)
+
+
+def render_pdf(source, size):
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        image = page.render(scale=size / max(width, height, 1)).to_pil()
+        image.thumbnail((size, size))
+        return _flatten(image)
+    finally:
+        pdf.close()
+
+
+def render_preview(mime_type, source, target, size):
+    """Write the preview of ``source`` to ``target``; runs in a pool process"""
+    try:
+        image = render_pdf(source, size) if mime_type in PDF_TYPES else render_image(source, size)
+    except (MemoryError, FileNotFoundError, PermissionError):
+        raise
+    except Exception as exc:
+        # Undecodable, truncated or unsupported content; exceptions are
+        # pickled back from the pool, so only the message is kept
+        raise PreviewError(str(exc)) from None
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    # Readers never see a half-written file
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, 'JPEG', quality=80, optimize=True)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return target
+
+
+def preview_supported(document):
+    return bool(document.sha256) and document.mime_type in IMAGE_TYPES + PDF_TYPES
+
+
+def preview_path(document):
+    sha256 = document.sha256
+    return os.path.join(settings.DOCUMENT_PREVIEW_ROOT, sha256[:2], f'{sha256}-{settings.DOCUMENT_PREVIEW_SIZE}.jpg')
+
+
+def preview_failed(document):
+    return os.path.exists(preview_path(document) + '.failed')
+
+
+def _copy_outcome(future, pool_future):
+    if pool_future.exception() is not None:
+        future.set_exception(pool_future.exception())
+    else:
+        future.set_result(pool_future.result())
+
+
+def _finished(target, cleanup, future):
+    with _lock:
+        _pending.pop(target, None)
+    if cleanup:
+        os.unlink(cleanup)
+    exc = future.exception()
+    if isinstance(exc, PreviewError):
+        logger.warning('Could not render preview %s: %s', target, exc)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            open(target + '.failed', 'w').close()
+        except OSError:
+            pass
+    elif exc is not None:
+        # Not the file's fault; the next request tries again
+        logger.warning('Preview %s was not rendered: %s', target, exc)
+
+
+def schedule_preview(document):
+    """Queue the document's preview; return a Future, or ``None`` if there is nothing to do"""
+    if not preview_supported(document):
+        return None
+    target = preview_path(document)
+    if os.path.exists(target) or preview_failed(document):
+        return None
+    
+    with _lock:
+        if target in _pending:
+            return _pending[target]
+        future = _pending[target] = Future()
+    
+    cleanup = None
+    try:
+        source, cleanup = workers.local_source(document)
+        workers.submit(
+            render_preview, document.mime_type, source, target, settings.DOCUMENT_PREVIEW_SIZE,
+        ).add_done_callback(partial(_copy_outcome, future))
+    except Exception as exc:
+        if not future.done():
+            future.set_exception(exc)
+    future.add_done_callback(partial(_finished, target, cleanup))
+    return future
+
+
+def serve_preview(request, document):
+    """The document's preview, rendering it first if need be.
+    
+    Preview URLs carry the content hash, so responses may be cached for a
+    year; the ``ETag`` covers browsers that revalidate anyway.
+    """
+    if not preview_supported(document) or preview_failed(document):
+        raise Http404('This document has no preview')
+    etag = quote_etag(document.sha256)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+        return response
+    
+    target = preview_path(document)
+    if not os.path.exists(target):
+        future = schedule_preview(document)
+        try:
+            if future is not None:
+                future.result(timeout=settings.DOCUMENT_PREVIEW_WAIT)
+        except PreviewError:
+            raise Http404('This document has no preview')
+        except Exception:
+            # Still rendering, or a pool, storage or disk error: worth asking again
+            response = HttpResponse(status=503)
+            response['Retry-After'] = 2
+            return response
+    
+    try:
+        file = open(target, 'rb')
+    except FileNotFoundError:
+        raise Http404('This document has no preview')
+    response = FileResponse(file, content_type=CONTENT_TYPE)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+    return response
@@ -0,0 +1,156 @@
+"""
+Document download responses.
+
+Files are streamed from storage in fixed-size chunks, so a download never
+holds more than one chunk in worker memory. Single byte ranges, ``ETag`` and
+``Last-Modified`` validators (derived from ``Document.updated_at``) are
+supported. With ``DOCUMENT_DOWNLOAD_MODE`` set to ``x-accel-redirect`` or
+``x-sendfile``, the transfer is handed to the front-end server after the
+view has done its tenant check.
+"""
+import mimetypes
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def document_etag(document):
+    return quote_etag(f'{document.pk}-{int(document.updated_at.timestamp() * 1000000)}')
+
+
+def document_last_modified(document):
+    return int(document.updated_at.timestamp())
+
+
+def _content_type(document):
+    if document.mime_type:
+        return document.mime_type
+    content_type, encoding = mimetypes.guess_type(document.filename)
+    return content_type or 'application/octet-stream'
+
+
+def _attachment(response, document):
+    response['Content-Disposition'] = content_disposition_header(True, document.filename)
+
+
+def _add_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` for a single satisfiable byte range, ``None`` to serve
+    the whole file, or ``False`` if the range cannot be satisfied"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Malformed or multi-range requests get the full representation
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(file, start, end):
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _offload_response(document):
+    mode = settings.DOCUMENT_DOWNLOAD_MODE
+    response = HttpResponse(content_type=_content_type(document))
+    if mode == 'x-accel-redirect':
+        prefix = settings.DOCUMENT_ACCEL_REDIRECT_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = f'{prefix}/{quote(document.file.name)}'
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = document.file.path
+    else:
+        raise ImproperlyConfigured(
+            f"DOCUMENT_DOWNLOAD_MODE must be 'stream', 'x-accel-redirect' or 'x-sendfile', not {mode!r}"
+        )
+    _attachment(response, document)
+    return response
+
+
+def serve_document(request, document):
+    """Build the download response for a document the user may access"""
+    if not document.file:
+        raise Http404("File not found")
+    
+    etag = document_etag(document)
+    last_modified = document_last_modified(document)
+    
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _add_validators(not_modified, etag, last_modified)
+    
+    if settings.DOCUMENT_DOWNLOAD_MODE != 'stream':
+        return _add_validators(_offload_response(document), etag, last_modified)
+    
+    try:
+        file = document.file.storage.open(document.file.name, 'rb')
+    except FileNotFoundError:
+        raise Http404("File not found")
+    size = document.file_size
+    
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+    
+    if byte_range is False:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=True, filename=document.filename)
+        response.block_size = CHUNK_SIZE
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(file, start, end), status=206, content_type=_content_type(document)
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        _attachment(response, document)
+    
+    response['Accept-Ranges'] = 'bytes'
+    return _add_validators(response, etag, last_modified)
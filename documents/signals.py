@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts import rollups
+from clientportal import search
+from clientportal.stats import invalidate_dashboard_stats
+from . import extraction, previews
+from .models import Document, DocumentBlob, DocumentText
+
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, created, **kwargs):
+    """Keep tenant rollups, cached statistics and the search index in step with document writes"""
+    rollups.record_saved(instance, created)
+    search.index_instance(instance)
+    invalidate_dashboard_stats(instance.tenant_id)
+    if previews.preview_supported(instance):
+        # Render ahead of the first page view
+        transaction.on_commit(lambda: previews.schedule_preview(instance))
+    if extraction.extraction_supported(instance):
+        transaction.on_commit(lambda: extraction.schedule_extraction(instance))
+    elif not created:
+        extraction.discard_text(instance)
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    rollups.record_deleted(instance)
+    search.remove_instance(instance)
+    invalidate_dashboard_stats(instance.tenant_id)
+    if instance.blob_id is not None:
+        DocumentBlob.objects.release(instance.blob_id)
+
+
+@receiver(post_delete, sender=DocumentText)
+def document_text_deleted(sender, instance, **kwargs):
+    search.remove_instance(instance)
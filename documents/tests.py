@@ -1,3 +1,665 @@
-from django.test import TestCase
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from accounts.models import Tenant, UserProfile
+from clients.models import Client
+from clientportal.search import RANKED_ORDERING
+from . import previews, workers
+from .export import iter_documents, zip_stream
+from .extraction import store_text
+from .forms import DocumentSearchForm
+from .models import Document, DocumentBlob, DocumentText, DocumentUpload, file_metadata
+from .serving import CHUNK_SIZE
 
-# Create your tests here.
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, DOCUMENT_PREVIEW_ROOT=os.path.join(MEDIA_ROOT, 'previews'), DOCUMENT_WORKERS=0)
+class DocumentTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+    
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.client_obj = Client.objects.create(
+            tenant=self.tenant, first_name='John', last_name='Smith', email='john@example.com',
+        )
+        self.client.force_login(self.user)
+    
+    def create_document(self, content=b'0123456789' * 1000, name='report.txt', **kwargs):
+        return Document.objects.create(
+            tenant=self.tenant, client=self.client_obj, title='Report',
+            file=SimpleUploadedFile(name, content), uploaded_by=self.user, **kwargs,
+        )
+
+
+class DocumentDownloadTests(DocumentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = b'0123456789' * 1000
+        self.document = self.create_document(self.content)
+        self.url = reverse('documents:document_download', args=[self.document.pk])
+    
+    def test_streams_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+    
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+        
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+    
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        self.document.title = 'Renamed'
+        self.document.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+    
+    @override_settings(DOCUMENT_DOWNLOAD_MODE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.document.file.name}')
+    
+    @override_settings(DOCUMENT_DOWNLOAD_MODE='x-sendfile')
+    def test_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Sendfile'], self.document.file.path)
+    
+    @override_settings(DOCUMENT_DOWNLOAD_MODE='x-sendfle')
+    def test_unknown_download_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(self.url)
+    
+    def test_other_tenant_cannot_download(self):
+        other = Tenant.objects.create(name='Other', slug='other')
+        user = User.objects.create_user('bob', password='secret')
+        UserProfile.objects.create(user=user, tenant=other)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class DocumentMetadataTests(DocumentTestCase):
+    def test_metadata_recorded_on_upload(self):
+        content = b'%PDF-1.4 example'
+        document = self.create_document(content, name='contract.pdf')
+        self.assertEqual(document.size, len(content))
+        self.assertEqual(document.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(document.mime_type, 'application/pdf')
+        
+        document = Document.objects.unscoped().get(pk=document.pk)
+        with mock.patch.object(document.file.storage, 'size') as storage_size:
+            self.assertEqual(document.file_size, len(content))
+        storage_size.assert_not_called()
+    
+    def test_form_upload(self):
+        response = self.client.post(reverse('documents:document_create'), {
+            'client': self.client_obj.pk,
+            'title': 'Notes',
+            'document_type': 'other',
+            'file': SimpleUploadedFile('notes.txt', b'hello'),
+        })
+        self.assertEqual(response.status_code, 302)
+        document = Document.objects.unscoped().get(title='Notes')
+        self.assertEqual((document.size, document.mime_type), (5, 'text/plain'))
+    
+    def test_backfill_command(self):
+        document = self.create_document(b'abc')
+        Document.objects.unscoped().filter(pk=document.pk).update(size=None, sha256='', mime_type='')
+        call_command('backfill_document_metadata', stdout=StringIO())
+        document.refresh_from_db()
+        self.assertEqual(document.size, 3)
+        self.assertEqual(document.sha256, hashlib.sha256(b'abc').hexdigest())
+
+
+@override_settings(DOCUMENT_UPLOAD_CHUNK_SIZE=4, DOCUMENT_MAX_UPLOAD_SIZE=20)
+class ChunkedUploadTests(DocumentTestCase):
+    content = b'0123456789'
+    
+    def start(self, filename='contract.pdf', size=len(content), **data):
+        return self.client.post(reverse('documents:upload_start'), {
+            'client': self.client_obj.pk, 'filename': filename, 'size': size, **data,
+        })
+    
+    def append(self, upload, offset, data, digest=None):
+        digest = digest if digest is not None else hashlib.sha256(data).digest()
+        return self.client.post(upload['append_url'], data, content_type='application/octet-stream', headers={
+            'Upload-Offset': str(offset),
+            'Content-Digest': f'sha-256=:{base64.b64encode(digest).decode()}:',
+        })
+    
+    def commit(self, upload, title='Signed contract'):
+        return self.client.post(upload['commit_url'], {'title': title, 'document_type': 'contract'})
+    
+    def upload_all(self):
+        upload = self.start().json()
+        for offset in range(0, len(self.content), upload['chunk_size']):
+            response = self.append(upload, offset, self.content[offset:offset + upload['chunk_size']])
+            self.assertEqual(response.status_code, 200)
+        return upload
+    
+    def test_chunks_become_a_document_on_commit(self):
+        upload = self.upload_all()
+        self.assertEqual(upload['chunk_size'], 4)
+        self.assertFalse(Document.objects.unscoped().exists())
+        
+        response = self.commit(upload)
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.unscoped().get()
+        self.assertEqual(response.json()['url'], reverse('documents:document_detail', args=[document.pk]))
+        self.assertRegex(document.file.name, rf'^documents/acme/{self.client_obj.pk}/contract(_\w+)?\.pdf$')
+        self.assertEqual((document.size, document.mime_type), (10, 'application/pdf'))
+        self.assertEqual(document.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(document.uploaded_by, self.user)
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(DocumentUpload.objects.unscoped().exists())
+    
+    def test_resume_from_reported_offset(self):
+        upload = self.start().json()
+        self.append(upload, 0, self.content[:4])
+        
+        response = self.append(upload, 0, self.content[:4])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 4)
+        self.assertEqual(self.client.get(upload['url']).json()['offset'], 4)
+        
+        self.append(upload, 4, self.content[4:8])
+        self.append(upload, 8, self.content[8:])
+        self.assertEqual(self.commit(upload).status_code, 201)
+        with Document.objects.unscoped().get().file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+    
+    def test_chunk_must_match_its_digest(self):
+        upload = self.start().json()
+        response = self.append(upload, 0, b'0123', digest=hashlib.sha256(b'garbled').digest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['offset'], 0)
+    
+    def test_only_the_last_chunk_may_be_short(self):
+        upload = self.start().json()
+        self.assertEqual(self.append(upload, 0, b'012').status_code, 400)
+        self.assertEqual(self.append(upload, 0, b'01234').status_code, 413)
+    
+    def test_file_is_hashed_before_the_row_is_locked(self):
+        upload = self.upload_all()
+        depths = []
+        
+        def hashed(f):
+            depths.append(len(connection.atomic_blocks))
+            return file_metadata(f)
+        
+        with mock.patch('documents.uploads.file_metadata', side_effect=hashed):
+            self.assertEqual(self.commit(upload).status_code, 201)
+        self.assertEqual(depths, [len(connection.atomic_blocks)])
+    
+    def test_commit_needs_every_byte(self):
+        upload = self.start().json()
+        self.append(upload, 0, self.content[:4])
+        self.assertEqual(self.commit(upload).status_code, 409)
+        self.assertFalse(Document.objects.unscoped().exists())
+    
+    def test_whole_file_checksum_is_verified(self):
+        upload = self.start(sha256='0' * 64).json()
+        self.append(upload, 0, self.content[:4])
+        self.append(upload, 4, self.content[4:8])
+        self.append(upload, 8, self.content[8:])
+        self.assertEqual(self.commit(upload).status_code, 400)
+        self.assertFalse(Document.objects.unscoped().exists())
+        self.assertFalse(DocumentUpload.objects.unscoped().exists())
+    
+    def test_start_validation(self):
+        self.assertEqual(self.start(filename='script.exe').status_code, 400)
+        response = self.start(size=21)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('size', response.json()['errors'])
+    
+    def test_abort_removes_partial_file(self):
+        upload = self.start().json()
+        self.append(upload, 0, self.content[:4])
+        path = Document._meta.get_field('file').storage.path(DocumentUpload.objects.unscoped().get().file_name)
+        self.assertTrue(os.path.exists(path))
+        
+        self.assertEqual(self.client.delete(upload['url']).status_code, 204)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(DocumentUpload.objects.unscoped().exists())
+    
+    def test_other_tenant_cannot_see_upload(self):
+        upload = self.start().json()
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        bob = User.objects.create_user('bob', password='secret')
+        UserProfile.objects.create(user=bob, tenant=other, role='admin')
+        self.client.force_login(bob)
+        self.assertEqual(self.client.get(upload['url']).status_code, 404)
+        self.assertEqual(self.append(upload, 0, self.content[:4]).status_code, 404)
+    
+    def test_purge_stale_uploads(self):
+        self.start()
+        fresh = self.start(filename='fresh.pdf').json()
+        DocumentUpload.objects.unscoped().exclude(pk=fresh['id']).update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('purge_stale_uploads', stdout=StringIO())
+        self.assertEqual([str(pk) for pk in DocumentUpload.objects.unscoped().values_list('pk', flat=True)], [fresh['id']])
+
+
+@override_settings(DOCUMENT_CONTENT_ADDRESSED=True)
+class ContentAddressedStorageTests(DocumentTestCase):
+    content = b'Engagement letter template'
+    
+    def path(self, document):
+        return document.file.storage.path(document.file.name)
+    
+    def test_duplicates_share_one_blob(self):
+        first = self.create_document(self.content, name='letter.pdf')
+        second = self.create_document(self.content, name='letter-copy.pdf')
+        blob = DocumentBlob.objects.unscoped().get()
+        self.assertEqual((blob.ref_count, blob.size), (2, len(self.content)))
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith(f'blobs/acme/{blob.sha256[:2]}/{blob.sha256[2:4]}/{blob.sha256}'))
+        self.assertEqual((first.filename, second.filename), ('letter.pdf', 'letter-copy.pdf'))
+        self.assertEqual(second.mime_type, 'application/pdf')
+        
+        response = self.client.get(reverse('documents:document_download', args=[second.pk]))
+        self.assertIn('filename="letter-copy.pdf"', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+    
+    def test_blob_is_deleted_with_its_last_reference(self):
+        first = self.create_document(self.content)
+        self.create_document(self.content)
+        path = self.path(first)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(DocumentBlob.objects.unscoped().get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_obj.delete()
+        self.assertFalse(DocumentBlob.objects.unscoped().exists())
+        self.assertFalse(os.path.exists(path))
+    
+    def test_tenants_do_not_share_blobs(self):
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        mine = self.create_document(self.content)
+        theirs = Document.objects.create(
+            tenant=other, client=hank, title='Letter', file=SimpleUploadedFile('letter.pdf', self.content),
+        )
+        self.assertNotEqual(mine.blob_id, theirs.blob_id)
+        self.assertTrue(theirs.file.name.startswith('blobs/globex/'))
+    
+    def test_replacing_the_file_releases_the_old_blob(self):
+        document = self.create_document(self.content)
+        document.file = SimpleUploadedFile('letter.pdf', b'Second draft')
+        with self.captureOnCommitCallbacks(execute=True):
+            document.save()
+        blob = DocumentBlob.objects.unscoped().get()
+        self.assertEqual((blob.sha256, blob.ref_count), (hashlib.sha256(b'Second draft').hexdigest(), 1))
+    
+    def test_form_upload_is_hashed_while_received(self):
+        with mock.patch('documents.models.file_metadata', wraps=file_metadata) as metadata:
+            response = self.client.post(reverse('documents:document_create'), {
+                'client': self.client_obj.pk, 'title': 'Letter', 'document_type': 'other',
+                'file': SimpleUploadedFile('letter.txt', self.content),
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(metadata.call_args.args[0].file.sha256, hashlib.sha256(self.content).hexdigest())
+        document = Document.objects.unscoped().get()
+        self.assertEqual(document.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(document.blob.ref_count, 1)
+    
+    @override_settings(DOCUMENT_UPLOAD_CHUNK_SIZE=16)
+    def test_chunked_upload_of_known_content(self):
+        existing = self.create_document(self.content)
+        upload = self.client.post(reverse('documents:upload_start'), {
+            'client': self.client_obj.pk, 'filename': 'again.pdf', 'size': len(self.content),
+        }).json()
+        staging = DocumentUpload.objects.unscoped().get().file_name
+        self.assertTrue(staging.startswith('uploads/acme/'))
+        for offset in range(0, len(self.content), 16):
+            chunk = self.content[offset:offset + 16]
+            self.client.post(upload['append_url'], chunk, content_type='application/octet-stream', headers={
+                'Upload-Offset': str(offset),
+                'Content-Digest': f'sha-256=:{base64.b64encode(hashlib.sha256(chunk).digest()).decode()}:',
+            })
+        response = self.client.post(upload['commit_url'], {'title': 'Again', 'document_type': 'other'})
+        self.assertEqual(response.status_code, 201)
+        
+        document = Document.objects.unscoped().get(pk=response.json()['id'])
+        self.assertEqual((document.blob_id, document.file.name), (existing.blob_id, existing.file.name))
+        self.assertEqual((document.filename, document.mime_type), ('again.pdf', 'application/pdf'))
+        self.assertEqual(DocumentBlob.objects.unscoped().get().ref_count, 2)
+        self.assertFalse(document.file.storage.exists(staging))
+    
+    def test_deduplicate_command(self):
+        with override_settings(DOCUMENT_CONTENT_ADDRESSED=False):
+            first = self.create_document(self.content, name='a.txt')
+            second = self.create_document(self.content, name='b.txt')
+        old_paths = [self.path(first), self.path(second)]
+        
+        out = StringIO()
+        call_command('deduplicate_documents', stdout=out)
+        self.assertIn('removed 1 duplicate files', out.getvalue())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual((first.filename, second.filename), ('a.txt', 'b.txt'))
+        self.assertEqual(DocumentBlob.objects.unscoped().get().ref_count, 2)
+        self.assertFalse(any(os.path.exists(path) for path in old_paths))
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+
+class DocumentPreviewTests(DocumentTestCase):
+    def setUp(self):
+        super().setUp()
+        # Renditions are shared by content, across tests too
+        shutil.rmtree(settings.DOCUMENT_PREVIEW_ROOT, ignore_errors=True)
+    
+    def image_bytes(self, format, mode='RGB', size=(800, 600), color='red'):
+        buffer = BytesIO()
+        Image.new(mode, size, color).save(buffer, format)
+        return buffer.getvalue()
+    
+    def get_preview(self, document, **kwargs):
+        return self.client.get(reverse('documents:document_preview', args=[document.pk]), **kwargs)
+    
+    def preview_image(self, response):
+        return Image.open(BytesIO(b''.join(response.streaming_content)))
+    
+    def test_image_thumbnail(self):
+        document = self.create_document(self.image_bytes('JPEG'), name='photo.jpg')
+        response = self.get_preview(document)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(self.preview_image(response).size, (320, 240))
+        self.assertTrue(os.path.exists(previews.preview_path(document)))
+    
+    def test_transparent_png_is_flattened(self):
+        document = self.create_document(self.image_bytes('PNG', 'RGBA', (100, 400), (0, 0, 0, 0)), name='logo.png')
+        image = self.preview_image(self.get_preview(document))
+        self.assertEqual(image.size, (80, 320))
+        self.assertEqual(image.getpixel((40, 160)), (255, 255, 255))
+    
+    def test_pdf_first_page(self):
+        document = self.create_document(self.image_bytes('PDF', size=(300, 600)), name='scan.pdf')
+        image = self.preview_image(self.get_preview(document))
+        self.assertEqual(image.size, (160, 320))
+    
+    def test_cache_headers_and_revalidation(self):
+        document = self.create_document(self.image_bytes('PNG'), name='chart.png')
+        response = self.get_preview(document)
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{document.sha256}"')
+        
+        response = self.get_preview(document, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+    
+    def test_identical_content_shares_a_rendition(self):
+        content = self.image_bytes('PNG')
+        first = self.create_document(content, name='a.png')
+        self.get_preview(first)
+        second = self.create_document(content, name='b.png')
+        with mock.patch('documents.previews.render_preview') as render:
+            self.assertEqual(self.get_preview(second).status_code, 200)
+        render.assert_not_called()
+    
+    def test_unsupported_and_broken_files(self):
+        self.assertEqual(self.get_preview(self.create_document()).status_code, 404)
+        
+        broken = self.create_document(b'not an image', name='broken.png')
+        with self.assertLogs('documents.previews', 'WARNING'):
+            self.assertEqual(self.get_preview(broken).status_code, 404)
+        self.assertTrue(previews.preview_failed(broken))
+        with mock.patch('documents.previews.render_preview') as render:
+            self.assertEqual(self.get_preview(broken).status_code, 404)
+        render.assert_not_called()
+    
+    def test_transient_errors_are_retried(self):
+        document = self.create_document(self.image_bytes('PNG'), name='chart.png')
+        with mock.patch('documents.workers.local_source', side_effect=OSError('Storage unavailable')):
+            with self.assertLogs('documents.previews', 'WARNING'):
+                response = self.get_preview(document)
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '2'))
+        self.assertFalse(previews.preview_failed(document))
+        self.assertEqual(self.get_preview(document).status_code, 200)
+    
+    def test_rendered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            document = self.create_document(self.image_bytes('JPEG'), name='photo.jpg')
+        self.assertTrue(os.path.exists(previews.preview_path(document)))
+    
+    @override_settings(DOCUMENT_WORKERS=1)
+    def test_process_pool(self):
+        document = self.create_document(self.image_bytes('JPEG'), name='photo.jpg')
+        self.addCleanup(workers.shutdown)
+        self.assertEqual(self.get_preview(document).status_code, 200)
+        self.assertIsNotNone(workers._executor)
+
+
+@override_settings(DOCUMENT_WORKERS=1)
+class WorkerPoolTests(SimpleTestCase):
+    def test_broken_pool_is_replaced(self):
+        self.addCleanup(workers.shutdown)
+        with self.assertRaises(BrokenProcessPool):
+            workers.submit(os._exit, 1).result(timeout=60)
+        self.assertEqual(workers.submit(len, 'abc').result(timeout=60), 3)
+
+
+def make_pdf(text):
+    """A one-page PDF showing ``text``"""
+    stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode()
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    pdf = b'%PDF-1.4\n'
+    for number, body in enumerate(objects, start=1):
+        pdf += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    return pdf + b'trailer\n<< /Root 1 0 R >>\n%%EOF\n'
+
+
+def make_docx(*paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{paragraph}</w:t></w:r></w:p>' for paragraph in paragraphs)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ))
+    return buffer.getvalue()
+
+
+class DocumentTextTests(DocumentTestCase):
+    def create_document(self, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return super().create_document(*args, **kwargs)
+    
+    def search_contents(self, text, tenant=None):
+        form = DocumentSearchForm({'search': text, 'scope': 'content'}, tenant=tenant or self.tenant)
+        documents = form.filter_queryset(Document.objects.for_tenant(tenant or self.tenant), tenant or self.tenant)
+        return list(documents.order_by(*RANKED_ORDERING))
+    
+    def test_extracts_supported_types(self):
+        txt = self.create_document(b'Call about PO 4471', name='notes.txt')
+        pdf = self.create_document(make_pdf('Invoice for PO 4471'), name='invoice.pdf')
+        docx = self.create_document(make_docx('Statement of work', 'Rate card'), name='sow.docx')
+        self.create_document(b'\x89PNG', name='logo.png')
+        
+        texts = {text.document_id: text for text in DocumentText.objects.unscoped()}
+        self.assertEqual(set(texts), {txt.pk, pdf.pk, docx.pk})
+        self.assertEqual(texts[txt.pk].text, 'Call about PO 4471')
+        self.assertIn('Invoice for PO 4471', texts[pdf.pk].text)
+        self.assertEqual(texts[docx.pk].text, 'Statement of work\nRate card\n')
+        self.assertTrue(all(text.status == 'done' and text.extracted_at for text in texts.values()))
+    
+    def test_content_search_with_snippets(self):
+        invoice = self.create_document(b'Invoice for PO 4471. Payment due in 30 days.', name='invoice.txt')
+        self.create_document(b'Meeting notes', name='notes.txt')
+        results = self.search_contents('po 4471')
+        self.assertEqual(results, [invoice])
+        self.assertEqual(results[0].snippet_html, 'Invoice for <mark>PO</mark> <mark>4471</mark> Payment due in 30 days')
+        # The normal search leaves file contents alone
+        form = DocumentSearchForm({'search': '4471'}, tenant=self.tenant)
+        self.assertFalse(form.filter_queryset(Document.objects.for_tenant(self.tenant), self.tenant).exists())
+    
+    def test_list_view_shows_snippets(self):
+        self.create_document(b'Invoice for PO 4471', name='invoice.txt')
+        response = self.client.get(reverse('documents:document_list'), {'search': '4471', 'scope': 'content'})
+        self.assertContains(response, 'Invoice for PO <mark>4471</mark>', html=False)
+        response = self.client.get(reverse('documents:document_list'))
+        self.assertNotContains(response, 'data-search-snippet')
+    
+    def test_snippets_are_escaped(self):
+        self.create_document(b'<script>alert(1)</script> PO 4471', name='evil.txt')
+        self.assertEqual(self.search_contents('4471')[0].snippet_html, 'script alert 1 script PO <mark>4471</mark>')
+    
+    def test_content_search_is_tenant_scoped(self):
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        self.create_document(b'PO 4471', name='mine.txt')
+        with self.captureOnCommitCallbacks(execute=True):
+            theirs = Document.objects.create(
+                tenant=other, client=hank, title='Theirs', file=SimpleUploadedFile('theirs.txt', b'PO 4471'),
+            )
+        self.assertEqual(self.search_contents('4471', other), [theirs])
+    
+    def test_replaced_and_deleted_files(self):
+        document = self.create_document(b'First draft mentions zebras', name='draft.txt')
+        document.file = SimpleUploadedFile('draft.txt', b'Second draft mentions giraffes')
+        with self.captureOnCommitCallbacks(execute=True):
+            document.save()
+        self.assertEqual(self.search_contents('zebras'), [])
+        self.assertEqual(self.search_contents('giraffes'), [document])
+        
+        document.file = SimpleUploadedFile('draft.png', b'\x89PNG')
+        document.save()
+        self.assertFalse(DocumentText.objects.unscoped().exists())
+        self.assertEqual(self.search_contents('giraffes'), [])
+    
+    def test_result_for_replaced_file_is_dropped(self):
+        document = self.create_document(b'Current text', name='notes.txt')
+        store_text(document.pk, 'other-hash', 'Stale text')
+        self.assertEqual(DocumentText.objects.unscoped().get().text, 'Current text')
+    
+    def test_pool_failure_is_marked_failed(self):
+        executor = mock.Mock(**{'submit.side_effect': BrokenProcessPool('A worker died')})
+        with mock.patch('documents.workers.get_executor', return_value=executor):
+            with self.assertLogs('documents.extraction', 'WARNING'):
+                self.create_document(b'Saved all the same', name='notes.txt')
+        self.assertEqual(executor.submit.call_count, 2)
+        self.assertEqual(DocumentText.objects.unscoped().get().status, 'failed')
+    
+    def test_unreadable_file_is_marked_failed(self):
+        with self.assertLogs('documents.extraction', 'WARNING'):
+            self.create_document(b'not a zip', name='broken.docx')
+        self.assertEqual(DocumentText.objects.unscoped().get().status, 'failed')
+    
+    def test_extract_command(self):
+        with mock.patch('documents.signals.extraction.schedule_extraction'):
+            document = self.create_document(b'Backfilled text', name='old.txt')
+        self.assertFalse(DocumentText.objects.unscoped().exists())
+        out = StringIO()
+        call_command('extract_document_text', stdout=out)
+        self.assertIn('Extracted text from 1 documents', out.getvalue())
+        self.assertEqual(self.search_contents('backfilled'), [document])
+        
+        call_command('extract_document_text', stdout=out)
+        self.assertIn('Extracted text from 0 documents', out.getvalue())
+
+
+class DocumentExportTests(DocumentTestCase):
+    def read_zip(self, response):
+        self.assertTrue(response.streaming)
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+    
+    def test_client_download_all(self):
+        self.create_document(b'notes ' * 1000, name='notes.txt')
+        self.create_document(b'\x89PNG' * 100, name='logo.png')
+        self.create_document(b'second notes', name='notes.txt')
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        Document.objects.create(tenant=other, client=hank, title='Theirs', file=SimpleUploadedFile('theirs.txt', b'x'))
+        
+        response = self.client.get(reverse('clients:client_documents_download', args=[self.client_obj.pk]))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('filename="John Smith documents.zip"', response['Content-Disposition'])
+        archive = self.read_zip(response)
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['notes.txt', 'logo.png', 'notes (2).txt'])
+        self.assertEqual(archive.read('notes.txt'), b'notes ' * 1000)
+        self.assertEqual(archive.read('notes (2).txt'), b'second notes')
+        self.assertEqual(archive.getinfo('notes.txt').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.getinfo('logo.png').compress_type, zipfile.ZIP_STORED)
+        
+        hank_url = reverse('clients:client_documents_download', args=[hank.pk])
+        self.assertEqual(self.client.get(hank_url).status_code, 404)
+    
+    def test_streams_in_bounded_chunks(self):
+        content = os.urandom(1024 * 1024)
+        self.create_document(content, name='photo.jpg')
+        chunks = list(zip_stream(iter_documents(Document.objects.unscoped())))
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 2 * CHUNK_SIZE)
+        self.assertEqual(zipfile.ZipFile(BytesIO(b''.join(chunks))).read('photo.jpg'), content)
+    
+    def test_missing_files_are_skipped(self):
+        missing = self.create_document(b'gone', name='gone.txt')
+        self.create_document(b'here', name='here.txt')
+        missing.file.storage.delete(missing.file.name)
+        with self.assertLogs('documents.export', 'WARNING'):
+            archive = zipfile.ZipFile(BytesIO(b''.join(zip_stream(iter_documents(Document.objects.unscoped())))))
+        self.assertEqual(archive.namelist(), ['here.txt'])
+    
+    def test_export_command(self):
+        jane = Client.objects.create(tenant=self.tenant, first_name='Jane', last_name='Doe', email='jane@example.com')
+        self.create_document(b'john', name='a.txt')
+        Document.objects.create(tenant=self.tenant, client=jane, title='Jane', file=SimpleUploadedFile('../a.txt', b'jane'))
+        output = os.path.join(MEDIA_ROOT, 'export.zip')
+        call_command('export_documents', 'acme', output=output, stderr=StringIO())
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(archive.read(f'John Smith ({self.client_obj.pk})/a.txt'), b'john')
+            self.assertEqual(archive.read(f'Jane Doe ({jane.pk})/a.txt'), b'jane')
@@ -0,0 +1,249 @@
+"""
+Chunked, resumable document uploads.
+
+An upload is started with the file's name, size and client, which fixes the
+storage name the finished document will have. The client then appends
+chunks in order, each at the offset the server last reported and with a
+``Content-Digest: sha-256=:<base64>:`` header (RFC 9530); a chunk whose
+digest does not match is rejected and can simply be sent again. After an
+interruption the client asks for the upload's offset and carries on from
+there. Committing creates the ``Document`` row; until then nothing links to
+the partial file.
+
+Chunks are written straight to the final storage name, with no temporary
+file and no copy afterwards. On ``FileSystemStorage`` each chunk is written
+into the file at its offset; on django-storages' ``S3Storage`` each chunk is
+one part of an S3 multipart upload, completed with the last chunk. Hashes
+cannot be carried from one request to the next, so the document's SHA-256
+is computed by reading the finished file once on commit. No chunk can be
+appended to a complete upload, so the file is read before the upload's row
+is locked; the lock is only held while the document is created.
+
+With ``DOCUMENT_CONTENT_ADDRESSED`` on, the final name depends on that hash,
+so chunks go to a staging name under ``uploads/`` instead. On commit the
+file is moved (renamed, or copied within S3) to a new blob, or deleted when
+the tenant already stores the same content.
+"""
+import base64
+import hashlib
+import mimetypes
+import os
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from .models import Document, DocumentBlob, DocumentUpload, file_metadata
+
+
+class UploadError(Exception):
+    """The request cannot be applied to the upload; ``status`` is the HTTP status to answer with"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_content_digest(header):
+    """The SHA-256 digest in a ``Content-Digest`` header, or ``None``"""
+    for member in header.split(','):
+        algorithm, _, value = member.strip().partition('=')
+        if algorithm.strip().lower() == 'sha-256' and value.startswith(':') and value.endswith(':'):
+            try:
+                return base64.b64decode(value[1:-1], validate=True)
+            except ValueError:
+                return None
+    return None
+
+
+class FileSystemChunkStore:
+    """Write chunks into the destination file at their offset"""
+    
+    def __init__(self, storage):
+        self.storage = storage
+    
+    def start(self, upload):
+        path = self.storage.path(upload.file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Creating the file claims the name; another upload picking the same
+        # available name in the meantime gets the next one.
+        while True:
+            try:
+                open(path, 'xb').close()
+                return
+            except FileExistsError:
+                upload.file_name = self.storage.get_available_name(upload.file_name)
+                path = self.storage.path(upload.file_name)
+    
+    def append(self, upload, data):
+        with open(self.storage.path(upload.file_name), 'r+b') as f:
+            f.seek(upload.received)
+            f.write(data)
+            # Drop whatever an interrupted attempt left past this chunk
+            f.truncate()
+    
+    def finish(self, upload):
+        pass
+    
+    def move(self, source, name):
+        """Move the file ``source`` to ``name`` or, if that is taken, a free variant of it"""
+        name = self.storage.get_available_name(name)
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.storage.path(source), path)
+        return name
+    
+    def abort(self, upload):
+        self.storage.delete(upload.file_name)
+
+
+class S3ChunkStore:
+    """Send each chunk as one part of an S3 multipart upload"""
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.client = storage.connection.meta.client
+    
+    def key(self, upload):
+        return self.name_key(upload.file_name)
+    
+    def name_key(self, name):
+        from storages.utils import clean_name
+        return self.storage._normalize_name(clean_name(name))
+    
+    def start(self, upload):
+        response = self.client.create_multipart_upload(
+            Bucket=self.storage.bucket_name, Key=self.key(upload),
+            **self.storage.get_object_parameters(upload.file_name),
+        )
+        upload.multipart_id = response['UploadId']
+    
+    def append(self, upload, data):
+        response = self.client.upload_part(
+            Bucket=self.storage.bucket_name, Key=self.key(upload), UploadId=upload.multipart_id,
+            PartNumber=len(upload.parts) + 1, Body=data,
+        )
+        upload.parts.append(response['ETag'])
+    
+    def finish(self, upload):
+        self.client.complete_multipart_upload(
+            Bucket=self.storage.bucket_name, Key=self.key(upload), UploadId=upload.multipart_id,
+            MultipartUpload={'Parts': [
+                {'ETag': etag, 'PartNumber': number} for number, etag in enumerate(upload.parts, start=1)
+            ]},
+        )
+    
+    def move(self, source, name):
+        name = self.storage.get_available_name(name)
+        # A server-side copy; the data does not pass through the worker
+        self.client.copy(
+            {'Bucket': self.storage.bucket_name, 'Key': self.name_key(source)},
+            self.storage.bucket_name, self.name_key(name),
+            ExtraArgs=self.storage.get_object_parameters(name),
+        )
+        self.storage.delete(source)
+        return name
+    
+    def abort(self, upload):
+        self.client.abort_multipart_upload(
+            Bucket=self.storage.bucket_name, Key=self.key(upload), UploadId=upload.multipart_id,
+        )
+
+
+def chunk_store(storage=None):
+    storage = storage or Document._meta.get_field('file').storage
+    if isinstance(storage, FileSystemStorage):
+        return FileSystemChunkStore(storage)
+    try:
+        from storages.backends.s3 import S3Storage
+    except ImportError:
+        S3Storage = None
+    if S3Storage is not None and isinstance(storage, S3Storage):
+        return S3ChunkStore(storage)
+    raise ImproperlyConfigured(f'Chunked uploads are not supported for {storage.__class__.__name__}')
+
+
+def start_upload(tenant, user, client, filename, size, sha256=''):
+    """Claim the document's storage name and return the new ``DocumentUpload``"""
+    field = Document._meta.get_field('file')
+    upload = DocumentUpload(
+        tenant=tenant, client=client, created_by=user, filename=filename, size=size, sha256=sha256,
+        chunk_size=settings.DOCUMENT_UPLOAD_CHUNK_SIZE,
+    )
+    if settings.DOCUMENT_CONTENT_ADDRESSED:
+        upload.file_name = f'uploads/{tenant.slug}/{upload.pk}'
+    else:
+        name = field.generate_filename(Document(tenant=tenant, client=client), filename)
+        upload.file_name = field.storage.get_available_name(name, max_length=field.max_length)
+    chunk_store(field.storage).start(upload)
+    upload.save()
+    return upload
+
+
+def append_chunk(upload, offset, data, digest):
+    """Write ``data`` at ``offset`` after checking it against the SHA-256 ``digest``"""
+    if offset != upload.received:
+        raise UploadError(f'Expected the chunk at offset {upload.received}', status=409)
+    if not data or len(data) > upload.chunk_size or offset + len(data) > upload.size:
+        raise UploadError(f'Chunks must be 1 to {upload.chunk_size} bytes and end within the file', status=413)
+    if len(data) < upload.chunk_size and offset + len(data) != upload.size:
+        # S3 only accepts a short part at the end
+        raise UploadError(f'Only the last chunk may be shorter than {upload.chunk_size} bytes')
+    if digest is None or hashlib.sha256(data).digest() != digest:
+        raise UploadError('The chunk does not match its Content-Digest')
+    
+    store = chunk_store()
+    store.append(upload, data)
+    upload.received += len(data)
+    if upload.complete:
+        store.finish(upload)
+    upload.save(update_fields=['received', 'parts', 'updated_at'])
+
+
+def upload_metadata(upload):
+    """``(size, sha256, mime_type)`` of a complete upload's file"""
+    with Document._meta.get_field('file').storage.open(upload.file_name, 'rb') as f:
+        size, sha256, mime_type = file_metadata(f)
+    # Staging names have no extension
+    return size, sha256, mimetypes.guess_type(upload.filename)[0] or mime_type
+
+
+def commit_upload(upload, title, document_type='other', description='', metadata=None):
+    """Create the ``Document`` of a complete upload; ``metadata`` is its
+    ``upload_metadata()``, if that has been read already"""
+    if not upload.complete:
+        raise UploadError(f'Only {upload.received} of {upload.size} bytes have been received', status=409)
+    store = chunk_store()
+    
+    document = Document(
+        tenant=upload.tenant, client=upload.client, title=title, document_type=document_type,
+        description=description, uploaded_by=upload.created_by, original_filename=upload.filename,
+    )
+    document.file.name = upload.file_name
+    document.size, document.sha256, document.mime_type = metadata or upload_metadata(upload)
+    if upload.sha256 and document.sha256 != upload.sha256:
+        document.file.delete(save=False)
+        upload.delete()
+        raise UploadError('The uploaded file does not match its SHA-256 checksum; upload it again')
+    
+    if settings.DOCUMENT_CONTENT_ADDRESSED:
+        document.blob, created = DocumentBlob.objects.acquire(
+            upload.tenant, document.sha256, document.size, lambda name: store.move(upload.file_name, name),
+        )
+        if not created:
+            # The tenant already stores this content
+            document.file.storage.delete(upload.file_name)
+        document.file.name = document.blob.name
+    
+    document.save()
+    upload.delete()
+    return document
+
+
+def abort_upload(upload):
+    """Discard an uncommitted upload and whatever has been written so far"""
+    store = chunk_store()
+    if upload.complete:
+        # Finished with its last chunk
+        store.storage.delete(upload.file_name)
+    else:
+        store.abort(upload)
+    upload.delete()
@@ -6,8 +6,13 @@ app_name = 'documents'
 urlpatterns = [
     path('', views.document_list, name='document_list'),
     path('create/', views.document_create, name='document_create'),
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:pk>/', views.upload_detail, name='upload_detail'),
+    path('uploads/<uuid:pk>/append/', views.upload_append, name='upload_append'),
+    path('uploads/<uuid:pk>/commit/', views.upload_commit, name='upload_commit'),
     path('<int:pk>/', views.document_detail, name='document_detail'),
     path('<int:pk>/edit/', views.document_update, name='document_update'),
     path('<int:pk>/delete/', views.document_delete, name='document_delete'),
     path('<int:pk>/download/', views.document_download, name='document_download'),
+    path('<int:pk>/preview/', views.document_preview, name='document_preview'),
 ] 
\ No newline at end of file
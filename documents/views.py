@@ -1,68 +1,57 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse, Http404
-from django.conf import settings
-import os
-from .models import Document
-from .forms import DocumentForm, DocumentSearchForm
-from clients.models import Client
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from accounts.tenancy import tenant_required
+from clientportal.instrumentation import query_budget
+from clientportal.pagination import CursorPaginator
+from clientportal.search import RANKED_ORDERING, is_ranked
+from clientportal.stats import get_dashboard_stats
+from .models import Document, DocumentUpload
+from .forms import DocumentCommitForm, DocumentForm, DocumentSearchForm, DocumentUploadForm
+from .previews import serve_preview
+from .serving import serve_document
+from .uploads import (
+    UploadError, abort_upload, append_chunk, commit_upload, parse_content_digest, start_upload, upload_metadata,
+)
 
 
-@login_required
+@query_budget(12)
+@tenant_required
 def document_list(request):
     """List all documents for the current tenant with search and filtering"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    documents = Document.objects.filter(tenant=tenant)
+    tenant = request.tenant
+    documents = Document.objects.all()
     
     # Handle search and filtering
-    search_form = DocumentSearchForm(request.GET)
-    if search_form.is_valid():
-        search = search_form.cleaned_data.get('search')
-        document_type = search_form.cleaned_data.get('document_type')
-        client = search_form.cleaned_data.get('client')
-        
-        if search:
-            documents = documents.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(client__first_name__icontains=search) |
-                Q(client__last_name__icontains=search)
-            )
-        
-        if document_type:
-            documents = documents.filter(document_type=document_type)
-        
-        if client:
-            documents = documents.filter(client=client)
-    
-    # Pagination
-    paginator = Paginator(documents, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    search_form = DocumentSearchForm(request.GET, tenant=tenant)
+    documents = search_form.filter_queryset(documents, tenant)
+    filtered = search_form.is_valid() and any(search_form.cleaned_data.values())
+    ordering = RANKED_ORDERING if is_ranked(documents) else ['-created_at', '-id']
+    
+    # Keyset pagination: no OFFSET scan and no COUNT(*) per page
+    paginator = CursorPaginator(documents, ordering, 20)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    
+    # Unfiltered totals come from the cached tenant statistics
+    stats = {} if filtered else get_dashboard_stats(tenant)
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
-        'total_documents': documents.count(),
+        'total_documents': stats.get('total_documents'),
     }
     
     return render(request, 'documents/document_list.html', context)
 
 
-@login_required
+@query_budget(8)
+@tenant_required
 def document_detail(request, pk):
     """Show detailed view of a document"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    document = get_object_or_404(Document, pk=pk, tenant=tenant)
+    document = get_object_or_404(Document, pk=pk)
     
     context = {
         'document': document,
@@ -71,46 +60,40 @@ def document_detail(request, pk):
     return render(request, 'documents/document_detail.html', context)
 
 
-@login_required
+@tenant_required
 def document_create(request):
     """Create a new document"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
     if request.method == 'POST':
-        form = DocumentForm(request.POST, request.FILES, user=request.user)
+        form = DocumentForm(request.POST, request.FILES, user=request.user, tenant=request.tenant)
         if form.is_valid():
             document = form.save()
             messages.success(request, f'Document "{document.title}" uploaded successfully.')
             return redirect('documents:document_detail', pk=document.pk)
     else:
-        form = DocumentForm(user=request.user)
+        form = DocumentForm(user=request.user, tenant=request.tenant)
     
     context = {
         'form': form,
         'title': 'Upload New Document',
+        'chunked_upload': True,
     }
     
     return render(request, 'documents/document_form.html', context)
 
 
-@login_required
+@tenant_required
 def document_update(request, pk):
     """Update an existing document"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    document = get_object_or_404(Document, pk=pk, tenant=tenant)
+    document = get_object_or_404(Document, pk=pk)
     
     if request.method == 'POST':
-        form = DocumentForm(request.POST, request.FILES, instance=document, user=request.user)
+        form = DocumentForm(request.POST, request.FILES, instance=document, user=request.user, tenant=request.tenant)
         if form.is_valid():
             document = form.save()
             messages.success(request, f'Document "{document.title}" updated successfully.')
             return redirect('documents:document_detail', pk=document.pk)
     else:
-        form = DocumentForm(instance=document, user=request.user)
+        form = DocumentForm(instance=document, user=request.user, tenant=request.tenant)
     
     context = {
         'form': form,
@@ -121,14 +104,10 @@ def document_update(request, pk):
     return render(request, 'documents/document_form.html', context)
 
 
-@login_required
+@tenant_required
 def document_delete(request, pk):
     """Delete a document"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    document = get_object_or_404(Document, pk=pk, tenant=tenant)
+    document = get_object_or_404(Document, pk=pk)
     
     if request.method == 'POST':
         document_title = document.title
@@ -143,21 +122,111 @@ def document_delete(request, pk):
     return render(request, 'documents/document_confirm_delete.html', context)
 
 
-@login_required
+@tenant_required
 def document_download(request, pk):
     """Download a document file"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    document = get_object_or_404(Document, pk=pk, tenant=tenant)
-    
-    # Check if file exists
-    if not document.file or not os.path.exists(document.file.path):
-        raise Http404("File not found")
+    document = get_object_or_404(Document, pk=pk)
     
-    # Open and serve the file
-    with open(document.file.path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{document.filename}"'
-        return response
+    # Stream from storage (or hand off to the front-end server) in chunks
+    return serve_document(request, document)
+
+
+@query_budget(8)
+@require_GET
+@tenant_required
+def document_preview(request, pk):
+    """Serve the document's thumbnail or first-page preview"""
+    document = get_object_or_404(Document, pk=pk)
+    return serve_preview(request, document)
+
+
+def _upload_json(upload):
+    return {
+        'id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'chunk_size': upload.chunk_size,
+        'append_url': reverse('documents:upload_append', args=[upload.pk]),
+        'commit_url': reverse('documents:upload_commit', args=[upload.pk]),
+        'url': reverse('documents:upload_detail', args=[upload.pk]),
+    }
+
+
+@query_budget(8)
+@require_POST
+@tenant_required(json=True)
+def upload_start(request):
+    """Start a chunked upload of a file for one of the tenant's clients"""
+    form = DocumentUploadForm(request.POST, tenant=request.tenant)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    upload = start_upload(request.tenant, request.user, **form.cleaned_data)
+    return JsonResponse(_upload_json(upload), status=201)
+
+
+@query_budget(6)
+@require_http_methods(['GET', 'DELETE'])
+@tenant_required(json=True)
+def upload_detail(request, pk):
+    """Report how much of an upload has arrived, or abandon it"""
+    upload = get_object_or_404(DocumentUpload, pk=pk)
+    
+    if request.method == 'DELETE':
+        abort_upload(upload)
+        return HttpResponse(status=204)
+    
+    return JsonResponse(_upload_json(upload))
+
+
+@query_budget(8)
+@require_POST
+@tenant_required(json=True)
+def upload_append(request, pk):
+    """Append the request body at the ``Upload-Offset`` header's offset"""
+    upload = get_object_or_404(DocumentUpload, pk=pk)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Send the chunk with Upload-Offset and Content-Length headers'}, status=400)
+    if length > upload.chunk_size:
+        return JsonResponse({'error': f'Chunks may be at most {upload.chunk_size} bytes', 'offset': upload.received}, status=413)
+    
+    # Read the body before taking the lock; the client may be slow to send it
+    data = request.read(length)
+    with transaction.atomic():
+        upload = get_object_or_404(DocumentUpload.objects.select_for_update(of=('self',)), pk=pk)
+        try:
+            append_chunk(upload, offset, data, parse_content_digest(request.headers.get('Content-Digest', '')))
+        except UploadError as exc:
+            return JsonResponse({'error': str(exc), 'offset': upload.received}, status=exc.status)
+    
+    return JsonResponse(_upload_json(upload))
+
+
+@query_budget(22)
+@require_POST
+@tenant_required(json=True)
+def upload_commit(request, pk):
+    """Turn a finished upload into a document"""
+    form = DocumentCommitForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    # Hash the file before taking the lock; a complete upload cannot change
+    upload = get_object_or_404(DocumentUpload, pk=pk)
+    metadata = upload_metadata(upload) if upload.complete else None
+    with transaction.atomic():
+        upload = get_object_or_404(DocumentUpload.objects.select_for_update(of=('self',)), pk=pk)
+        try:
+            document = commit_upload(upload, metadata=metadata, **form.cleaned_data)
+        except UploadError as exc:
+            return JsonResponse({'error': str(exc), 'offset': upload.received}, status=exc.status)
+    
+    messages.success(request, f'Document "{document.title}" uploaded successfully.')
+    return JsonResponse({
+        'id': document.pk,
+        'url': reverse('documents:document_detail', args=[document.pk]),
+    }, status=201)
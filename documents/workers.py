@@ -0,0 +1,86 @@
+"""
+The process pool that works on uploaded files.
+
+Rendering previews and extracting text are CPU-bound, so they run in a pool
+of ``DOCUMENT_WORKERS`` processes rather than in web worker threads. With no
+workers configured, ``submit()`` runs the function in the calling thread.
+
+A worker that dies, say in a native library crashing on a malformed file,
+breaks the whole ``ProcessPoolExecutor``, which then refuses new work with
+``BrokenProcessPool``. ``submit()`` replaces the pool and tries once more, and
+never raises itself: failures to queue the work are set on the returned Future
+like any other error.
+
+Functions sent to the pool take file paths and must not touch the database.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None and settings.DOCUMENT_WORKERS:
+            # Forking a threaded web worker can deadlock the child; spawned
+            # processes only import the function's module
+            _executor = ProcessPoolExecutor(
+                settings.DOCUMENT_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _replace(broken):
+    """Drop the broken pool, unless another thread already has, and return a fresh one"""
+    global _executor
+    with _lock:
+        if _executor is broken:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+    return get_executor()
+
+
+def submit(function, *args):
+    """Run ``function(*args)`` in the pool and return its Future"""
+    future = Future()
+    executor = get_executor()
+    try:
+        if executor is not None:
+            try:
+                return executor.submit(function, *args)
+            except BrokenProcessPool:
+                return _replace(executor).submit(function, *args)
+        future.set_result(function(*args))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def local_source(document):
+    """``(path, cleanup)`` for a local copy of the document's file; delete ``cleanup`` when done"""
+    try:
+        return document.file.path, None
+    except NotImplementedError:
+        # Remote storage: the pool needs a file it can open
+        extension = os.path.splitext(document.filename)[1]
+        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as copy:
+            with document.file.open('rb') as f:
+                shutil.copyfileobj(f, copy)
+        return copy.name, copy.name
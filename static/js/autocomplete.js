@@ -0,0 +1,102 @@
+/*
+ * Remote autocomplete for <select data-autocomplete-url="..."> elements.
+ *
+ * The server only renders the selected option. A search box is added above
+ * each select; typing fetches one page of matches from the endpoint and a
+ * "More results" option fetches the next page.
+ */
+(function () {
+    'use strict';
+
+    var DELAY = 250;
+
+    function option(value, text) {
+        var element = document.createElement('option');
+        element.value = value;
+        element.textContent = text;
+        return element;
+    }
+
+    function setup(select) {
+        var url = select.dataset.autocompleteUrl;
+        var input = document.createElement('input');
+        var timer = null;
+        var request = 0;
+        var more = null;
+        var selected = select.value;
+
+        input.type = 'search';
+        input.className = 'form-control form-control-sm mb-1';
+        input.placeholder = 'Type to search...';
+        input.setAttribute('aria-label', 'Search options');
+        select.parentNode.insertBefore(input, select);
+
+        function load(cursor) {
+            var params = new URLSearchParams({q: input.value.trim()});
+            var current = ++request;
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            fetch(url + '?' + params.toString(), {
+                credentials: 'same-origin',
+                headers: {'Accept': 'application/json'}
+            })
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (current !== request) {
+                        return;
+                    }
+                    render(data, Boolean(cursor));
+                });
+        }
+
+        function render(data, append) {
+            var value = select.value;
+            if (more) {
+                more.remove();
+                more = null;
+            }
+            if (!append) {
+                Array.prototype.slice.call(select.options).forEach(function (element) {
+                    if (element.value !== '' && element.value !== value) {
+                        element.remove();
+                    }
+                });
+            }
+            data.results.forEach(function (result) {
+                if (String(result.id) !== value) {
+                    select.appendChild(option(result.id, result.text));
+                }
+            });
+            if (data.next) {
+                more = option('', 'More results...');
+                more.dataset.cursor = data.next;
+                select.appendChild(more);
+            }
+            select.value = value;
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(null); }, DELAY);
+        });
+        select.addEventListener('focus', function () {
+            if (select.options.length <= 2 && !more) {
+                load(null);
+            }
+        }, {once: true});
+        select.addEventListener('change', function () {
+            var chosen = select.options[select.selectedIndex];
+            if (chosen && chosen === more) {
+                select.value = selected;
+                load(more.dataset.cursor);
+            } else {
+                selected = select.value;
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(setup);
+    });
+})();
@@ -0,0 +1,182 @@
+/*
+ * Resumable chunked upload for <form data-chunked-upload="<start url>">.
+ *
+ * When a file is chosen, submitting the form starts an upload, sends the
+ * file in chunks with a SHA-256 Content-Digest each, and commits it with the
+ * rest of the form. The upload id is kept in localStorage, so submitting the
+ * same file again after a dropped connection or a closed tab carries on
+ * from the offset the server reports. Browsers without WebCrypto (plain HTTP
+ * other than localhost) post the form as usual.
+ */
+(function () {
+    'use strict';
+
+    var MAX_RETRIES = 5;
+
+    function storageKey(form, file) {
+        return ['upload', form.elements.client.value, file.name, file.size, file.lastModified].join(':');
+    }
+
+    function toBase64(buffer) {
+        var bytes = new Uint8Array(buffer);
+        var binary = '';
+        for (var i = 0; i < bytes.length; i++) {
+            binary += String.fromCharCode(bytes[i]);
+        }
+        return btoa(binary);
+    }
+
+    function request(url, options, csrfToken) {
+        options.credentials = 'same-origin';
+        options.headers = Object.assign({'Accept': 'application/json', 'X-CSRFToken': csrfToken}, options.headers);
+        return fetch(url, options).then(function (response) {
+            return response.json().catch(function () {
+                return {};
+            }).then(function (data) {
+                data.status = response.status;
+                return data;
+            });
+        });
+    }
+
+    function describe(data) {
+        if (data.errors) {
+            return Object.keys(data.errors).map(function (field) {
+                return data.errors[field].join(' ');
+            }).join(' ');
+        }
+        return data.error || 'The upload failed.';
+    }
+
+    function setup(form) {
+        var startUrl = form.dataset.chunkedUpload;
+        var csrfToken = form.elements.csrfmiddlewaretoken.value;
+        var progress = form.querySelector('[data-upload-progress]');
+        var bar = progress.querySelector('.progress-bar');
+        var error = form.querySelector('[data-upload-error]');
+        var submit = form.querySelector('[type="submit"]');
+
+        function showProgress(offset, size) {
+            progress.hidden = false;
+            bar.style.width = (size ? Math.round(offset * 100 / size) : 100) + '%';
+        }
+
+        function fail(message) {
+            error.textContent = message;
+            error.hidden = false;
+            submit.disabled = false;
+        }
+
+        function resume(key) {
+            var id = localStorage.getItem(key);
+            if (!id) {
+                return Promise.resolve(null);
+            }
+            return request(startUrl + id + '/', {method: 'GET'}, csrfToken).then(function (data) {
+                return data.status === 200 ? data : null;
+            });
+        }
+
+        function start(file) {
+            var body = new FormData();
+            body.append('client', form.elements.client.value);
+            body.append('filename', file.name);
+            body.append('size', file.size);
+            return request(startUrl, {method: 'POST', body: body}, csrfToken).then(function (data) {
+                if (data.status !== 201) {
+                    throw new Error(describe(data));
+                }
+                return data;
+            });
+        }
+
+        function send(file, upload, offset, retries) {
+            showProgress(offset, upload.size);
+            if (offset >= upload.size) {
+                return Promise.resolve();
+            }
+            var chunk = file.slice(offset, offset + upload.chunk_size);
+            return chunk.arrayBuffer().then(function (buffer) {
+                return crypto.subtle.digest('SHA-256', buffer).then(function (digest) {
+                    return request(upload.append_url, {
+                        method: 'POST',
+                        body: buffer,
+                        headers: {
+                            'Content-Type': 'application/octet-stream',
+                            'Content-Digest': 'sha-256=:' + toBase64(digest) + ':',
+                            'Upload-Offset': String(offset)
+                        }
+                    }, csrfToken);
+                });
+            }).then(function (data) {
+                if (data.status === 200) {
+                    return send(file, upload, data.offset, 0);
+                }
+                if (data.status === 409 && data.offset !== undefined) {
+                    // Another attempt already stored this chunk; go on from the server's offset
+                    return send(file, upload, data.offset, retries);
+                }
+                throw new Error(describe(data));
+            }, function (networkError) {
+                if (retries >= MAX_RETRIES) {
+                    throw networkError;
+                }
+                return new Promise(function (resolve) {
+                    setTimeout(resolve, 1000 * Math.pow(2, retries));
+                }).then(function () {
+                    return request(upload.url, {method: 'GET'}, csrfToken);
+                }).then(function (data) {
+                    return send(file, upload, data.offset, retries + 1);
+                }, function () {
+                    return send(file, upload, offset, retries + 1);
+                });
+            });
+        }
+
+        function commit(upload) {
+            var body = new FormData();
+            ['title', 'document_type', 'description'].forEach(function (name) {
+                body.append(name, form.elements[name].value);
+            });
+            return request(upload.commit_url, {method: 'POST', body: body}, csrfToken).then(function (data) {
+                if (data.status !== 201) {
+                    throw new Error(describe(data));
+                }
+                return data;
+            });
+        }
+
+        form.addEventListener('submit', function (event) {
+            var file = form.elements.file.files[0];
+            if (!file || !window.crypto || !crypto.subtle) {
+                return;
+            }
+            event.preventDefault();
+            error.hidden = true;
+            submit.disabled = true;
+
+            var key = storageKey(form, file);
+            resume(key)
+                .then(function (upload) {
+                    return upload || start(file);
+                })
+                .then(function (upload) {
+                    localStorage.setItem(key, upload.id);
+                    return send(file, upload, upload.offset, 0).then(function () {
+                        return commit(upload);
+                    });
+                })
+                .then(function (created) {
+                    localStorage.removeItem(key);
+                    window.location = created.url;
+                })
+                .catch(function (exception) {
+                    fail(exception.message);
+                });
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('form[data-chunked-upload]').forEach(setup);
+    });
+})();
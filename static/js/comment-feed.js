@@ -0,0 +1,106 @@
+/*
+ * Incremental comment thread for <div id="comments" data-feed-url="...">.
+ *
+ * The page renders the first comments. The rest of a long thread is fetched
+ * page by page from the JSON feed, after which the feed is polled for new
+ * comments. Polls send the last ETag, so until the thread changes they get
+ * an empty 304 that costs the server a single aggregate query. A
+ * "comments:refresh" event on the container (sent by live-updates.js when a
+ * comment is pushed) fetches new comments without waiting for the next poll.
+ */
+(function () {
+    'use strict';
+
+    var POLL_INTERVAL = 15000;
+
+    function render(comment) {
+        var element = document.createElement('div');
+        var author = document.createElement('strong');
+        var time = document.createElement('small');
+        var content = document.createElement('div');
+
+        element.className = 'border-bottom py-2';
+        author.textContent = comment.author;
+        time.className = 'text-muted';
+        time.textContent = ' ' + new Date(comment.created_at).toLocaleString();
+        content.style.whiteSpace = 'pre-line';
+        content.textContent = comment.content;
+        element.append(author, time, content);
+        return element;
+    }
+
+    function setup(container) {
+        var url = container.dataset.feedUrl;
+        var lastId = container.dataset.lastId || '0';
+        var etag = null;
+        var timer = null;
+
+        function schedule(delay) {
+            clearTimeout(timer);
+            timer = setTimeout(load, delay);
+        }
+
+        function load() {
+            var headers = {'Accept': 'application/json'};
+            if (etag) {
+                headers['If-None-Match'] = etag;
+            }
+            fetch(url + '?after=' + encodeURIComponent(lastId), {
+                credentials: 'same-origin',
+                cache: 'no-store',
+                headers: headers
+            })
+                .then(function (response) {
+                    if (response.status === 304) {
+                        return null;
+                    }
+                    if (!response.ok) {
+                        throw new Error(response.statusText);
+                    }
+                    etag = response.headers.get('ETag');
+                    return response.json();
+                })
+                .then(function (data) {
+                    if (data) {
+                        var empty = container.querySelector('[data-empty]');
+                        if (empty && data.comments.length) {
+                            empty.remove();
+                        }
+                        data.comments.forEach(function (comment) {
+                            container.appendChild(render(comment));
+                        });
+                        lastId = String(data.last_id);
+                        if (data.has_more) {
+                            // Not caught up yet: the ETag only describes a complete thread
+                            etag = null;
+                            schedule(0);
+                            return;
+                        }
+                    }
+                    schedule(POLL_INTERVAL);
+                })
+                .catch(function () {
+                    schedule(POLL_INTERVAL);
+                });
+        }
+
+        container.addEventListener('comments:refresh', function () {
+            schedule(0);
+        });
+        document.addEventListener('visibilitychange', function () {
+            if (document.hidden) {
+                clearTimeout(timer);
+            } else {
+                schedule(0);
+            }
+        });
+        schedule(container.dataset.more === 'true' ? 0 : POLL_INTERVAL);
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var container = document.getElementById('comments');
+        if (container) {
+            setup(container);
+        }
+    });
+})();
@@ -0,0 +1,77 @@
+/*
+ * Live task and comment updates from the tenant's Server-Sent Events stream.
+ *
+ * Load with <script src="live-updates.js" data-events-url="...">. Status
+ * changes are written into [data-task-status] inside [data-task-id="<id>"];
+ * changes the page cannot apply itself reveal the [data-live-notice] reload
+ * prompt. New comments on the task shown in #comments make the comment feed
+ * fetch them straight away instead of at its next poll. When the server
+ * does not stream (a 204 under WSGI), EventSource gives up and the page
+ * keeps polling.
+ */
+(function () {
+    'use strict';
+
+    var script = document.currentScript;
+
+    function rows(id) {
+        return document.querySelectorAll('[data-task-id="' + id + '"]');
+    }
+
+    function showNotice() {
+        var notice = document.querySelector('[data-live-notice]');
+        if (notice) {
+            notice.hidden = false;
+        }
+    }
+
+    function onTaskUpdated(task) {
+        rows(task.id).forEach(function (row) {
+            row.querySelectorAll('[data-task-status]').forEach(function (element) {
+                element.textContent = task.status_display;
+            });
+        });
+    }
+
+    function onTaskDeleted(task) {
+        if (rows(task.id).length) {
+            showNotice();
+        }
+    }
+
+    function onTasksBulk(change) {
+        if (change.ids.some(function (id) { return rows(id).length; })) {
+            showNotice();
+        }
+    }
+
+    function onCommentCreated(comment) {
+        var container = document.getElementById('comments');
+        var row = container && container.closest('[data-task-id]');
+        if (row && row.dataset.taskId === String(comment.task)) {
+            container.dispatchEvent(new CustomEvent('comments:refresh'));
+        }
+    }
+
+    var handlers = {
+        'task.updated': onTaskUpdated,
+        'task.deleted': onTaskDeleted,
+        'tasks.bulk': onTasksBulk,
+        'comment.created': onCommentCreated
+    };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        if (!window.EventSource || !script.dataset.eventsUrl) {
+            return;
+        }
+        var source = new EventSource(script.dataset.eventsUrl);
+        Object.keys(handlers).forEach(function (name) {
+            source.addEventListener(name, function (event) {
+                handlers[name](JSON.parse(event.data));
+            });
+        });
+        window.addEventListener('pagehide', function () {
+            source.close();
+        });
+    });
+})();
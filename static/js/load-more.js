@@ -0,0 +1,40 @@
+/*
+ * "Load more" rows for paginated tables.
+ *
+ * A <tr data-load-more> row holds a button whose data-url returns the next
+ * rows as HTML. Clicking it replaces the row with the fetched rows, which
+ * end with a new "load more" row while there are more to show.
+ */
+(function () {
+    'use strict';
+
+    function loadMore(button) {
+        var row = button.closest('tr[data-load-more]');
+        button.disabled = true;
+        fetch(button.dataset.url, {
+            credentials: 'same-origin',
+            headers: {'Accept': 'text/html'}
+        })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(function (html) {
+                var template = document.createElement('template');
+                template.innerHTML = html;
+                row.replaceWith(template.content);
+            })
+            .catch(function () {
+                button.disabled = false;
+            });
+    }
+
+    document.addEventListener('click', function (event) {
+        var button = event.target.closest('tr[data-load-more] button[data-url]');
+        if (button) {
+            loadMore(button);
+        }
+    });
+})();
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from accounts.admin import TenantScopedAdminMixin
+from .bulk import apply_task_action
 from .models import Task, TaskComment
 
 
@@ -9,12 +11,13 @@ class TaskCommentInline(admin.TabularInline):
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'client', 'status', 'priority', 'assigned_to', 'due_date', 'is_overdue', 'tenant']
     list_filter = ['status', 'priority', 'tenant', 'created_at', 'due_date']
     search_fields = ['title', 'description', 'client__first_name', 'client__last_name', 'client__email']
     readonly_fields = ['created_at', 'updated_at', 'created_by', 'completed_at']
     inlines = [TaskCommentInline]
+    actions = ['mark_completed', 'assign_to_me', 'unassign']
     fieldsets = (
         ('Task Information', {
             'fields': ('tenant', 'client', 'title', 'description', 'status', 'priority')
@@ -33,14 +36,38 @@ class TaskAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
     
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        # Filter by tenant for non-superusers
-        if hasattr(request.user, 'profile'):
-            return qs.filter(tenant=request.user.profile.tenant)
-        return qs.none()
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for value, label in Task.TASK_PRIORITY:
+            name = f'set_priority_{value}'
+            actions[name] = (self.priority_action(value), name, f'Set priority to {label.lower()}')
+        return actions
+    
+    # Bulk actions issue one UPDATE/DELETE per batch instead of saving each task
+    def delete_queryset(self, request, queryset):
+        apply_task_action(queryset, 'delete')
+    
+    @admin.action(description='Mark selected tasks completed')
+    def mark_completed(self, request, queryset):
+        count = apply_task_action(queryset, 'complete')
+        self.message_user(request, f'{count} tasks marked completed.')
+    
+    @admin.action(description='Assign selected tasks to me')
+    def assign_to_me(self, request, queryset):
+        count = apply_task_action(queryset, 'reassign', request.user)
+        self.message_user(request, f'{count} tasks assigned to you.')
+    
+    @admin.action(description='Unassign selected tasks')
+    def unassign(self, request, queryset):
+        count = apply_task_action(queryset, 'reassign', None)
+        self.message_user(request, f'{count} tasks unassigned.')
+    
+    @staticmethod
+    def priority_action(priority):
+        def action(modeladmin, request, queryset):
+            count = apply_task_action(queryset, 'reprioritize', priority)
+            modeladmin.message_user(request, f'{count} tasks set to {priority} priority.')
+        return action
 
 
 @admin.register(TaskComment)
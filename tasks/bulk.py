@@ -0,0 +1,125 @@
+"""
+Bulk task actions.
+
+``apply_task_action()`` completes, reassigns, reprioritizes or deletes every
+task in a queryset with one ``UPDATE`` or ``DELETE`` per batch of primary
+keys (and per tenant, for superusers acting on several). Updates send no
+signals, and the delete receivers of ``Task`` stand aside while a batch is
+deleted, so each batch counts its own changes to the tenant statistics and
+removes its tasks from the search index in one go. Cached dashboard numbers
+are invalidated once at the end, and live pages get one ``tasks.bulk`` event
+per batch.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from django.db import transaction
+from django.utils import timezone
+from accounts.rollups import bump_counts, created_metric, daily_counts, status_metric
+from clientportal import events, search
+from clientportal.stats import invalidate_dashboard_stats
+from .models import Task, TaskComment
+
+
+BATCH_SIZE = 500
+
+_deleting = ContextVar('deleting_in_bulk', default=False)
+
+ACTIONS = [
+    ('complete', 'Mark completed'),
+    ('reassign', 'Reassign'),
+    ('reprioritize', 'Change priority'),
+    ('delete', 'Delete'),
+]
+
+
+def _complete(tasks, value, now):
+    # Tasks that are already completed keep their completion time
+    return tasks.exclude(status='completed').update(status='completed', completed_at=now, updated_at=now)
+
+
+def _reassign(tasks, user, now):
+    return tasks.update(assigned_to=user, updated_at=now)
+
+
+def _reprioritize(tasks, priority, now):
+    return tasks.update(priority=priority, updated_at=now)
+
+
+def _delete(tasks, value, now):
+    TaskComment._base_manager.filter(task__in=tasks).delete()
+    token = _deleting.set(True)
+    try:
+        deleted, counts = tasks.delete()
+    finally:
+        _deleting.reset(token)
+    return counts.get(Task._meta.label, 0)
+
+
+def deleting_in_bulk():
+    """Whether tasks are being deleted by ``apply_task_action()``, which does the receivers' work per batch"""
+    return _deleting.get()
+
+
+HANDLERS = {
+    'complete': _complete,
+    'reassign': _reassign,
+    'reprioritize': _reprioritize,
+    'delete': _delete,
+}
+
+
+def _rollup_deltas(action, tasks):
+    """``{(day, metric): delta}`` that ``action`` is about to make to the rollups of ``tasks``"""
+    deltas = defaultdict(int)
+    if action == 'complete':
+        tasks = tasks.exclude(status='completed')
+    elif action != 'delete':
+        return deltas
+    # Lock the rows before counting them, as single saves do
+    list(tasks.select_for_update().values_list('pk'))
+    for row in daily_counts(tasks):
+        deltas[row['day'], status_metric('tasks', row['status'])] -= row['count']
+        if action == 'complete':
+            deltas[row['day'], status_metric('tasks', 'completed')] += row['count']
+        else:
+            deltas[row['day'], created_metric('tasks')] -= row['count']
+    return deltas
+
+
+def _batches(queryset, batch_size):
+    """Yield ``{tenant_id: [pk, ...]}`` for successive batches of ``queryset``"""
+    rows = queryset.order_by('pk').values_list('pk', 'tenant_id')
+    last_pk = 0
+    while batch := list(rows.filter(pk__gt=last_pk)[:batch_size]):
+        last_pk = batch[-1][0]
+        by_tenant = defaultdict(list)
+        for pk, tenant_id in batch:
+            by_tenant[tenant_id].append(pk)
+        yield by_tenant
+
+
+def apply_task_action(queryset, action, value=None, batch_size=BATCH_SIZE):
+    """Apply ``action`` to every task in ``queryset``; return how many tasks changed.
+    
+    ``value`` is the new assignee (or ``None`` to unassign) for ``reassign``
+    and the new priority for ``reprioritize``.
+    """
+    handler = HANDLERS[action]
+    now = timezone.now()
+    count = 0
+    tenant_ids = set()
+    for by_tenant in _batches(queryset, batch_size):
+        with transaction.atomic():
+            for tenant_id, pks in by_tenant.items():
+                tasks = Task._base_manager.filter(tenant_id=tenant_id, pk__in=pks)
+                deltas = _rollup_deltas(action, tasks)
+                count += handler(tasks, value, now)
+                bump_counts(tenant_id, deltas)
+                if action == 'delete':
+                    search.remove_pks(Task, pks)
+                events.publish(tenant_id, 'tasks.bulk', {'action': action, 'ids': pks})
+                tenant_ids.add(tenant_id)
+    
+    for tenant_id in tenant_ids:
+        invalidate_dashboard_stats(tenant_id)
+    return count
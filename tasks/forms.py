@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth.models import User
+from .bulk import ACTIONS
 from .models import Task, TaskComment
 from clients.models import Client
+from clientportal.autocomplete import AutocompleteSelect
+from clientportal.search import search
 
 
 class TaskForm(forms.ModelForm):
@@ -9,29 +12,29 @@ class TaskForm(forms.ModelForm):
         model = Task
         fields = ['client', 'title', 'description', 'status', 'priority', 'assigned_to', 'due_date']
         widgets = {
-            'client': forms.Select(attrs={'class': 'form-select'}),
+            'client': AutocompleteSelect('clients:client_autocomplete', attrs={'class': 'form-select'}),
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'status': forms.Select(attrs={'class': 'form-select'}),
             'priority': forms.Select(attrs={'class': 'form-select'}),
-            'assigned_to': forms.Select(attrs={'class': 'form-select'}),
+            'assigned_to': AutocompleteSelect('tasks:assignee_autocomplete', attrs={'class': 'form-select'}),
             'due_date': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
         }
     
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
+        self.tenant = kwargs.pop('tenant', None)
         super().__init__(*args, **kwargs)
         
         # Filter clients and users by tenant
-        if self.user and hasattr(self.user, 'profile'):
-            tenant = self.user.profile.tenant
-            self.fields['client'].queryset = Client.objects.filter(tenant=tenant)
-            self.fields['assigned_to'].queryset = User.objects.filter(profile__tenant=tenant)
+        if self.tenant:
+            self.fields['client'].queryset = Client.objects.for_tenant(self.tenant)
+            self.fields['assigned_to'].queryset = User.objects.filter(profile__tenant=self.tenant)
     
     def save(self, commit=True):
         task = super().save(commit=False)
-        if self.user and hasattr(self.user, 'profile'):
-            task.tenant = self.user.profile.tenant
+        if self.user and self.tenant:
+            task.tenant = self.tenant
             task.created_by = self.user
         if commit:
             task.save()
@@ -78,7 +81,95 @@ class TaskSearchForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     assigned_to = forms.ModelChoiceField(
-        queryset=User.objects.all(),
+        queryset=User.objects.none(),
         required=False,
+        widget=AutocompleteSelect('tasks:assignee_autocomplete', attrs={'class': 'form-select'})
+    )
+    
+    def __init__(self, *args, **kwargs):
+        self.tenant = kwargs.pop('tenant', None)
+        super().__init__(*args, **kwargs)
+        
+        # Only offer the tenant's own users
+        if self.tenant:
+            self.fields['assigned_to'].queryset = User.objects.filter(profile__tenant=self.tenant)
+    
+    def filter_queryset(self, queryset, tenant):
+        """Apply the submitted search and filters to a tenant's tasks"""
+        if not self.is_valid():
+            return queryset
+        
+        search_text = self.cleaned_data.get('search')
+        status = self.cleaned_data.get('status')
+        priority = self.cleaned_data.get('priority')
+        assigned_to = self.cleaned_data.get('assigned_to')
+        
+        if search_text:
+            queryset = search(queryset, search_text, tenant)
+        
+        if status:
+            queryset = queryset.filter(status=status)
+        
+        if priority:
+            queryset = queryset.filter(priority=priority)
+        
+        if assigned_to:
+            queryset = queryset.filter(assigned_to=assigned_to)
+        
+        return queryset
+
+
+class TaskBulkActionForm(forms.Form):
+    """An action for several tasks: the checked ``ids``, or all tasks matching the list filters"""
+    action = forms.ChoiceField(
+        choices=[('', 'Bulk action...')] + ACTIONS,
         widget=forms.Select(attrs={'class': 'form-select'})
-    ) 
\ No newline at end of file
+    )
+    ids = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    all_matching = forms.BooleanField(required=False, label='All matching tasks')
+    assign_to = forms.ModelChoiceField(
+        queryset=User.objects.none(),
+        required=False,
+        empty_label='Unassigned',
+        widget=AutocompleteSelect('tasks:assignee_autocomplete', attrs={'class': 'form-select'})
+    )
+    priority = forms.ChoiceField(
+        choices=[('', 'New priority...')] + Task.TASK_PRIORITY,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    def __init__(self, *args, **kwargs):
+        self.tenant = kwargs.pop('tenant', None)
+        super().__init__(*args, **kwargs)
+        
+        if self.tenant:
+            self.fields['assign_to'].queryset = User.objects.filter(profile__tenant=self.tenant)
+    
+    def clean_ids(self):
+        try:
+            return [int(pk) for pk in self.cleaned_data['ids'] or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Invalid task selection.')
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('ids') and not cleaned_data.get('all_matching'):
+            raise forms.ValidationError('Select at least one task.')
+        if cleaned_data.get('action') == 'reprioritize' and not cleaned_data.get('priority'):
+            self.add_error('priority', 'Choose the new priority.')
+        return cleaned_data
+    
+    @property
+    def value(self):
+        """The argument for ``apply_task_action()``"""
+        return {
+            'reassign': self.cleaned_data.get('assign_to'),
+            'reprioritize': self.cleaned_data.get('priority'),
+        }.get(self.cleaned_data['action'])
+    
+    def selected(self, queryset, search_form):
+        """Narrow a tenant's tasks to the selection"""
+        if self.cleaned_data['all_matching']:
+            return search_form.filter_queryset(queryset, self.tenant)
+        return queryset.filter(pk__in=self.cleaned_data['ids'])
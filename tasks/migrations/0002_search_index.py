@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from clientportal.search import install_index
+    install_index('tasks.task', schema_editor, apps=apps)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from clientportal.search import uninstall_index
+    uninstall_index('tasks.task', schema_editor, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        ('clients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['tenant', 'created_at', 'id'], name='task_tenant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['tenant', 'status', 'due_date'], name='task_tenant_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['client', 'created_at'], name='task_client_created_idx'),
+        ),
+    ]
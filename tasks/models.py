@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from accounts.models import Tenant
+from accounts.tenancy import TenantManager
 from clients.models import Client
 from django.utils import timezone
 
@@ -34,12 +35,24 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager(select_related=['client', 'assigned_to'])
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'created_at', 'id'], name='task_tenant_created_idx'),
+            models.Index(fields=['tenant', 'status', 'due_date'], name='task_tenant_status_due_idx'),
+            models.Index(fields=['client', 'created_at', 'id'], name='task_client_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.client.full_name}"
     
+    def save(self, *args, **kwargs):
+        # Rollups lock the stored status in pre_save; hold the lock until the row is written
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     @property
     def is_overdue(self):
         if self.due_date and self.status != 'completed':
@@ -56,11 +69,11 @@ class Task(models.Model):
     def mark_completed(self):
         self.status = 'completed'
         self.completed_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'completed_at', 'updated_at'])
     
     def mark_in_progress(self):
         self.status = 'in_progress'
-        self.save()
+        self.save(update_fields=['status', 'updated_at'])
 
 
 class TaskComment(models.Model):
@@ -72,6 +85,10 @@ class TaskComment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # The comment feed pages through a task's comments by id
+            models.Index(fields=['task', 'id'], name='taskcomment_task_id_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.task.title}"
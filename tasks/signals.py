@@ -0,0 +1,53 @@
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from accounts import rollups
+from clientportal import events, search
+from clientportal.stats import invalidate_dashboard_stats
+from .bulk import deleting_in_bulk
+from .models import Task, TaskComment
+
+
+def task_event_data(task):
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'status': task.status,
+        'status_display': task.get_status_display(),
+        'priority': task.priority,
+        'assigned_to': task.assigned_to_id,
+    }
+
+
+@receiver(post_init, sender=Task)
+def task_loaded(sender, instance, **kwargs):
+    rollups.track_status(instance)
+
+
+@receiver(pre_save, sender=Task)
+def task_saving(sender, instance, update_fields, **kwargs):
+    rollups.lock_status(instance, update_fields)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, **kwargs):
+    """Keep tenant rollups, cached statistics, the search index and live pages in step with task writes"""
+    rollups.record_saved(instance, created)
+    search.index_instance(instance)
+    invalidate_dashboard_stats(instance.tenant_id)
+    events.publish(instance.tenant_id, 'task.created' if created else 'task.updated', task_event_data(instance))
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    if deleting_in_bulk():
+        return
+    rollups.record_deleted(instance)
+    search.remove_instance(instance)
+    invalidate_dashboard_stats(instance.tenant_id)
+    events.publish(instance.tenant_id, 'task.deleted', {'id': instance.pk})
+
+
+@receiver(post_save, sender=TaskComment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        events.publish(instance.task.tenant_id, 'comment.created', {'id': instance.pk, 'task': instance.task_id})
@@ -1,3 +1,214 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Tenant, TenantDailyStats, UserProfile
+from clientportal.search import search
+from clients.models import Client
+from .bulk import apply_task_action
+from .models import Task, TaskComment
+from .views import COMMENT_PAGE_SIZE
 
-# Create your tests here.
+
+class AssigneeAutocompleteTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(name='Acme', slug='acme')
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        self.user = User.objects.create_user('alice', password='secret', last_name='Smith')
+        UserProfile.objects.create(user=self.user, tenant=tenant, role='admin')
+        UserProfile.objects.create(user=User.objects.create_user('albert'), tenant=other, role='staff')
+        UserProfile.objects.create(user=User.objects.create_user('bob', email='smithy@acme.test'), tenant=tenant, role='staff')
+        self.client.force_login(self.user)
+    
+    def test_matches_tenant_users_by_prefix(self):
+        url = reverse('tasks:assignee_autocomplete')
+        self.assertEqual([r['text'] for r in self.client.get(url, {'q': 'al'}).json()['results']], ['alice'])
+        self.assertEqual([r['text'] for r in self.client.get(url, {'q': 'smi'}).json()['results']], ['alice', 'bob'])
+        self.assertEqual(len(self.client.get(url).json()['results']), 2)
+    
+    def test_invalid_bound_value_is_ignored(self):
+        response = self.client.get(reverse('tasks:task_list'), {'assigned_to': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('tasks:task_list'), {'assigned_to': self.user.pk})
+        self.assertContains(response, f'<option value="{self.user.pk}" selected>alice</option>', html=True)
+
+
+class TaskBulkActionTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        self.bob = User.objects.create_user('bob')
+        UserProfile.objects.create(user=self.bob, tenant=self.tenant, role='staff')
+        client = Client.objects.create(tenant=self.tenant, first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.tasks = [
+            Task.objects.create(tenant=self.tenant, client=client, title=f'Report {n}', priority='low')
+            for n in range(5)
+        ]
+        
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        self.foreign = Task.objects.create(tenant=other, client=hank, title='Report hidden', priority='low')
+        self.client.force_login(self.user)
+    
+    def post(self, data, query=''):
+        url = reverse('tasks:task_bulk_action') + query
+        return self.client.post(url, data, HTTP_ACCEPT='application/json')
+    
+    def metric_total(self, metric):
+        stats = TenantDailyStats.objects.filter(tenant=self.tenant, metric=metric)
+        return sum(stats.values_list('value', flat=True))
+    
+    def status_total(self, status):
+        return self.metric_total(f'tasks.status.{status}')
+    
+    def test_complete_selected_tasks(self):
+        ids = [self.tasks[0].pk, self.tasks[1].pk, self.foreign.pk]
+        response = self.post({'action': 'complete', 'ids': ids})
+        self.assertEqual(response.json(), {'action': 'complete', 'count': 2})
+        completed = Task.objects.for_tenant(self.tenant).filter(status='completed')
+        self.assertEqual(set(completed.values_list('pk', flat=True)), set(ids[:2]))
+        self.assertTrue(all(task.completed_at for task in completed))
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'pending')
+        self.assertEqual((self.status_total('completed'), self.status_total('pending')), (2, 3))
+        
+        # Already completed tasks are not counted again
+        self.assertEqual(self.post({'action': 'complete', 'ids': ids}).json()['count'], 0)
+    
+    def test_filter_expression(self):
+        self.tasks[0].priority = 'high'
+        self.tasks[0].save()
+        response = self.post({'action': 'reprioritize', 'priority': 'urgent', 'all_matching': 'on'}, '?priority=low')
+        self.assertEqual(response.json()['count'], 4)
+        self.assertEqual(Task.objects.for_tenant(self.tenant).filter(priority='urgent').count(), 4)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.priority, 'low')
+    
+    def test_reassign_and_validation(self):
+        response = self.post({'action': 'reassign', 'assign_to': self.bob.pk, 'ids': [self.tasks[0].pk]})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(Task.objects.unscoped().get(pk=self.tasks[0].pk).assigned_to, self.bob)
+        
+        outsider = User.objects.create_user('mallory')
+        self.assertEqual(self.post({'action': 'reassign', 'assign_to': outsider.pk, 'ids': [self.tasks[0].pk]}).status_code, 400)
+        self.assertEqual(self.post({'action': 'complete'}).status_code, 400)
+        self.assertEqual(self.post({'action': 'reprioritize', 'ids': [self.tasks[0].pk]}).status_code, 400)
+        # An invalid filter must not widen the selection to every task
+        response = self.post({'action': 'delete', 'all_matching': 'on'}, '?status=bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.for_tenant(self.tenant).count(), 5)
+    
+    def test_delete_in_batches(self):
+        TaskComment.objects.create(task=self.tasks[0], author=self.user, content='Note')
+        with CaptureQueriesContext(connection) as queries:
+            count = apply_task_action(Task.objects.for_tenant(self.tenant), 'delete', batch_size=2)
+        self.assertEqual(count, 5)
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "tasks_task"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(TaskComment.objects.exists())
+        self.assertEqual(list(Task.objects.unscoped()), [self.foreign])
+        self.assertEqual(search(Task.objects.for_tenant(self.tenant), 'report', self.tenant).count(), 0)
+        self.assertEqual(self.status_total('pending'), 0)
+        self.assertEqual(self.metric_total('tasks.created'), 0)
+        self.assertEqual(self.metric_total('clients.created'), 1)
+        # Counters follow the batches; the tenant's other tables are not rescanned
+        self.assertFalse([q for q in queries if 'FROM "clients_client"' in q['sql']])
+    
+    def test_browser_form_redirects_to_list(self):
+        response = self.client.post(
+            reverse('tasks:task_bulk_action') + '?status=pending',
+            {'action': 'complete', 'all_matching': 'on'}, HTTP_ACCEPT='text/html',
+        )
+        self.assertRedirects(response, reverse('tasks:task_list') + '?status=pending')
+        self.assertFalse(Task.objects.for_tenant(self.tenant).filter(status='pending').exists())
+    
+    def test_admin_actions(self):
+        admin = User.objects.create_superuser('root', 'root@example.com', 'secret')
+        self.client.force_login(admin)
+        url = reverse('admin:tasks_task_changelist')
+        response = self.client.post(url, {'action': 'set_priority_urgent', '_selected_action': [self.tasks[0].pk, self.foreign.pk]})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Task._base_manager.filter(priority='urgent').count(), 2)
+        
+        self.client.post(url, {'action': 'delete_selected', '_selected_action': [self.tasks[1].pk], 'post': 'yes'})
+        self.assertFalse(Task._base_manager.filter(pk=self.tasks[1].pk).exists())
+
+
+class TaskCommentFeedTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user('alice', password='secret', first_name='Alice', last_name='Smith')
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role='admin')
+        client = Client.objects.create(tenant=self.tenant, first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.task = Task.objects.create(tenant=self.tenant, client=client, title='Report')
+        self.url = reverse('tasks:task_comment_feed', args=[self.task.pk])
+        self.client.force_login(self.user)
+    
+    def add_comments(self, count):
+        start = TaskComment.objects.count()
+        return [
+            TaskComment.objects.create(task=self.task, author=User.objects.create_user(f'author{n}'), content=f'Comment {n}')
+            for n in range(start, start + count)
+        ]
+    
+    def test_pages_after_a_comment_with_authors_joined(self):
+        comments = self.add_comments(5)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.url, {'after': comments[0].pk, 'limit': 3}).json()
+        self.assertEqual([c['content'] for c in data['comments']], ['Comment 1', 'Comment 2', 'Comment 3'])
+        self.assertEqual(data['comments'][0]['author'], 'author1')
+        self.assertTrue(data['has_more'])
+        comment_queries = [q for q in queries if 'tasks_taskcomment' in q['sql']]
+        self.assertEqual(len(comment_queries), 2)
+        
+        data = self.client.get(self.url, {'after': data['last_id']}).json()
+        self.assertEqual([c['content'] for c in data['comments']], ['Comment 4'])
+        self.assertFalse(data['has_more'])
+    
+    def test_since_timestamp(self):
+        comments = self.add_comments(2)
+        TaskComment.objects.filter(pk=comments[0].pk).update(created_at=timezone.now() - timedelta(days=1))
+        since = (timezone.now() - timedelta(hours=1)).isoformat()
+        data = self.client.get(self.url, {'since': since}).json()
+        self.assertEqual([c['id'] for c in data['comments']], [comments[1].pk])
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+    
+    def test_conditional_get(self):
+        self.add_comments(1)
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        TaskComment.objects.create(task=self.task, author=self.user, content='New')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_other_tenants_tasks_are_not_found(self):
+        other = Tenant.objects.create(name='Globex', slug='globex')
+        hank = Client.objects.create(tenant=other, first_name='Hank', last_name='Scorpio', email='hank@example.com')
+        hidden = Task.objects.create(tenant=other, client=hank, title='Hidden')
+        self.assertEqual(self.client.get(reverse('tasks:task_comment_feed', args=[hidden.pk])).status_code, 404)
+    
+    def test_comment_endpoint_keeps_its_payload(self):
+        response = self.client.post(reverse('tasks:task_comment', args=[self.task.pk]), {'content': 'Done'})
+        comment = TaskComment.objects.get()
+        self.assertEqual(response.json(), {'success': True, 'comment': {
+            'author': 'alice', 'content': 'Done', 'created_at': comment.created_at.strftime('%Y-%m-%d %H:%M'),
+        }})
+    
+    def test_task_detail_renders_first_page_without_per_comment_queries(self):
+        self.add_comments(3)
+        self.client.get(reverse('tasks:task_detail', args=[self.task.pk]))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('tasks:task_detail', args=[self.task.pk]))
+        self.add_comments(COMMENT_PAGE_SIZE)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('tasks:task_detail', args=[self.task.pk]))
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(response.context['comments']), COMMENT_PAGE_SIZE)
+        self.assertTrue(response.context['more_comments'])
@@ -6,9 +6,12 @@ app_name = 'tasks'
 urlpatterns = [
     path('', views.task_list, name='task_list'),
     path('create/', views.task_create, name='task_create'),
+    path('assignees/', views.assignee_autocomplete, name='assignee_autocomplete'),
+    path('bulk/', views.task_bulk_action, name='task_bulk_action'),
     path('<int:pk>/', views.task_detail, name='task_detail'),
     path('<int:pk>/edit/', views.task_update, name='task_update'),
     path('<int:pk>/delete/', views.task_delete, name='task_delete'),
     path('<int:pk>/complete/', views.task_complete, name='task_complete'),
     path('<int:pk>/comment/', views.task_comment, name='task_comment'),
+    path('<int:pk>/comments/', views.task_comment_feed, name='task_comment_feed'),
 ] 
\ No newline at end of file
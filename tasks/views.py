@@ -1,73 +1,76 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
+from django.urls import reverse
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import JsonResponse
+from django.contrib.auth.models import User
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET, require_POST
+from accounts.tenancy import tenant_required
+from clientportal.autocomplete import USER_SEARCH_FIELDS, autocomplete_response, prefix_filter
+from clientportal.instrumentation import query_budget
+from clientportal.pagination import CursorPaginator
+from clientportal.search import RANKED_ORDERING, is_ranked
+from clientportal.stats import get_dashboard_stats
+from .bulk import ACTIONS, apply_task_action
 from .models import Task, TaskComment
-from .forms import TaskForm, TaskCommentForm, TaskSearchForm
-from clients.models import Client
+from .forms import TaskBulkActionForm, TaskForm, TaskCommentForm, TaskSearchForm
 
 
-@login_required
+@query_budget(12)
+@tenant_required
 def task_list(request):
     """List all tasks for the current tenant with search and filtering"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    tasks = Task.objects.filter(tenant=tenant)
+    tenant = request.tenant
+    tasks = Task.objects.all()
     
     # Handle search and filtering
-    search_form = TaskSearchForm(request.GET)
-    if search_form.is_valid():
-        search = search_form.cleaned_data.get('search')
-        status = search_form.cleaned_data.get('status')
-        priority = search_form.cleaned_data.get('priority')
-        assigned_to = search_form.cleaned_data.get('assigned_to')
-        
-        if search:
-            tasks = tasks.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(client__first_name__icontains=search) |
-                Q(client__last_name__icontains=search)
-            )
-        
-        if status:
-            tasks = tasks.filter(status=status)
-        
-        if priority:
-            tasks = tasks.filter(priority=priority)
-        
-        if assigned_to:
-            tasks = tasks.filter(assigned_to=assigned_to)
+    search_form = TaskSearchForm(request.GET, tenant=tenant)
+    tasks = search_form.filter_queryset(tasks, tenant)
+    filtered = search_form.is_valid() and any(search_form.cleaned_data.values())
+    ordering = RANKED_ORDERING if is_ranked(tasks) else ['-created_at', '-id']
     
-    # Pagination
-    paginator = Paginator(tasks, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination: no OFFSET scan and no COUNT(*) per page
+    paginator = CursorPaginator(tasks, ordering, 20)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    
+    # Unfiltered totals come from the cached tenant statistics
+    stats = {} if filtered else get_dashboard_stats(tenant)
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
-        'total_tasks': tasks.count(),
-        'pending_tasks': tasks.filter(status='pending').count(),
-        'overdue_tasks': tasks.filter(status__in=['pending', 'in_progress'], due_date__lt=timezone.now()).count(),
+        'bulk_form': TaskBulkActionForm(tenant=tenant),
+        'total_tasks': stats.get('total_tasks'),
+        'pending_tasks': stats.get('pending_tasks'),
+        'overdue_tasks': stats.get('overdue_tasks'),
     }
     
     return render(request, 'tasks/task_list.html', context)
 
 
-@login_required
+# Comments rendered with the task page and returned per feed request
+COMMENT_PAGE_SIZE = 50
+MAX_COMMENT_PAGE_SIZE = 200
+
+
+def _comment_json(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.get_full_name() or comment.author.username,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+    }
+
+
+@query_budget(12)
+@tenant_required
 def task_detail(request, pk):
-    """Show detailed view of a task with comments"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    task = get_object_or_404(Task, pk=pk, tenant=tenant)
+    """Show detailed view of a task with the first page of its comments"""
+    task = get_object_or_404(Task, pk=pk)
     
     # Handle comment form
     if request.method == 'POST':
@@ -81,29 +84,31 @@ def task_detail(request, pk):
     else:
         comment_form = TaskCommentForm(user=request.user)
     
+    # Later comments are fetched from the comment feed by the page
+    comments = list(task.comments.select_related('author').order_by('id')[:COMMENT_PAGE_SIZE + 1])
+    
     context = {
         'task': task,
         'comment_form': comment_form,
-        'comments': task.comments.all(),
+        'comments': comments[:COMMENT_PAGE_SIZE],
+        'more_comments': len(comments) > COMMENT_PAGE_SIZE,
+        'last_comment_id': comments[:COMMENT_PAGE_SIZE][-1].pk if comments else 0,
     }
     
     return render(request, 'tasks/task_detail.html', context)
 
 
-@login_required
+@tenant_required
 def task_create(request):
     """Create a new task"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
     if request.method == 'POST':
-        form = TaskForm(request.POST, user=request.user)
+        form = TaskForm(request.POST, user=request.user, tenant=request.tenant)
         if form.is_valid():
             task = form.save()
             messages.success(request, f'Task "{task.title}" created successfully.')
             return redirect('tasks:task_detail', pk=task.pk)
     else:
-        form = TaskForm(user=request.user)
+        form = TaskForm(user=request.user, tenant=request.tenant)
     
     context = {
         'form': form,
@@ -113,23 +118,19 @@ def task_create(request):
     return render(request, 'tasks/task_form.html', context)
 
 
-@login_required
+@tenant_required
 def task_update(request, pk):
     """Update an existing task"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    task = get_object_or_404(Task, pk=pk, tenant=tenant)
+    task = get_object_or_404(Task, pk=pk)
     
     if request.method == 'POST':
-        form = TaskForm(request.POST, instance=task, user=request.user)
+        form = TaskForm(request.POST, instance=task, user=request.user, tenant=request.tenant)
         if form.is_valid():
             task = form.save()
             messages.success(request, f'Task "{task.title}" updated successfully.')
             return redirect('tasks:task_detail', pk=task.pk)
     else:
-        form = TaskForm(instance=task, user=request.user)
+        form = TaskForm(instance=task, user=request.user, tenant=request.tenant)
     
     context = {
         'form': form,
@@ -140,14 +141,10 @@ def task_update(request, pk):
     return render(request, 'tasks/task_form.html', context)
 
 
-@login_required
+@tenant_required
 def task_delete(request, pk):
     """Delete a task"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    task = get_object_or_404(Task, pk=pk, tenant=tenant)
+    task = get_object_or_404(Task, pk=pk)
     
     if request.method == 'POST':
         task_title = task.title
@@ -162,14 +159,10 @@ def task_delete(request, pk):
     return render(request, 'tasks/task_confirm_delete.html', context)
 
 
-@login_required
+@tenant_required
 def task_complete(request, pk):
     """Mark a task as completed"""
-    if not hasattr(request.user, 'profile'):
-        return render(request, 'accounts/setup_required.html')
-    
-    tenant = request.user.profile.tenant
-    task = get_object_or_404(Task, pk=pk, tenant=tenant)
+    task = get_object_or_404(Task, pk=pk)
     
     if request.method == 'POST':
         task.mark_completed()
@@ -183,14 +176,44 @@ def task_complete(request, pk):
     return render(request, 'tasks/task_confirm_complete.html', context)
 
 
-@login_required
+@query_budget(None)  # a few queries per batch of tasks
+@require_POST
+@tenant_required(json=True)
+def task_bulk_action(request):
+    """Complete, reassign, reprioritize or delete many tasks at once.
+    
+    The action comes from the POST data; the selection is either the posted
+    ``ids`` or, with ``all_matching``, every task matching the task list
+    filters in the query string. Answers with the number of affected tasks
+    as JSON, or redirects back to the filtered list for browser form posts.
+    """
+    tenant = request.tenant
+    # Browsers submitting the task list form ask for HTML; API clients get JSON
+    from_browser = 'text/html' in request.headers.get('Accept', '')
+    list_url = f"{reverse('tasks:task_list')}?{request.GET.urlencode()}"
+    form = TaskBulkActionForm(request.POST, tenant=tenant)
+    search_form = TaskSearchForm(request.GET, tenant=tenant)
+    if not form.is_valid() or not search_form.is_valid():
+        errors = {**search_form.errors, **form.errors}
+        if from_browser:
+            messages.error(request, ' '.join(message for field in errors.values() for message in field))
+            return redirect(list_url)
+        return JsonResponse({'error': 'Invalid bulk action', 'errors': errors}, status=400)
+    
+    action = form.cleaned_data['action']
+    tasks = form.selected(Task.objects.for_tenant(tenant), search_form)
+    count = apply_task_action(tasks, action, form.value)
+    
+    if from_browser:
+        messages.success(request, f'{dict(ACTIONS)[action]}: {count} tasks.')
+        return redirect(list_url)
+    return JsonResponse({'action': action, 'count': count})
+
+
+@tenant_required(json=True)
 def task_comment(request, pk):
     """Add a comment to a task via AJAX"""
-    if not hasattr(request.user, 'profile'):
-        return JsonResponse({'error': 'User profile not found'}, status=400)
-    
-    tenant = request.user.profile.tenant
-    task = get_object_or_404(Task, pk=pk, tenant=tenant)
+    task = get_object_or_404(Task, pk=pk)
     
     if request.method == 'POST':
         form = TaskCommentForm(request.POST, user=request.user)
@@ -198,6 +221,7 @@ def task_comment(request, pk):
             comment = form.save(commit=False)
             comment.task = task
             comment.save()
+            # The payload predates the comment feed; existing clients rely on it
             return JsonResponse({
                 'success': True,
                 'comment': {
@@ -210,3 +234,68 @@ def task_comment(request, pk):
             return JsonResponse({'error': 'Invalid comment data'}, status=400)
     
     return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+def _parse_since(value):
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(value)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+@query_budget(6)
+@require_GET
+@tenant_required(json=True)
+def task_comment_feed(request, pk):
+    """Comments of a task after ``?after=<id>`` or ``?since=<ISO timestamp>``, oldest first, as JSON.
+    
+    At most ``limit`` comments are returned; ``has_more`` says whether to ask
+    again straight away with ``after`` set to the returned ``last_id``. The
+    ETag changes whenever a comment is added or removed, so pollers sending
+    ``If-None-Match`` get an empty 304 until there is something new.
+    """
+    # One query checks the task is visible and fingerprints its comments
+    state = Task.objects.filter(pk=pk).order_by().values('pk').annotate(
+        latest=Max('comments__id'), count=Count('comments__id'),
+    ).first()
+    if state is None:
+        raise Http404('No task matches the given query.')
+    etag = quote_etag(f"{pk}-{state['latest'] or 0}-{state['count']}")
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            after = int(request.GET.get('after', 0))
+            limit = max(1, min(int(request.GET.get('limit', COMMENT_PAGE_SIZE)), MAX_COMMENT_PAGE_SIZE))
+            since = _parse_since(request.GET.get('since'))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid after, limit or since parameter'}, status=400)
+        
+        comments = TaskComment.objects.filter(task_id=pk, pk__gt=after).select_related('author').order_by('id')
+        if since:
+            comments = comments.filter(created_at__gt=since)
+        comments = list(comments[:limit + 1])
+        page = comments[:limit]
+        response = JsonResponse({
+            'comments': [_comment_json(comment) for comment in page],
+            'last_id': page[-1].pk if page else after,
+            'has_more': len(comments) > len(page),
+        })
+    
+    response['ETag'] = etag
+    # Let the browser keep the response but revalidate it on every poll
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@query_budget(6)
+@tenant_required(json=True)
+def assignee_autocomplete(request):
+    """Users of the current tenant matching ``q`` for the assignee pickers, as JSON"""
+    users = User.objects.filter(profile__tenant=request.tenant).only('id', 'username')
+    users = prefix_filter(users, request.GET.get('q', ''), USER_SEARCH_FIELDS)
+    return autocomplete_response(request, users, ['username', 'id'])